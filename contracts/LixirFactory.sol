@@ -1,4 +1,5 @@
 pragma solidity ^0.7.6;
+pragma abicoder v2;
 
 import '@openzeppelin/contracts/utils/EnumerableSet.sol';
 import '@openzeppelin/contracts/proxy/Clones.sol';
@@ -165,8 +166,76 @@ contract LixirFactory is LixirBase {
       );
   }
 
+  struct VaultParams {
+    string name;
+    string symbol;
+    address token0;
+    address token1;
+    address vaultImplementation;
+    address strategist;
+    address keeper;
+    address strategy;
+    bytes data;
+  }
+
+  /**
+    @notice deploys many vaults in one transaction. Each entry is checked
+    and created exactly as `createVault` or `createVaultETH` would, picked
+    by whether its implementation is an ETH vault implementation
+    @param params the `createVault` arguments of every vault
+    @return vaults the addresses of the newly created vaults, in order
+   */
+  function createVaults(VaultParams[] calldata params)
+    external
+    onlyRole(LixirRoles.deployer_role)
+    returns (address[] memory vaults)
+  {
+    vaults = new address[](params.length);
+    for (uint256 i = 0; i < params.length; i++) {
+      vaults[i] = _createVaultFromParams(params[i]);
+    }
+  }
+
   // internal functions
 
+  function _createVaultFromParams(VaultParams memory p)
+    internal
+    returns (address)
+  {
+    require(registry.hasRole(LixirRoles.strategy_role, p.strategy));
+    require(registry.hasRole(LixirRoles.keeper_role, p.keeper));
+    require(registry.hasRole(LixirRoles.strategist_role, p.strategist));
+    bool isWethPair = p.token0 == weth9 || p.token1 == weth9;
+    if (
+      registry.hasRole(
+        LixirRoles.eth_vault_implementation_role,
+        p.vaultImplementation
+      )
+    ) {
+      require(isWethPair, 'No weth, use regular vault creator');
+    } else {
+      require(
+        registry.hasRole(
+          LixirRoles.vault_implementation_role,
+          p.vaultImplementation
+        )
+      );
+      require(!isWethPair, 'Use eth vault creator instead');
+    }
+    return
+      _createVault(
+        p.name,
+        p.symbol,
+        p.token0,
+        p.token1,
+        p.vaultImplementation,
+        p.strategist,
+        p.keeper,
+        p.strategy,
+        p.data
+      );
+  }
+
   function orderTokens(address token0, address token1)
     internal
     pure
@@ -0,0 +1,70 @@
+pragma solidity ^0.7.6;
+pragma abicoder v2;
+
+/**
+  @notice Multicall2-compatible call aggregator, deployed on dev chains so
+  `lixir.reader` can batch reads the same way it does against mainnet Multicall2.
+ */
+contract Multicall {
+  struct Call {
+    address target;
+    bytes callData;
+  }
+
+  struct Result {
+    bool success;
+    bytes returnData;
+  }
+
+  function aggregate(Call[] memory calls)
+    public
+    returns (uint256 blockNumber, bytes[] memory returnData)
+  {
+    blockNumber = block.number;
+    returnData = new bytes[](calls.length);
+    for (uint256 i = 0; i < calls.length; i++) {
+      (bool success, bytes memory ret) = calls[i].target.call(calls[i].callData);
+      require(success, 'Multicall aggregate: call failed');
+      returnData[i] = ret;
+    }
+  }
+
+  function tryAggregate(bool requireSuccess, Call[] memory calls)
+    public
+    returns (Result[] memory returnData)
+  {
+    returnData = new Result[](calls.length);
+    for (uint256 i = 0; i < calls.length; i++) {
+      (bool success, bytes memory ret) = calls[i].target.call(calls[i].callData);
+      if (requireSuccess) {
+        require(success, 'Multicall2 aggregate: call failed');
+      }
+      returnData[i] = Result(success, ret);
+    }
+  }
+
+  function tryBlockAndAggregate(bool requireSuccess, Call[] memory calls)
+    public
+    returns (
+      uint256 blockNumber,
+      bytes32 blockHash,
+      Result[] memory returnData
+    )
+  {
+    blockNumber = block.number;
+    blockHash = blockhash(block.number);
+    returnData = tryAggregate(requireSuccess, calls);
+  }
+
+  function getBlockNumber() public view returns (uint256 blockNumber) {
+    blockNumber = block.number;
+  }
+
+  function getCurrentBlockTimestamp() public view returns (uint256 timestamp) {
+    timestamp = block.timestamp;
+  }
+
+  function getEthBalance(address addr) public view returns (uint256 balance) {
+    balance = addr.balance;
+  }
+}
@@ -0,0 +1,257 @@
+import itertools
+import os
+import random
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from lixir.errors import Revert
+from lixir.simulator import PriceHistory, StrategySimulator, Uint256Column
+
+SweepConfig = namedtuple(
+    "SweepConfig", ["TICK_SHORT_DURATION", "MAX_TICK_DIFF", "mainSpread", "rangeSpread"]
+)
+
+BacktestResult = namedtuple(
+    "BacktestResult",
+    [
+        "config",
+        "feesEarned0",
+        "feesEarned1",
+        "feesValue",
+        "inventoryDrift",
+        "valueVsHodl",
+        "rebalances",
+        "reverts",
+        "total0",
+        "total1",
+        "revert_msg",
+    ],
+)
+
+RESULT_COLUMNS = (
+    ("TICK_SHORT_DURATION", 8),
+    ("MAX_TICK_DIFF", 8),
+    ("mainSpread", 8),
+    ("rangeSpread", 8),
+    ("feesValue", 14),
+    ("inventoryDrift", 10),
+    ("valueVsHodl", 10),
+    ("rebalances", 6),
+    ("reverts", 6),
+)
+
+
+def grid(TICK_SHORT_DURATION, MAX_TICK_DIFF, mainSpread, rangeSpread):
+    return [
+        SweepConfig(*c)
+        for c in itertools.product(
+            TICK_SHORT_DURATION, MAX_TICK_DIFF, mainSpread, rangeSpread
+        )
+    ]
+
+
+def random_configs(
+    n, TICK_SHORT_DURATION, MAX_TICK_DIFF, mainSpread, rangeSpread, seed=None
+):
+    rng = random.Random(seed)
+    return [
+        SweepConfig(
+            rng.randint(*TICK_SHORT_DURATION),
+            rng.randint(*MAX_TICK_DIFF),
+            rng.randint(*mainSpread),
+            rng.randint(*rangeSpread),
+        )
+        for _ in range(n)
+    ]
+
+
+# uint256 columns are shared as four uint64 limbs per entry
+def _to_limbs(values):
+    values = np.asarray(values, dtype=object)
+    mask = (1 << 64) - 1
+    return np.stack(
+        [((values >> (64 * i)) & mask).astype(np.uint64) for i in range(4)], axis=1
+    )
+
+
+# Places a PriceHistory in shared memory once so every worker maps the same
+# read-only pages instead of unpickling its own copy.
+class SharedPriceHistory:
+    def __init__(self, history):
+        columns = {
+            "timestamps": history.timestamps,
+            "ticks": history.ticks,
+            "sqrtPricesX96": _to_limbs(history.sqrtPricesX96),
+        }
+        for name in ("liquidity", "fees0", "fees1"):
+            column = getattr(history, name)
+            if column is not None:
+                columns[name] = _to_limbs(column)
+        self.tickCumulative = int(history.tickCumulatives[0])
+        self._blocks = []
+        self.spec = {}
+        for name, column in columns.items():
+            column = np.ascontiguousarray(column)
+            block = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 1))
+            np.ndarray(column.shape, column.dtype, buffer=block.buf)[:] = column
+            self._blocks.append(block)
+            self.spec[name] = (block.name, column.shape, column.dtype.str)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach_history(spec, tickCumulative):
+    blocks = []
+    columns = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        column = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        column.flags.writeable = False
+        columns[name] = column
+    # the int64 columns are used as mapped and the uint256 ones are only
+    # decoded entry by entry, so nothing is copied per worker
+    uint256 = {
+        name: Uint256Column(columns[name]) if name in columns else None
+        for name in ("sqrtPricesX96", "liquidity", "fees0", "fees1")
+    }
+    history = PriceHistory(
+        columns["timestamps"],
+        columns["ticks"],
+        tickCumulative=tickCumulative,
+        **uint256,
+    )
+    return history, blocks
+
+
+def _price(sqrtPriceX96):
+    return (int(sqrtPriceX96) / (1 << 96)) ** 2
+
+
+def evaluate(
+    history,
+    config,
+    tickSpacing,
+    amount0,
+    amount1,
+    rebalance_interval,
+    performanceFee=0,
+):
+    simulator = StrategySimulator(history, tickSpacing, *config, performanceFee)
+    reverts = 0
+    first = None
+    step = None
+    try:
+        for step in simulator.run(amount0, amount1, rebalance_interval):
+            if first is None:
+                first = step
+            if step.revert_msg is not None:
+                reverts += 1
+    except Revert as e:
+        return BacktestResult(config, 0, 0, 0.0, 0.0, 0.0, 0, 0, 0, 0, e.revert_msg)
+    startPrice = _price(
+        history.sqrtPricesX96[history.timestamps.searchsorted(first.timestamp)]
+    )
+    endPrice = _price(history.sqrtPricesX96[simulator.index])
+    startValue0 = first.total0 * startPrice
+    startShare0 = startValue0 / (startValue0 + first.total1)
+    endValue0 = step.total0 * endPrice
+    endShare0 = endValue0 / (endValue0 + step.total1)
+    hodlValue = first.total0 * endPrice + first.total1
+    return BacktestResult(
+        config,
+        simulator.feesEarned0,
+        simulator.feesEarned1,
+        simulator.feesEarned0 * endPrice + simulator.feesEarned1,
+        endShare0 - startShare0,
+        (endValue0 + step.total1) / hodlValue - 1,
+        simulator.rebalances,
+        reverts,
+        step.total0,
+        step.total1,
+        None,
+    )
+
+
+_worker = {}
+
+
+def _init_worker(spec, tickCumulative, args):
+    history, blocks = attach_history(spec, tickCumulative)
+    _worker["history"] = history
+    _worker["blocks"] = blocks
+    _worker["args"] = args
+
+
+def _evaluate(config):
+    return evaluate(_worker["history"], config, *_worker["args"])
+
+
+# Evaluates every config against the same history on a process pool and
+# returns the results ranked by `sort_key`, best first.
+def sweep(
+    history,
+    configs,
+    tickSpacing,
+    amount0,
+    amount1,
+    rebalance_interval,
+    performanceFee=0,
+    max_workers=None,
+    sort_key="feesValue",
+):
+    args = (tickSpacing, amount0, amount1, rebalance_interval, performanceFee)
+    max_workers = max_workers or os.cpu_count()
+    with SharedPriceHistory(history) as shared:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared.spec, shared.tickCumulative, args),
+        ) as executor:
+            chunksize = max(1, len(configs) // (max_workers * 4))
+            results = list(executor.map(_evaluate, configs, chunksize=chunksize))
+    return rank(results, sort_key)
+
+
+# How good a result is by each metric, higher is better. inventoryDrift is
+# signed and best at 0, reverts are best when there are none.
+RANK_KEYS = {
+    "feesValue": lambda r: r.feesValue,
+    "valueVsHodl": lambda r: r.valueVsHodl,
+    "inventoryDrift": lambda r: -abs(r.inventoryDrift),
+    "rebalances": lambda r: r.rebalances,
+    "reverts": lambda r: -r.reverts,
+}
+
+
+def rank(results, sort_key="feesValue"):
+    key = RANK_KEYS[sort_key]
+    return sorted(results, key=lambda r: (r.revert_msg is None, key(r)), reverse=True)
+
+
+def format_table(results, limit=None):
+    header = " ".join(name[:width].rjust(width) for name, width in RESULT_COLUMNS)
+    lines = [header]
+    for result in results[:limit]:
+        row = result.config._asdict()
+        row.update(result._asdict())
+        cells = []
+        for name, width in RESULT_COLUMNS:
+            value = row[name]
+            cell = "%.4g" % value if isinstance(value, float) else str(value)
+            cells.append(cell.rjust(width))
+        if result.revert_msg is not None:
+            cells.append("reverted: %s" % result.revert_msg)
+        lines.append(" ".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,9 @@
+class Revert(AssertionError):
+    def __init__(self, revert_msg=""):
+        super().__init__(revert_msg)
+        self.revert_msg = revert_msg
+
+
+def require(cond, revert_msg=""):
+    if not cond:
+        raise Revert(revert_msg)
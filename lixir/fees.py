@@ -0,0 +1,243 @@
+from collections import namedtuple
+from brownie import web3
+from brownie.convert import to_address
+from hexbytes import HexBytes
+from lixir.errors import Revert
+from lixir.indexer import EventSpec, VAULT_EVENTS, decode_logs, to_ints, topic
+from lixir.observations import POOL_EVENTS
+from lixir.positions import position_key
+from lixir.reader import Call, aggregate
+from lixir.swap import load_pool
+from lixir.totals import Position, PositionInfo, liquidityAndTokensOwed
+from lixir.v3_math import Q96, mulDiv
+
+# Only their topics are used: a block with any of these reloads the pool.
+# Flash raises fee growth without a Swap and SetFeeProtocol changes how much
+# of every later fee reaches it.
+RELOAD_EVENTS = (
+    EventSpec(
+        "Mint",
+        "Mint(address,address,int24,int24,uint128,uint256,uint256)",
+        (("owner", "address"), ("tickLower", "int24"), ("tickUpper", "int24")),
+        (
+            ("sender", "address"),
+            ("amount", "uint128"),
+            ("amount0", "uint256"),
+            ("amount1", "uint256"),
+        ),
+    ),
+    EventSpec(
+        "Burn",
+        "Burn(address,int24,int24,uint128,uint256,uint256)",
+        (("owner", "address"), ("tickLower", "int24"), ("tickUpper", "int24")),
+        (("amount", "uint128"), ("amount0", "uint256"), ("amount1", "uint256")),
+    ),
+    EventSpec(
+        "Flash",
+        "Flash(address,address,uint256,uint256,uint256,uint256)",
+        (("sender", "address"), ("recipient", "address")),
+        (
+            ("amount0", "uint256"),
+            ("amount1", "uint256"),
+            ("paid0", "uint256"),
+            ("paid1", "uint256"),
+        ),
+    ),
+    EventSpec(
+        "SetFeeProtocol",
+        "SetFeeProtocol(uint8,uint8,uint8,uint8)",
+        (),
+        (
+            ("feeProtocol0Old", "uint8"),
+            ("feeProtocol1Old", "uint8"),
+            ("feeProtocol0New", "uint8"),
+            ("feeProtocol1New", "uint8"),
+        ),
+    ),
+)
+
+
+VaultPositions = namedtuple(
+    "VaultPositions", ["vault", "pool", "token1", "mainPosition", "rangePosition"]
+)
+
+UncollectedFees = namedtuple(
+    "UncollectedFees", ["vault", "token1", "fees0", "fees1", "value1"]
+)
+
+_POSITION_OUTPUTS = ["uint128", "uint256", "uint256", "uint128", "uint128"]
+_MAX_INT256 = (1 << 255) - 1
+
+
+def _signed(x):
+    return x - (1 << 256) if x > _MAX_INT256 else x
+
+
+# Replays a Swap log on the simulator as an exact input swap of the amount it
+# logged. That is the pool's own path, fee included, for an exact input swap
+# without a price limit. Anything else, such as an exact output swap or one
+# stopped by its limit, may round differently, so the replay only counts when
+# it logs the same amounts and price; otherwise the pool has to be reloaded.
+def replay_swap(simulator, amount0, amount1, sqrtPriceX96):
+    zeroForOne = amount0 > 0
+    amountIn = amount0 if zeroForOne else amount1
+    if amountIn <= 0:
+        return False
+    try:
+        result = simulator.swap(zeroForOne, amountIn)
+    except Revert:
+        return False
+    return result[:3] == (amount0, amount1, sqrtPriceX96)
+
+
+# Uncollected fees of many vaults' main and range positions. Every pool the
+# vaults are in is held as a lixir.swap.PoolSimulator that replays the pool's
+# Swap logs, crossing ticks and growing fees as the pool does. A block with a
+# Mint, Burn, Flash, SetFeeProtocol or a swap the replay cannot reproduce
+# exactly reloads the pool as of that block, and a block with any vault log
+# re-reads the vault's positions; deposits mint into both positions too. Everything else is kept without reading the
+# chain, and `uncollected` is two tick lookups per position.
+class FeeTracker:
+    def __init__(self, multicall):
+        self.multicall = multicall
+        self.pools = {}
+        self.vaults = {}
+        self.lastBlock = None
+
+    def _read_vaults(self, vaults, block_identifier):
+        calls = []
+        for vault in vaults:
+            calls.extend(
+                [
+                    Call(vault, "activePool()", (), ["address"]),
+                    Call(vault, "token1()", (), ["address"]),
+                    Call(vault, "mainPosition()", (), ["int24", "int24"]),
+                    Call(vault, "rangePosition()", (), ["int24", "int24"]),
+                ]
+            )
+        blockNumber, results = aggregate(
+            self.multicall, calls, block_identifier=block_identifier
+        )
+        entries = [results[i : i + 4] for i in range(0, len(results), 4)]
+        calls = [
+            Call(
+                pool,
+                "positions(bytes32)",
+                (bytes(position_key(vault, *ticks)),),
+                _POSITION_OUTPUTS,
+            )
+            for vault, ((pool,), _, *positions) in zip(vaults, entries)
+            for ticks in positions
+        ]
+        _, infos = aggregate(self.multicall, calls, block_identifier=blockNumber)
+        for i, (vault, ((pool,), (token1,), mainTicks, rangeTicks)) in enumerate(
+            zip(vaults, entries)
+        ):
+            self.vaults[vault] = VaultPositions(
+                vault,
+                pool,
+                token1,
+                Position(*mainTicks, PositionInfo(*infos[2 * i])),
+                Position(*rangeTicks, PositionInfo(*infos[2 * i + 1])),
+            )
+            if pool not in self.pools:
+                self.pools[pool] = load_pool(self.multicall, pool, blockNumber)
+        return blockNumber
+
+    # Starts tracking `vaults` as of `block_identifier`, by default the
+    # latest block, or the last block updated to once tracking has started
+    def track(self, vaults, block_identifier=None):
+        vaults = [to_address(str(v)) for v in vaults]
+        if self.lastBlock is not None:
+            block_identifier = self.lastBlock
+        self.lastBlock = self._read_vaults(vaults, block_identifier)
+
+    def _get_logs(self, address, specs, from_block, to_block):
+        return web3.eth.get_logs(
+            {
+                "address": address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [[topic(spec).hex() for spec in specs]],
+            }
+        )
+
+    # Applies every log of the tracked pools and vaults from the block after
+    # the last update up to `to_block`, one block at a time
+    def update(self, to_block=None):
+        if to_block is None:
+            to_block = web3.eth.block_number
+        from_block = self.lastBlock + 1
+        if to_block < from_block:
+            return 0
+        swap = POOL_EVENTS[0]
+        logs = self._get_logs(
+            list(self.pools), (swap,) + RELOAD_EVENTS, from_block, to_block
+        ) + self._get_logs(list(self.vaults), VAULT_EVENTS, from_block, to_block)
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+        pools = set(self.pools)
+        blocks = {}
+        for log in logs:
+            blocks.setdefault(log["blockNumber"], []).append(log)
+        for blockNumber, block in blocks.items():
+            reload = set()
+            vaults = []
+            swaps = []
+            for log in block:
+                address = to_address(log["address"])
+                if address in self.vaults:
+                    vaults.append(address)
+                elif HexBytes(log["topics"][0]) == topic(swap):
+                    swaps.append(log)
+                else:
+                    reload.add(address)
+            if swaps:
+                decoded = decode_logs(swap, swaps)
+                for log, amount0, amount1, sqrtPriceX96 in zip(
+                    swaps,
+                    to_ints(decoded["amount0"]),
+                    to_ints(decoded["amount1"]),
+                    to_ints(decoded["sqrtPriceX96"]),
+                ):
+                    address = to_address(log["address"])
+                    # a reloaded pool already includes the whole block
+                    if address not in reload and not replay_swap(
+                        self.pools[address],
+                        _signed(amount0),
+                        _signed(amount1),
+                        sqrtPriceX96,
+                    ):
+                        reload.add(address)
+            for pool in reload:
+                self.pools[pool] = load_pool(self.multicall, pool, blockNumber)
+            if vaults:
+                self._read_vaults(list(dict.fromkeys(vaults)), blockNumber)
+        # pools a rebalance moved into had no logs read, so they start here
+        for pool in set(self.pools) - pools:
+            self.pools[pool] = load_pool(self.multicall, pool, to_block)
+        self.lastBlock = to_block
+        return len(logs)
+
+    def uncollected(self, vault):
+        entry = self.vaults[to_address(str(vault))]
+        pool = self.pools[entry.pool]
+        fees0 = 0
+        fees1 = 0
+        for position in (entry.mainPosition, entry.rangePosition):
+            _, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(
+                pool, pool.tick, position
+            )
+            fees0 += tokensOwed0
+            fees1 += tokensOwed1
+        value1 = mulDiv(mulDiv(fees0, pool.sqrtPriceX96, Q96), pool.sqrtPriceX96, Q96)
+        return UncollectedFees(entry.vault, entry.token1, fees0, fees1, value1 + fees1)
+
+    # Every tracked vault, most uncollected fees first. Fees are valued in
+    # each vault's token1 at the pool price and then by `prices`, which maps
+    # every token1 to the value of its smallest unit in one common unit.
+    def ranked(self, prices):
+        fees = [self.uncollected(v) for v in self.vaults]
+        for f in fees:
+            if f.token1 not in prices:
+                raise KeyError("no price for %s, token1 of %s" % (f.token1, f.vault))
+        return sorted(fees, key=lambda f: f.value1 * prices[f.token1], reverse=True)
@@ -0,0 +1,211 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+STATE_MACHINE_TEST = "tests/test_state_machine.py"
+
+WorkerResult = namedtuple(
+    "WorkerResult", ["index", "network", "max_examples", "seed", "returncode", "log"]
+)
+
+FuzzResult = namedtuple("FuzzResult", ["workers", "database", "junitxml", "failures"])
+
+
+def shard(total, workers):
+    return [
+        total // workers + (1 if i < total % workers else 0) for i in range(workers)
+    ]
+
+
+# Every worker gets its own ganache instance on its own port through a brownie
+# development network. They all start from the same deterministic accounts, so
+# the session deployment in conftest yields the same state on every chain.
+# Networks are named after their port and never modified, so a worker on a
+# new port gets a new entry and an existing one always has the right port.
+def network_name(port):
+    return "lixir-fuzz-%d" % port
+
+
+def ensure_network(port, default_balance=100000):
+    name = network_name(port)
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "brownie",
+            "networks",
+            "add",
+            "Development",
+            name,
+            "cmd=ganache-cli",
+            "host=http://127.0.0.1",
+            "port=%d" % port,
+            "accounts=10",
+            "mnemonic=brownie",
+            "default_balance=%d" % default_balance,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    # brownie reports errors on stdout and still exits with 0
+    output = process.stdout
+    if process.returncode != 0 or ("SUCCESS" not in output and "already" not in output):
+        raise RuntimeError("could not add network %s:\n%s" % (name, output))
+    return name
+
+
+def _worker_dir(out_dir, index):
+    return os.path.join(out_dir, "worker-%d" % index)
+
+
+def start_worker(index, max_examples, seed, out_dir, test, base_port, step_count):
+    network = ensure_network(base_port + index)
+    worker_dir = _worker_dir(out_dir, index)
+    os.makedirs(worker_dir, exist_ok=True)
+    env = dict(os.environ)
+    env["LIXIR_FUZZ_MAX_EXAMPLES"] = str(max_examples)
+    env["LIXIR_FUZZ_DATABASE"] = os.path.join(worker_dir, "hypothesis")
+    if step_count is not None:
+        env["LIXIR_FUZZ_STEP_COUNT"] = str(step_count)
+    log = os.path.join(worker_dir, "output.txt")
+    log_file = open(log, "w")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "brownie",
+            "test",
+            test,
+            "--network",
+            network,
+            "--hypothesis-seed=%d" % seed,
+            "--junitxml=%s" % os.path.join(worker_dir, "junit.xml"),
+        ],
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    return network, log, log_file, process
+
+
+# Example files are named by the hash of their contents under a directory per
+# test key, so the union of the worker directories is the merged database
+def merge_databases(out_dir, workers, database):
+    for index in range(workers):
+        worker_db = os.path.join(_worker_dir(out_dir, index), "hypothesis")
+        if os.path.isdir(worker_db):
+            shutil.copytree(worker_db, database, dirs_exist_ok=True)
+
+
+def merge_junit(out_dir, workers, junitxml):
+    merged = ET.Element("testsuites")
+    failures = []
+    for index in range(workers):
+        path = os.path.join(_worker_dir(out_dir, index), "junit.xml")
+        if not os.path.exists(path):
+            continue
+        root = ET.parse(path).getroot()
+        suites = [root] if root.tag == "testsuite" else list(root)
+        for suite in suites:
+            suite.set("name", "%s[worker-%d]" % (suite.get("name", "pytest"), index))
+            merged.append(suite)
+            for case in suite.iter("testcase"):
+                for result in case:
+                    if result.tag in ("failure", "error"):
+                        failures.append(
+                            (index, case.get("name"), result.get("message"))
+                        )
+    ET.ElementTree(merged).write(junitxml, encoding="utf-8", xml_declaration=True)
+    return failures
+
+
+def run(
+    workers=None,
+    max_examples=200,
+    seed=0,
+    out_dir="fuzz-results",
+    test=STATE_MACHINE_TEST,
+    base_port=8600,
+    step_count=None,
+):
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+    database = os.path.join(out_dir, "hypothesis")
+    # every worker replays what earlier runs saved, failures included
+    if os.path.isdir(database):
+        for i in range(workers):
+            shutil.copytree(
+                database,
+                os.path.join(_worker_dir(out_dir, i), "hypothesis"),
+                dirs_exist_ok=True,
+            )
+    examples = shard(max_examples, workers)
+    started = [
+        (
+            i,
+            examples[i],
+            seed + i,
+            start_worker(
+                i, examples[i], seed + i, out_dir, test, base_port, step_count
+            ),
+        )
+        for i in range(workers)
+        if examples[i] > 0
+    ]
+    results = []
+    for i, n, worker_seed, (network, log, log_file, process) in started:
+        returncode = process.wait()
+        log_file.close()
+        results.append(WorkerResult(i, network, n, worker_seed, returncode, log))
+    merge_databases(out_dir, workers, database)
+    junitxml = os.path.join(out_dir, "junit.xml")
+    failures = merge_junit(out_dir, workers, junitxml)
+    return FuzzResult(results, database, junitxml, failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Shard the vault state machine fuzz test across local chains"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--examples", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="fuzz-results")
+    parser.add_argument("--test", default=STATE_MACHINE_TEST)
+    parser.add_argument("--base-port", type=int, default=8600)
+    args = parser.parse_args(argv)
+    result = run(
+        args.workers,
+        args.examples,
+        args.seed,
+        args.out,
+        args.test,
+        args.base_port,
+        args.steps,
+    )
+    for worker in result.workers:
+        print(
+            "worker %d: %d examples, seed %d, exit %d (%s)"
+            % (
+                worker.index,
+                worker.max_examples,
+                worker.seed,
+                worker.returncode,
+                worker.log,
+            )
+        )
+    for index, name, message in result.failures:
+        print("worker %d: %s failed: %s" % (index, name, message))
+    print("merged database: %s" % result.database)
+    print("merged report: %s" % result.junitxml)
+    return 1 if any(w.returncode != 0 for w in result.workers) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import json
+import os
+from collections import namedtuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "gas_baseline.json")
+
+# relative increase over the baseline a benchmark may use before it fails
+DEFAULT_THRESHOLD = 0.01
+
+GasResult = namedtuple("GasResult", ["name", "gas", "baseline", "change"])
+
+
+class GasRegression(AssertionError):
+    def __init__(self, result, threshold):
+        super().__init__(
+            "%s used %d gas, %+.2f%% over its baseline of %d (threshold %.2f%%)"
+            % (
+                result.name,
+                result.gas,
+                100 * result.change,
+                result.baseline,
+                100 * threshold,
+            )
+        )
+        self.result = result
+
+
+class MissingBaseline(AssertionError):
+    def __init__(self, result):
+        super().__init__(
+            "%s used %d gas and has no baseline; record it with update"
+            % (result.name, result.gas)
+        )
+        self.result = result
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(sorted(baseline.items())), f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def compare(name, gas, baseline):
+    previous = baseline.get(name)
+    change = None if not previous else (gas - previous) / previous
+    return GasResult(name, gas, previous, change)
+
+
+def format_report(results):
+    lines = ["%-40s %10s %10s %8s" % ("benchmark", "gas", "baseline", "change")]
+    for r in results:
+        lines.append(
+            "%-40s %10d %10s %8s"
+            % (
+                r.name,
+                r.gas,
+                "-" if r.baseline is None else "%d" % r.baseline,
+                "new" if r.change is None else "%+.2f%%" % (100 * r.change),
+            )
+        )
+    return "\n".join(lines)
+
+
+# Collects gas used per named benchmark and checks it against the stored
+# baseline. A benchmark missing from the baseline fails like a regression, and
+# the baseline is only written with `update`, so both new benchmarks and
+# improvements have to be recorded on purpose.
+class GasBenchmarks:
+    def __init__(self, path=BASELINE_PATH, threshold=DEFAULT_THRESHOLD, update=False):
+        self.path = path
+        self.threshold = threshold
+        self.update = update
+        self.baseline = load_baseline(path)
+        self.results = []
+
+    # `gas` is either a gas amount or a transaction
+    def measure(self, name, gas):
+        gas = getattr(gas, "gas_used", gas)
+        result = compare(name, gas, self.baseline)
+        self.results.append(result)
+        if not self.update:
+            if result.baseline is None:
+                raise MissingBaseline(result)
+            if result.change is not None and result.change > self.threshold:
+                raise GasRegression(result, self.threshold)
+        return result
+
+    def save(self):
+        if not self.update:
+            return
+        baseline = dict(self.baseline)
+        for r in self.results:
+            baseline[r.name] = r.gas
+        if baseline != self.baseline:
+            save_baseline(baseline, self.path)
+            self.baseline = baseline
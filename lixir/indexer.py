@@ -0,0 +1,291 @@
+import json
+import os
+import numpy as np
+from collections import namedtuple
+from brownie import web3
+from brownie.convert import to_address
+from hexbytes import HexBytes
+
+EventSpec = namedtuple("EventSpec", ["name", "signature", "indexed", "data"])
+
+# Every event indexed here has only static, word sized fields, so a batch of
+# logs decodes as one (n, words, 32) byte array sliced into columns.
+FACTORY_EVENTS = (
+    EventSpec(
+        "VaultCreated",
+        "VaultCreated(address,address,address,address)",
+        (("token0", "address"), ("token1", "address"), ("vault_impl", "address")),
+        (("vault", "address"),),
+    ),
+)
+
+VAULT_EVENTS = (
+    EventSpec(
+        "Deposit",
+        "Deposit(address,address,uint256,uint256,uint256,uint256,uint256)",
+        (("depositor", "address"), ("recipient", "address")),
+        (
+            ("shares", "uint256"),
+            ("amount0In", "uint256"),
+            ("amount1In", "uint256"),
+            ("total0", "uint256"),
+            ("total1", "uint256"),
+        ),
+    ),
+    EventSpec(
+        "Withdraw",
+        "Withdraw(address,address,uint256,uint256,uint256)",
+        (("withdrawer", "address"), ("recipient", "address")),
+        (
+            ("shares", "uint256"),
+            ("amount0Out", "uint256"),
+            ("amount1Out", "uint256"),
+        ),
+    ),
+    EventSpec(
+        "Rebalance",
+        "Rebalance(int24,int24,int24,int24,uint24,uint256,uint256,"
+        "(uint160,uint256,uint256,uint256,uint256))",
+        (),
+        (
+            ("mainTickLower", "int24"),
+            ("mainTickUpper", "int24"),
+            ("rangeTickLower", "int24"),
+            ("rangeTickUpper", "int24"),
+            ("newFee", "uint24"),
+            ("total0", "uint256"),
+            ("total1", "uint256"),
+            ("sqrtRatioX96", "uint160"),
+            ("tokensOwed0", "uint256"),
+            ("tokensOwed1", "uint256"),
+            ("totalSupply", "uint256"),
+            ("sharesMinted", "uint256"),
+        ),
+    ),
+    EventSpec(
+        "PerformanceFeeSet",
+        "PerformanceFeeSet(uint24,uint24)",
+        (),
+        (("oldFee", "uint24"), ("newFee", "uint24")),
+    ),
+    EventSpec(
+        "StrategySet",
+        "StrategySet(address,address)",
+        (),
+        (("oldStrategy", "address"), ("newStrategy", "address")),
+    ),
+)
+
+# Types that fit in an int64 are stored as int64, addresses as 20 raw bytes
+# and everything wider as the raw 32 byte big-endian word.
+_SMALL_TYPES = ("int24", "uint24", "uint32", "int56", "uint64")
+
+LOG_COLUMNS = (("blockNumber", "<i8"), ("logIndex", "<i8"), ("address", "V20"))
+
+
+def _dtype(abi_type):
+    if abi_type in _SMALL_TYPES:
+        return "<i8"
+    if abi_type == "address":
+        return "V20"
+    return "V32"
+
+
+def columns(spec):
+    return LOG_COLUMNS + tuple(
+        (name, _dtype(abi_type)) for name, abi_type in spec.indexed + spec.data
+    )
+
+
+def topic(spec):
+    return HexBytes(web3.keccak(text=spec.signature))
+
+
+def _decode_words(words, abi_type):
+    dtype = _dtype(abi_type)
+    if dtype == "<i8":
+        # sign extended, so the low 8 bytes are the value as a big-endian int64
+        return np.ascontiguousarray(words[:, 24:]).view(">i8").reshape(-1).astype("<i8")
+    if dtype == "V20":
+        return np.ascontiguousarray(words[:, 12:]).view("V20").reshape(-1)
+    return np.ascontiguousarray(words).view("V32").reshape(-1)
+
+
+def _stack(chunks, n, words):
+    return np.frombuffer(b"".join(chunks), dtype=np.uint8).reshape(n, words, 32)
+
+
+def decode_logs(spec, logs):
+    n = len(logs)
+    decoded = {
+        "blockNumber": np.array([log["blockNumber"] for log in logs], dtype="<i8"),
+        "logIndex": np.array([log["logIndex"] for log in logs], dtype="<i8"),
+        "address": np.frombuffer(
+            b"".join(bytes(HexBytes(log["address"])) for log in logs), dtype="V20"
+        ),
+    }
+    if spec.indexed:
+        topics = _stack(
+            (b"".join(bytes(HexBytes(t)) for t in log["topics"][1:]) for log in logs),
+            n,
+            len(spec.indexed),
+        )
+        for i, (name, abi_type) in enumerate(spec.indexed):
+            decoded[name] = _decode_words(topics[:, i], abi_type)
+    data = _stack((bytes(HexBytes(log["data"])) for log in logs), n, len(spec.data))
+    for i, (name, abi_type) in enumerate(spec.data):
+        decoded[name] = _decode_words(data[:, i], abi_type)
+    return decoded
+
+
+def to_ints(column):
+    column = np.asarray(column)
+    if column.dtype.kind != "V":
+        return column.astype(object)
+    return np.array(
+        [int.from_bytes(v.tobytes(), "big") for v in column], dtype=object
+    ).reshape(column.shape)
+
+
+def to_addresses(column):
+    return [to_address("0x" + v.tobytes().hex()) for v in column]
+
+
+# Append-only column files, one raw binary file per column, read back as
+# memmaps. meta.json holds the row counts and the last indexed block and is
+# only replaced once the rows it counts are on disk, so an interrupted update
+# is rolled back to the previous meta on the next open.
+class ColumnStore:
+    def __init__(self, path, specs):
+        self.path = path
+        self.specs = {spec.name: spec for spec in specs}
+        os.makedirs(path, exist_ok=True)
+        for name in self.specs:
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+        self.meta = {"lastBlock": None, "counts": {name: 0 for name in self.specs}}
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        for name in self.specs:
+            self.meta["counts"].setdefault(name, 0)
+            self._truncate(name)
+
+    def _column_path(self, name, column):
+        return os.path.join(self.path, name, column + ".bin")
+
+    def _truncate(self, name):
+        count = self.meta["counts"][name]
+        for column, dtype in columns(self.specs[name]):
+            path = self._column_path(name, column)
+            with open(path, "ab") as f:
+                f.truncate(count * np.dtype(dtype).itemsize)
+
+    @property
+    def lastBlock(self):
+        return self.meta["lastBlock"]
+
+    def append(self, decoded, lastBlock):
+        counts = dict(self.meta["counts"])
+        for name, table in decoded.items():
+            for column, dtype in columns(self.specs[name]):
+                with open(self._column_path(name, column), "ab") as f:
+                    f.write(np.ascontiguousarray(table[column], dtype=dtype).tobytes())
+            counts[name] += len(table["blockNumber"])
+        meta = {"lastBlock": lastBlock, "counts": counts}
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self.meta = meta
+
+    def table(self, name):
+        count = self.meta["counts"][name]
+        table = {}
+        for column, dtype in columns(self.specs[name]):
+            if count == 0:
+                table[column] = np.zeros(0, dtype=dtype)
+            else:
+                table[column] = np.memmap(
+                    self._column_path(name, column),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(count,),
+                )
+        return table
+
+
+class Indexer:
+    def __init__(self, path, factory, from_block=0, chunk_size=2000):
+        self.factory = str(factory)
+        self.from_block = from_block
+        self.chunk_size = chunk_size
+        self.store = ColumnStore(path, FACTORY_EVENTS + VAULT_EVENTS)
+        self._topics = {topic(spec): spec for spec in FACTORY_EVENTS + VAULT_EVENTS}
+
+    @property
+    def lastBlock(self):
+        return self.store.lastBlock
+
+    def table(self, name):
+        return self.store.table(name)
+
+    def vaults(self):
+        return to_addresses(self.table("VaultCreated")["vault"])
+
+    def _get_logs(self, address, specs, from_block, to_block):
+        return web3.eth.get_logs(
+            {
+                "address": address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [[topic(spec).hex() for spec in specs]],
+            }
+        )
+
+    def _decode(self, logs):
+        grouped = {}
+        for log in logs:
+            spec = self._topics[HexBytes(log["topics"][0])]
+            grouped.setdefault(spec.name, []).append(log)
+        return {
+            name: decode_logs(self.store.specs[name], group)
+            for name, group in grouped.items()
+        }
+
+    def _index_range(self, vaults, from_block, to_block):
+        factory_logs = self._get_logs(
+            self.factory, FACTORY_EVENTS, from_block, to_block
+        )
+        decoded = self._decode(factory_logs)
+        if "VaultCreated" in decoded:
+            vaults = vaults + to_addresses(decoded["VaultCreated"]["vault"])
+        vault_logs = []
+        if vaults:
+            vault_logs = self._get_logs(vaults, VAULT_EVENTS, from_block, to_block)
+            decoded.update(self._decode(vault_logs))
+        self.store.append(decoded, to_block)
+        return vaults, len(factory_logs) + len(vault_logs)
+
+    # Indexes from the block after the last indexed one up to `to_block` in
+    # chunks of at most `chunk_size` blocks, committing after every chunk. A
+    # chunk the node refuses (too many results) is retried at half the size.
+    def update(self, to_block=None):
+        if to_block is None:
+            to_block = web3.eth.block_number
+        start = self.from_block if self.lastBlock is None else self.lastBlock + 1
+        vaults = self.vaults()
+        indexed = 0
+        chunk_size = self.chunk_size
+        while start <= to_block:
+            end = min(start + chunk_size - 1, to_block)
+            try:
+                vaults, n = self._index_range(vaults, start, end)
+            except ValueError:
+                if chunk_size == 1:
+                    raise
+                chunk_size = max(chunk_size // 2, 1)
+                continue
+            indexed += n
+            start = end + 1
+        return indexed
@@ -0,0 +1,413 @@
+import asyncio
+import functools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from brownie import LixirStrategySimpleGWAP, chain, interface, web3
+from brownie.convert import to_address
+from brownie.exceptions import VirtualMachineError
+from hexbytes import HexBytes
+from lixir.indexer import topic
+from lixir.observations import POOL_EVENTS
+from lixir.quotes import read_withdraw_states
+from lixir.strat_simp_gwap import RebalancePrediction, VaultData, predictRebalance
+
+Observation = namedtuple(
+    "Observation",
+    [
+        "vault",
+        "pool",
+        "sqrtPriceX96",
+        "tick",
+        "tickSpacing",
+        "ticksCumulative",
+        "timestamp",
+        "vaultData",
+        "blockNumber",
+    ],
+)
+
+Decision = namedtuple("Decision", ["vault", "expectedTick", "revert_msg"])
+
+KeeperResult = namedtuple("KeeperResult", ["vault", "expectedTick", "tx", "revert_msg"])
+
+
+# Reads everything rebalance looks at as of `block` and projects the pool's
+# tick cumulatives forward to `timestamp`, the time the rebalance is expected
+# to be mined at. The projection is exact as long as the tick does not move
+# in between. With a lixir.metadata.VaultMetadata for the vault, the pool and
+# its tick spacing come from it instead of the chain.
+def observe_vault(vault, strat_simp_gwap, block, timestamp, metadata=None):
+    n = block.number
+    vaultData = VaultData(*strat_simp_gwap.vaultDatas(vault, block_identifier=n))
+    if metadata is None:
+        pool = interface.IUniswapV3Pool(vault.activePool(block_identifier=n))
+        tickSpacing = pool.tickSpacing()
+    else:
+        pool = interface.IUniswapV3Pool(metadata.activePool)
+        tickSpacing = metadata.tickSpacing
+    sqrtPriceX96, tick = pool.slot0(block_identifier=n)[:2]
+    lag = timestamp - block.timestamp
+    duration = vaultData.TICK_SHORT_DURATION
+    (shortCumulative, blockCumulative), _ = pool.observe(
+        [max(duration - lag, 0), 0], block_identifier=n
+    )
+    if lag > duration:
+        shortCumulative = blockCumulative + tick * (lag - duration)
+    return Observation(
+        vault,
+        pool,
+        sqrtPriceX96,
+        tick,
+        tickSpacing,
+        (shortCumulative, blockCumulative + tick * lag),
+        timestamp,
+        vaultData,
+        n,
+    )
+
+
+def predict(observation, expectedTick=None):
+    if expectedTick is None:
+        expectedTick = observation.tick
+    return predictRebalance(
+        observation.sqrtPriceX96,
+        observation.tick,
+        expectedTick,
+        observation.ticksCumulative,
+        observation.timestamp,
+        observation.tickSpacing,
+        observation.vaultData,
+    )
+
+
+def _next_timestamp(block):
+    return max(chain.time(), block.timestamp + 1)
+
+
+# Predicts whether strat_simp_gwap.rebalance(vault, expectedTick) would go
+# through if mined at `timestamp` (by default the next block) and with which
+# ticks, or the revert message it would fail with.
+def predict_rebalance(vault, expectedTick=None, timestamp=None, strat_simp_gwap=None):
+    if strat_simp_gwap is None:
+        strat_simp_gwap = LixirStrategySimpleGWAP.at(vault.strategy())
+    block = web3.eth.get_block("latest")
+    if timestamp is None:
+        timestamp = _next_timestamp(block)
+    try:
+        observation = observe_vault(vault, strat_simp_gwap, block, timestamp)
+    except VirtualMachineError as e:
+        return RebalancePrediction(None, None, None, None, e.revert_msg)
+    return predict(observation, expectedTick)
+
+
+# The keeper submits the current tick as expectedTick
+def decide(observation):
+    if isinstance(observation, Decision):
+        return observation
+    prediction = predict(observation)
+    return Decision(observation.vault, observation.tick, prediction.revert_msg)
+
+
+class Keeper:
+    def __init__(
+        self,
+        keeper,
+        strat_simp_gwap,
+        vaults,
+        gas_limit=1500000,
+        gas_price=None,
+        required_confs=1,
+        max_workers=16,
+        metadata=None,
+        scheduler=None,
+        multicall=None,
+    ):
+        self.keeper = keeper
+        self.strat_simp_gwap = strat_simp_gwap
+        self.vaults = list(vaults)
+        self.gas_limit = gas_limit
+        self.gas_price = gas_price
+        self.required_confs = required_confs
+        # a lixir.metadata.MetadataCache, so each cycle only reads the pool
+        # state and vault data that actually change
+        self.metadata = metadata
+        # a lixir.scheduler.RebalanceScheduler, so only vaults whose rebalance
+        # is worth its gas are sent. The vault states it is fed are read
+        # through `multicall` at the block each observation was made at.
+        if scheduler is not None and multicall is None:
+            raise ValueError("a scheduler needs a multicall to read vault states")
+        self.scheduler = scheduler
+        self.multicall = multicall
+        # brownie calls block, so they run on a thread pool and are awaited
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def observe(self, vault, block, timestamp, metadata=None):
+        try:
+            return await self._run(
+                observe_vault, vault, self.strat_simp_gwap, block, timestamp, metadata
+            )
+        except VirtualMachineError as e:
+            return Decision(vault, None, e.revert_msg)
+
+    async def observe_all(self, vaults=None):
+        if vaults is None:
+            vaults = self.vaults
+        block = await self._run(web3.eth.get_block, "latest")
+        timestamp = _next_timestamp(block)
+        metadata = [None] * len(vaults)
+        if self.metadata is not None:
+            await self._run(self.metadata.update, block.number)
+            metadata = await self._run(self.metadata.get_many, vaults)
+        return await asyncio.gather(
+            *(self.observe(v, block, timestamp, m) for v, m in zip(vaults, metadata))
+        )
+
+    # Sends one rebalance per passing decision without waiting on any of them.
+    # Nonces are assigned locally in sequence and gas is fixed so nothing has to
+    # round-trip to the node between sends.
+    async def submit(self, decisions):
+        nonce = await self._run(lambda: self.keeper.nonce)
+        results = []
+        for decision in decisions:
+            if decision.revert_msg is not None:
+                results.append(
+                    KeeperResult(decision.vault, None, None, decision.revert_msg)
+                )
+                continue
+            tx_params = {
+                "from": self.keeper,
+                "nonce": nonce,
+                "gas": self.gas_limit,
+                "required_confs": 0,
+            }
+            if self.gas_price is not None:
+                tx_params["gas_price"] = self.gas_price
+            try:
+                tx = await self._run(
+                    self.strat_simp_gwap.rebalance,
+                    decision.vault,
+                    decision.expectedTick,
+                    tx_params,
+                )
+            except Exception as e:
+                # one failed send must not hold up the other vaults; the node
+                # may or may not have taken the nonce, so ask it again
+                revert_msg = (
+                    e.revert_msg if isinstance(e, VirtualMachineError) else str(e)
+                )
+                results.append(KeeperResult(decision.vault, None, None, revert_msg))
+                nonce = await self._run(lambda: self.keeper.nonce)
+                continue
+            nonce += 1
+            results.append(
+                KeeperResult(decision.vault, decision.expectedTick, tx, None)
+            )
+        return results
+
+    async def confirm(self, results):
+        await asyncio.gather(
+            *(
+                self._run(r.tx.wait, self.required_confs)
+                for r in results
+                if r.tx is not None
+            )
+        )
+        return [
+            (
+                r._replace(revert_msg=r.tx.revert_msg)
+                if r.tx is not None and r.tx.status == 0
+                else r
+            )
+            for r in results
+        ]
+
+    # Observations that failed are kept, so their revert is still reported;
+    # the rest are only kept if the scheduler has them due, best first. Each
+    # vault's state is read at the block it was observed at, so the estimate
+    # never mixes the pool and vault of different blocks.
+    async def schedule(self, observations):
+        observed = [o for o in observations if not isinstance(o, Decision)]
+        byBlock = {}
+        for o in observed:
+            byBlock.setdefault(o.blockNumber, []).append(o)
+        batches = await asyncio.gather(
+            *(
+                self._run(
+                    read_withdraw_states,
+                    self.multicall,
+                    [o.vault for o in batch],
+                    blockNumber,
+                )
+                for blockNumber, batch in byBlock.items()
+            )
+        )
+        for batch, states in zip(byBlock.values(), batches):
+            for observation, state in zip(batch, states):
+                self.scheduler.update(observation, state.vaultState)
+        byVault = {str(o.vault): o for o in observed}
+        return [o for o in observations if isinstance(o, Decision)] + [
+            byVault[e.vault] for e in self.scheduler.due() if e.vault in byVault
+        ]
+
+    async def run_once(self, vaults=None):
+        observations = await self.observe_all(vaults)
+        if self.scheduler is not None:
+            observations = await self.schedule(observations)
+        decisions = [decide(o) for o in observations]
+        return await self.confirm(await self.submit(decisions))
+
+    async def run(self, interval):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+# Revert reasons that clear as the pool's tick cumulatives catch up with the
+# price, so the vault is evaluated again on every block until they do
+TIME_BOUND_REVERTS = ("Tick diff to great",)
+
+
+# The canonical chain as a window of the last `depth` block hashes. `advance`
+# walks back from a new head through parent hashes until it meets a known
+# block, fetching any blocks it skipped, so a reorg is found by a parent hash
+# that does not match the one recorded for its number.
+class BlockFollower:
+    def __init__(self, depth=64):
+        self.depth = depth
+        self.hashes = {}
+
+    # Returns the blocks that became canonical, oldest first, and whether
+    # blocks that were canonical before have been replaced
+    def advance(self, head, get_block=None):
+        if get_block is None:
+            get_block = web3.eth.get_block
+        if not self.hashes:
+            self.hashes[head.number] = HexBytes(head.hash)
+            return ([head], False)
+        if self.hashes.get(head.number) == HexBytes(head.hash):
+            return ([], False)
+        blocks = [head]
+        reorged = False
+        oldest = min(self.hashes)
+        latest = max(self.hashes)
+        while True:
+            block = blocks[-1]
+            parentNumber = block.number - 1
+            if parentNumber < oldest:
+                # deeper than the window, everything known is replaced
+                reorged = True
+                self.hashes.clear()
+                break
+            if parentNumber <= latest:
+                if self.hashes[parentNumber] == HexBytes(block.parentHash):
+                    break
+                reorged = True
+            blocks.append(get_block(block.parentHash))
+        for number in [n for n in self.hashes if n >= blocks[-1].number]:
+            del self.hashes[number]
+        blocks.reverse()
+        for block in blocks:
+            self.hashes[block.number] = HexBytes(block.hash)
+        for number in [n for n in self.hashes if n <= head.number - self.depth]:
+            del self.hashes[number]
+        return (blocks, reorged)
+
+
+# A keeper driven by new blocks instead of a timer. A "latest" filter streams
+# new block hashes; each new canonical block's Swap logs are read by its hash,
+# so logs of blocks a reorg replaced are never mixed in. Only vaults whose
+# pool moved are evaluated again, together with those still waiting on the
+# tick cumulatives; a reorg re-evaluates every vault.
+class EventKeeper(Keeper):
+    def __init__(self, *args, depth=64, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.follower = BlockFollower(depth)
+        self.pending = set()
+        self._filter = None
+        self._pools = {}
+
+    async def _vault_pools(self, vaults):
+        if self.metadata is not None:
+            await self._run(self.metadata.update)
+            metadata = await self._run(self.metadata.get_many, vaults)
+            return {str(v): m.activePool for v, m in zip(vaults, metadata)}
+        missing = [v for v in vaults if str(v) not in self._pools]
+        pools = await asyncio.gather(*(self._run(v.activePool) for v in missing))
+        for vault, pool in zip(missing, pools):
+            self._pools[str(vault)] = to_address(str(pool))
+        return {str(v): self._pools[str(v)] for v in vaults}
+
+    async def evaluate(self, vaults):
+        results = await self.run_once(vaults)
+        for result in results:
+            vault = str(result.vault)
+            if result.revert_msg in TIME_BOUND_REVERTS:
+                self.pending.add(vault)
+            else:
+                self.pending.discard(vault)
+            if result.tx is not None:
+                # a rebalance can move the vault into another fee tier
+                self._pools.pop(vault, None)
+        return results
+
+    async def start(self):
+        self._filter = await self._run(web3.eth.filter, "latest")
+        head = await self._run(web3.eth.get_block, "latest")
+        self.follower.advance(head)
+        return await self.evaluate(self.vaults)
+
+    async def _swapped_pools(self, blocks, pools):
+        spec = POOL_EVENTS[0]
+        logs = await asyncio.gather(
+            *(
+                self._run(
+                    web3.eth.get_logs,
+                    {
+                        "blockHash": HexBytes(block.hash).hex(),
+                        "address": sorted(set(pools)),
+                        "topics": [topic(spec).hex()],
+                    },
+                )
+                for block in blocks
+            )
+        )
+        return {to_address(log["address"]) for entries in logs for log in entries}
+
+    # Handles every block mined since the last step. Returns None when there
+    # was none, otherwise the results of the vaults it evaluated.
+    async def step(self):
+        hashes = await self._run(self._filter.get_new_entries)
+        if not hashes:
+            return None
+        head = await self._run(web3.eth.get_block, hashes[-1])
+        blocks, reorged = await self._run(self.follower.advance, head)
+        if not blocks:
+            return None
+        if reorged:
+            vaults = self.vaults
+        else:
+            pools = await self._vault_pools(self.vaults)
+            moved = await self._swapped_pools(blocks, pools.values())
+            vaults = [
+                v
+                for v in self.vaults
+                if pools[str(v)] in moved or str(v) in self.pending
+            ]
+        if not vaults:
+            return []
+        return await self.evaluate(vaults)
+
+    async def run(self, interval=1):
+        await self.start()
+        while True:
+            if await self.step() is None:
+                await asyncio.sleep(interval)
@@ -0,0 +1,222 @@
+import json
+import os
+from collections import namedtuple
+from brownie import web3
+from brownie.convert import to_address
+from hexbytes import HexBytes
+from lixir.indexer import EventSpec, VAULT_EVENTS, decode_logs, to_addresses, topic
+from lixir.reader import Call, aggregate, decode_result, encode_call
+
+VaultMetadata = namedtuple(
+    "VaultMetadata",
+    [
+        "vault",
+        "token0",
+        "token1",
+        "registry",
+        "strategy",
+        "activeFee",
+        "activePool",
+        "tickSpacing",
+        "TICK_SHORT_DURATION",
+        "MAX_TICK_DIFF",
+        "mainSpread",
+        "rangeSpread",
+    ],
+)
+
+STRATEGY_EVENTS = (
+    EventSpec(
+        "VaultConfigUpdate",
+        "VaultConfigUpdate(address,uint32,int24,int24,int24)",
+        (("vault", "address"),),
+        (
+            ("TICK_SHORT_DURATION", "uint32"),
+            ("MAX_TICK_DIFF", "int24"),
+            ("mainSpread", "int24"),
+            ("rangeSpread", "int24"),
+        ),
+    ),
+)
+
+_VAULT_SPECS = {spec.name: spec for spec in VAULT_EVENTS}
+
+# Fields are cached and invalidated in groups. The tokens and registry never
+# change. StrategySet invalidates the strategy and its config, a Rebalance
+# into another fee tier invalidates the pool and VaultConfigUpdate carries
+# the new config itself.
+STATIC_FIELDS = ("token0", "token1", "registry")
+STRATEGY_FIELDS = (
+    "strategy",
+    "TICK_SHORT_DURATION",
+    "MAX_TICK_DIFF",
+    "mainSpread",
+    "rangeSpread",
+)
+CONFIG_FIELDS = STRATEGY_FIELDS[1:]
+POOL_FIELDS = ("activeFee", "activePool", "tickSpacing")
+
+
+def _vault_calls(vault, fields):
+    calls = []
+    for name in fields:
+        if name in ("token0", "token1", "registry", "strategy", "activePool"):
+            calls.append(Call(vault, name + "()", (), ["address"]))
+        elif name == "activeFee":
+            calls.append(Call(vault, "activeFee()", (), ["uint24"]))
+    return calls
+
+
+def _read(multicall, calls, block_identifier):
+    if multicall is not None:
+        _, results = aggregate(multicall, calls, block_identifier=block_identifier)
+        return results
+    results = []
+    for call in calls:
+        target, data = encode_call(call)
+        returnData = web3.eth.call({"to": target, "data": data}, block_identifier)
+        results.append(decode_result(call, True, returnData))
+    return results
+
+
+# Metadata of many vaults, persisted as JSON at `path` together with the last
+# block its invalidation logs were read up to. `update` replays StrategySet,
+# Rebalance and VaultConfigUpdate logs since then; `get` reads whatever the
+# logs invalidated, as of that block, in at most two batched calls.
+class MetadataCache:
+    def __init__(self, path, multicall=None):
+        self.path = path
+        self.multicall = multicall
+        self.lastBlock = None
+        self.vaults = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.lastBlock = data["lastBlock"]
+            self.vaults = data["vaults"]
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"lastBlock": self.lastBlock, "vaults": self.vaults}, f)
+        os.replace(tmp, self.path)
+
+    def _fill(self, vaults):
+        missing = {
+            v: [f for f in VaultMetadata._fields[1:] if f not in self.vaults[v]]
+            for v in vaults
+        }
+        calls = []
+        for vault, fields in missing.items():
+            calls.extend(_vault_calls(vault, fields))
+        results = iter(_read(self.multicall, calls, self.lastBlock))
+        for vault, fields in missing.items():
+            entry = self.vaults[vault]
+            for call in _vault_calls(vault, fields):
+                entry[call.signature[:-2]] = next(results)[0]
+        # the second round depends on the pool and strategy read above
+        calls = []
+        for vault, fields in missing.items():
+            entry = self.vaults[vault]
+            if "tickSpacing" in fields:
+                calls.append(Call(entry["activePool"], "tickSpacing()", (), ["int24"]))
+            if any(f in fields for f in CONFIG_FIELDS):
+                calls.append(
+                    Call(
+                        entry["strategy"],
+                        "vaultDatas(address)",
+                        (vault,),
+                        ["uint32", "int24", "int24", "int24", "uint32", "int56"],
+                    )
+                )
+        results = iter(_read(self.multicall, calls, self.lastBlock))
+        for vault, fields in missing.items():
+            entry = self.vaults[vault]
+            if "tickSpacing" in fields:
+                entry["tickSpacing"] = next(results)[0]
+            if any(f in fields for f in CONFIG_FIELDS):
+                entry.update(zip(CONFIG_FIELDS, next(results)[:4]))
+
+    def get_many(self, vaults):
+        vaults = [to_address(str(v)) for v in vaults]
+        if self.lastBlock is None:
+            self.lastBlock = web3.eth.block_number
+        for vault in vaults:
+            self.vaults.setdefault(vault, {})
+        stale = [
+            v for v in vaults if len(self.vaults[v]) < len(VaultMetadata._fields) - 1
+        ]
+        if stale:
+            self._fill(stale)
+            self.save()
+        return [VaultMetadata(v, **self.vaults[v]) for v in vaults]
+
+    def get(self, vault):
+        return self.get_many([vault])[0]
+
+    def _invalidate(self, vault, fields):
+        entry = self.vaults.get(vault)
+        if entry is not None:
+            for name in fields:
+                entry.pop(name, None)
+
+    def _get_logs(self, address, specs, from_block, to_block):
+        return web3.eth.get_logs(
+            {
+                "address": address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [[topic(spec).hex() for spec in specs]],
+            }
+        )
+
+    # Applies every invalidating log of the cached vaults from the block after
+    # the last update up to `to_block`, in chain order
+    def update(self, to_block=None):
+        if to_block is None:
+            to_block = web3.eth.block_number
+        if self.lastBlock is None or not self.vaults:
+            self.lastBlock = to_block
+            return 0
+        from_block = self.lastBlock + 1
+        if to_block < from_block:
+            return 0
+        vaults = list(self.vaults)
+        specs = {
+            topic(s): s
+            for s in (_VAULT_SPECS["StrategySet"], _VAULT_SPECS["Rebalance"])
+        }
+        logs = self._get_logs(vaults, list(specs.values()), from_block, to_block)
+        strategies = sorted(
+            {e["strategy"] for e in self.vaults.values() if "strategy" in e}
+        )
+        config = STRATEGY_EVENTS[0]
+        if strategies:
+            logs = logs + self._get_logs(
+                strategies, STRATEGY_EVENTS, from_block, to_block
+            )
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+        for log in logs:
+            t = HexBytes(log["topics"][0])
+            if t == topic(config):
+                row = decode_logs(config, [log])
+                vault = to_addresses(row["vault"])[0]
+                entry = self.vaults.get(vault)
+                # only the strategy the vault uses configures it
+                strategy = to_address(log["address"])
+                if entry is None or entry.get("strategy") != strategy:
+                    continue
+                for name in CONFIG_FIELDS:
+                    entry[name] = int(row[name][0])
+                continue
+            vault = to_address(log["address"])
+            spec = specs[t]
+            if spec.name == "StrategySet":
+                self._invalidate(vault, STRATEGY_FIELDS)
+            else:
+                newFee = int(decode_logs(spec, [log])["newFee"][0])
+                if self.vaults[vault].get("activeFee") != newFee:
+                    self._invalidate(vault, POOL_FIELDS)
+        self.lastBlock = to_block
+        self.save()
+        return len(logs)
@@ -0,0 +1,153 @@
+from lixir.errors import require
+from lixir.simulator import mintPositions
+from lixir.totals import Position, VaultState
+from lixir.v3_math import (
+    MAX_UINT256,
+    getAmountsForLiquidity,
+    getLiquidityForAmounts,
+    getSqrtRatioAtTick,
+    mulDiv,
+    mulDivRoundingUp,
+)
+
+
+# LixirVault.mulDivRoundingUp, which also reports whether it rounded
+def mulDivRoundingUpFlag(a, b, denominator):
+    result = mulDiv(a, b, denominator)
+    if a * b % denominator > 0:
+        require(result < MAX_UINT256)
+        return (True, result + 1)
+    return (False, result)
+
+
+# LixirVault.calcSharesAndAmounts
+def calcSharesAndAmounts(amount0Desired, amount1Desired, total0, total1, totalSupply):
+    roundedSharesFrom0, sharesFrom0 = (
+        mulDivRoundingUpFlag(amount0Desired, totalSupply, total0)
+        if 0 < total0
+        else (False, 0)
+    )
+    roundedSharesFrom1, sharesFrom1 = (
+        mulDivRoundingUpFlag(amount1Desired, totalSupply, total1)
+        if 0 < total1
+        else (False, 0)
+    )
+    realSharesOffsetFor0 = 1 if roundedSharesFrom0 else 2
+    realSharesOffsetFor1 = 1 if roundedSharesFrom1 else 2
+    if realSharesOffsetFor0 < sharesFrom0 and (
+        total1 == 0 or sharesFrom0 < sharesFrom1
+    ):
+        shares = sharesFrom0 - 1 - realSharesOffsetFor0
+        amount0In = amount0Desired
+        amount1In = mulDivRoundingUp(sharesFrom0, total1, totalSupply)
+    else:
+        require(realSharesOffsetFor1 < sharesFrom1, "INPUT_AMOUNT")
+        shares = sharesFrom1 - 1 - realSharesOffsetFor1
+        amount0In = mulDivRoundingUp(sharesFrom1, total0, totalSupply)
+        amount1In = amount1Desired
+    require(amount0In <= amount0Desired, "OUTPUT_AMOUNT")
+    require(amount1In <= amount1Desired, "OUTPUT_AMOUNT")
+    return (shares, amount0In, amount1In)
+
+
+# LixirVault.calculateInitialDeposit
+def calculateInitialDeposit(sqrtRatioX96, mainPosition, amount0Desired, amount1Desired):
+    sqrtRatioLowerX96 = getSqrtRatioAtTick(mainPosition[0])
+    sqrtRatioUpperX96 = getSqrtRatioAtTick(mainPosition[1])
+    mLDelta = getLiquidityForAmounts(
+        sqrtRatioX96,
+        sqrtRatioLowerX96,
+        sqrtRatioUpperX96,
+        amount0Desired,
+        amount1Desired,
+    )
+    require(0 < mLDelta, "INPUT_AMOUNT")
+    amount0In, amount1In = getAmountsForLiquidity(
+        sqrtRatioX96, sqrtRatioLowerX96, sqrtRatioUpperX96, mLDelta
+    )
+    return (mLDelta, mLDelta, amount0In, amount1In)
+
+
+# Exact model of the share and liquidity accounting of one LixirVault. Fees
+# accrue in the pool rather than in the model, so totals come from
+# lixir.totals over the observed pool state with the model's liquidity.
+class VaultModel:
+    def __init__(self, mainPosition=(0, 0), rangePosition=(0, 0)):
+        self.mainPosition = tuple(mainPosition)
+        self.rangePosition = tuple(rangePosition)
+        self.mL = 0
+        self.rL = 0
+        self.totalSupply = 0
+        self.balances = {}
+
+    def balanceOf(self, account):
+        return self.balances.get(str(account), 0)
+
+    def _mint(self, account, shares):
+        self.balances[str(account)] = self.balanceOf(account) + shares
+        self.totalSupply += shares
+
+    # LixirVault._depositStepOne; returns (shares, amount0In, amount1In)
+    def deposit(
+        self, recipient, amount0Desired, amount1Desired, sqrtRatioX96, total0, total1
+    ):
+        if self.totalSupply == 0:
+            shares, mLDelta, amount0In, amount1In = calculateInitialDeposit(
+                sqrtRatioX96, self.mainPosition, amount0Desired, amount1Desired
+            )
+            rLDelta = 0
+        else:
+            shares, amount0In, amount1In = calcSharesAndAmounts(
+                amount0Desired, amount1Desired, total0, total1, self.totalSupply
+            )
+            mLDelta = mulDiv(self.mL, shares, self.totalSupply)
+            rLDelta = mulDiv(self.rL, shares, self.totalSupply)
+        self.mL += mLDelta
+        self.rL += rLDelta
+        self._mint(recipient, shares)
+        return (shares, amount0In, amount1In)
+
+    # LixirVault._withdrawStep
+    def withdraw(self, owner, shares):
+        balance = self.balanceOf(owner)
+        require(shares <= balance, "BALANCE")
+        if shares == self.totalSupply:
+            self.mL = 0
+            self.rL = 0
+        else:
+            self.mL -= mulDiv(shares, self.mL, self.totalSupply)
+            self.rL -= mulDiv(shares, self.rL, self.totalSupply)
+        self.balances[str(owner)] = balance - shares
+        self.totalSupply -= shares
+
+    # LixirVault.rebalance, given what it collected: total0/total1 are the
+    # vault's balances after burning and collecting everything
+    def rebalance(
+        self,
+        sqrtRatioX96,
+        total0,
+        total1,
+        mainTicks,
+        rangeTicks0,
+        rangeTicks1,
+        feeTo=None,
+        sharesMinted=0,
+    ):
+        if 0 < sharesMinted:
+            self._mint(feeTo, sharesMinted)
+        self.mL, rangePosition, self.rL, _, _ = mintPositions(
+            sqrtRatioX96, total0, total1, mainTicks, rangeTicks0, rangeTicks1
+        )
+        self.mainPosition = tuple(mainTicks)
+        self.rangePosition = rangePosition
+
+    # The state lixir.totals.calculateTotals needs, with the position liquidity
+    # the model expects in place of the one read from the pool
+    def vaultState(self, pool, mainInfo, rangeInfo, balance0, balance1):
+        return VaultState(
+            pool,
+            Position(*self.mainPosition, mainInfo._replace(liquidity=self.mL)),
+            Position(*self.rangePosition, rangeInfo._replace(liquidity=self.rL)),
+            balance0,
+            balance1,
+        )
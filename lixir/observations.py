@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from brownie import web3
+from brownie.convert import to_address
+from lixir.errors import require
+from lixir.indexer import EventSpec, decode_logs, topic
+from lixir.reader import Call, aggregate
+from lixir.strat_simp_gwap import timeWeightedTick
+
+POOL_EVENTS = (
+    EventSpec(
+        "Swap",
+        "Swap(address,address,int256,int256,uint160,uint128,int24)",
+        (("sender", "address"), ("recipient", "address")),
+        (
+            ("amount0", "int256"),
+            ("amount1", "int256"),
+            ("sqrtPriceX96", "uint160"),
+            ("liquidity", "uint128"),
+            ("tick", "int24"),
+        ),
+    ),
+)
+
+
+# Solidity's signed division, which truncates towards zero
+def _div(a, b):
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+# The tick cumulatives of one UniswapV3Pool, rebuilt once from its observation
+# ring buffer and then kept current from its Swap logs alone. Only swaps move
+# the tick, and the pool writes an observation with the tick from before the
+# first swap of every block, so replaying the swaps writes the same
+# cumulatives the pool does and `observe` answers exactly what the pool
+# would. Observations are never evicted, so windows older than the pool still
+# holds keep being answered.
+class ObservationCache:
+    def __init__(self, pool):
+        self.pool = to_address(str(pool))
+        self.timestamps = []
+        self.tickCumulatives = []
+        self.tick = None
+        self.lastBlock = None
+        self.lastTimestamp = None
+
+    # Reads slot0 and every slot of the ring buffer, as of one block
+    def ingest(self, multicall, block_identifier=None):
+        slot0 = Call(
+            self.pool,
+            "slot0()",
+            (),
+            ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"],
+        )
+        blockNumber, (result,) = aggregate(
+            multicall, [slot0], block_identifier=block_identifier
+        )
+        _, tick, _, cardinality = result[:4]
+        calls = [
+            Call(
+                self.pool,
+                "observations(uint256)",
+                (i,),
+                ["uint32", "int56", "uint160", "bool"],
+            )
+            for i in range(cardinality)
+        ]
+        _, results = aggregate(multicall, calls, block_identifier=blockNumber)
+        observations = sorted(
+            (timestamp, tickCumulative)
+            for timestamp, tickCumulative, _, initialized in results
+            if initialized
+        )
+        self.timestamps = [o[0] for o in observations]
+        self.tickCumulatives = [o[1] for o in observations]
+        self.tick = tick
+        self.lastBlock = blockNumber
+        self.lastTimestamp = web3.eth.get_block(blockNumber).timestamp
+        return len(observations)
+
+    # Uniswap's Oracle.write, minus the ring buffer: one observation per
+    # block, carrying the tick in force before the block's first swap
+    def write(self, timestamp, tick):
+        last = self.timestamps[-1]
+        if timestamp != last:
+            self.timestamps.append(timestamp)
+            self.tickCumulatives.append(
+                self.tickCumulatives[-1] + self.tick * (timestamp - last)
+            )
+        self.tick = tick
+
+    # Replays the pool's Swap logs from the block after the last update up to
+    # `to_block`, in chain order
+    def update(self, to_block=None):
+        if to_block is None:
+            to_block = web3.eth.block_number
+        from_block = self.lastBlock + 1
+        if to_block < from_block:
+            return 0
+        spec = POOL_EVENTS[0]
+        logs = web3.eth.get_logs(
+            {
+                "address": self.pool,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [topic(spec).hex()],
+            }
+        )
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+        if logs:
+            timestamps = {}
+            swaps = decode_logs(spec, logs)
+            for blockNumber, tick in zip(swaps["blockNumber"], swaps["tick"]):
+                blockNumber = int(blockNumber)
+                if blockNumber not in timestamps:
+                    timestamps[blockNumber] = web3.eth.get_block(blockNumber).timestamp
+                self.write(timestamps[blockNumber], int(tick))
+        self.lastBlock = to_block
+        self.lastTimestamp = web3.eth.get_block(to_block).timestamp
+        return len(logs)
+
+    # Uniswap's Oracle.observeSingle: the cumulative at `target`, extrapolated
+    # with the current tick past the newest observation and interpolated,
+    # truncating as the contract does, between two older ones
+    def tickCumulative(self, target):
+        timestamps = self.timestamps
+        if target >= timestamps[-1]:
+            return self.tickCumulatives[-1] + self.tick * (target - timestamps[-1])
+        require(target >= timestamps[0], "OLD")
+        i = bisect_left(timestamps, target)
+        if timestamps[i] == target:
+            return self.tickCumulatives[i]
+        beforeOrAt, atOrAfter = timestamps[i - 1], timestamps[i]
+        return self.tickCumulatives[i - 1] + _div(
+            self.tickCumulatives[i] - self.tickCumulatives[i - 1],
+            atOrAfter - beforeOrAt,
+        ) * (target - beforeOrAt)
+
+    # IUniswapV3Pool.observe's tickCumulatives as of `time`, by default the
+    # timestamp of the last block updated to
+    def observe(self, secondsAgos, time=None):
+        if time is None:
+            time = self.lastTimestamp
+        return [self.tickCumulative(time - s) for s in secondsAgos]
+
+    # The time weighted tick over the `secondsAgo` seconds before `time`,
+    # rounded towards negative infinity as the strategy does
+    def gwap(self, secondsAgo, time=None):
+        start, end = self.observe([secondsAgo, 0], time)
+        return timeWeightedTick(end - start, secondsAgo)
@@ -1,4 +1,115 @@
+from functools import lru_cache
 from brownie import web3
+from hexbytes import HexBytes
+from lixir.totals import PositionInfo, TickInfo
+
+# UniswapV3Pool storage layout (v3-core 1.0.0): slot0, feeGrowthGlobal0X128,
+# feeGrowthGlobal1X128, protocolFees and liquidity precede these mappings
+TICKS_SLOT = 5
+POSITIONS_SLOT = 7
+
+_MAX_UINT128 = (1 << 128) - 1
+
+
+@lru_cache(maxsize=4096)
+def _position_key(owner, tickLower, tickUpper):
+    return web3.keccak(
+        owner.to_bytes(20, "big")
+        + tickLower.to_bytes(3, "big", signed=True)
+        + tickUpper.to_bytes(3, "big", signed=True)
+    )
+
 
 def position_key(address, tickLower, tickUpper):
-    return web3.keccak(int(address, 16).to_bytes(20,'big') + tickLower.to_bytes(3, 'big') + tickUpper.to_bytes(3, 'big'))
+    return _position_key(int(str(address), 16), int(tickLower), int(tickUpper))
+
+
+def position_keys(owners, tickLowers, tickUppers):
+    return [position_key(*p) for p in zip(owners, tickLowers, tickUppers)]
+
+
+def mapping_slot(key, slot):
+    return int.from_bytes(web3.keccak(bytes(key) + slot.to_bytes(32, "big")), "big")
+
+
+# Position.Info: liquidity, feeGrowthInside0LastX128, feeGrowthInside1LastX128
+# and tokensOwed0/tokensOwed1 packed in the last word
+@lru_cache(maxsize=4096)
+def _position_slot(owner, tickLower, tickUpper):
+    return mapping_slot(_position_key(owner, tickLower, tickUpper), POSITIONS_SLOT)
+
+
+def position_slot(address, tickLower, tickUpper):
+    return _position_slot(int(str(address), 16), int(tickLower), int(tickUpper))
+
+
+def position_slots(owners, tickLowers, tickUppers):
+    slots = []
+    for p in zip(owners, tickLowers, tickUppers):
+        slot = position_slot(*p)
+        slots.extend(range(slot, slot + 4))
+    return slots
+
+
+def decode_position(words):
+    liquidity, feeGrowthInside0LastX128, feeGrowthInside1LastX128, tokensOwed = words
+    return PositionInfo(
+        liquidity & _MAX_UINT128,
+        feeGrowthInside0LastX128,
+        feeGrowthInside1LastX128,
+        tokensOwed & _MAX_UINT128,
+        tokensOwed >> 128,
+    )
+
+
+# Tick.Info: only feeGrowthOutside0X128 and feeGrowthOutside1X128, one and two
+# words past the start of the struct, are needed for fee growth
+@lru_cache(maxsize=4096)
+def tick_slot(tick):
+    return mapping_slot(int(tick).to_bytes(32, "big", signed=True), TICKS_SLOT)
+
+
+def tick_slots(ticks):
+    slots = []
+    for tick in ticks:
+        slot = tick_slot(tick)
+        slots.extend((slot + 1, slot + 2))
+    return slots
+
+
+def decode_tick(words):
+    return TickInfo(*words)
+
+
+def _to_int(value):
+    return value if isinstance(value, int) else int.from_bytes(HexBytes(value), "big")
+
+
+# Reads many storage slots of one contract. eth_getProof returns them all in a
+# single request; nodes without it fall back to one eth_getStorageAt per slot.
+def read_slots(address, slots, block_identifier="latest", proof=True):
+    address = str(address)
+    if proof and slots:
+        try:
+            result = web3.eth.get_proof(address, slots, block_identifier)
+            return [_to_int(p["value"]) for p in result["storageProof"]]
+        except ValueError:
+            pass
+    return [
+        _to_int(web3.eth.get_storage_at(address, slot, block_identifier))
+        for slot in slots
+    ]
+
+
+def read_positions(pool, positions, block_identifier="latest", proof=True):
+    owners, tickLowers, tickUppers = zip(*positions) if positions else ((), (), ())
+    words = read_slots(
+        pool, position_slots(owners, tickLowers, tickUppers), block_identifier, proof
+    )
+    return [decode_position(words[i : i + 4]) for i in range(0, len(words), 4)]
+
+
+def read_ticks(pool, ticks, block_identifier="latest", proof=True):
+    ticks = sorted(set(ticks))
+    words = read_slots(pool, tick_slots(ticks), block_identifier, proof)
+    return {t: decode_tick(words[2 * i : 2 * i + 2]) for i, t in enumerate(ticks)}
@@ -0,0 +1,264 @@
+import argparse
+import html
+import os
+import sys
+import zlib
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+CALL_OPS = ("CALL", "CALLCODE", "DELEGATECALL", "STATICCALL", "CREATE", "CREATE2")
+
+Profile = namedtuple(
+    "Profile", ["total", "functions", "lines", "opcodes", "stacks", "calls"]
+)
+
+
+# Gas each step of a brownie trace (`tx.trace`, expanded from
+# debug_traceTransaction) costs on its own. A step's cost is the drop in
+# remaining gas to the next step in the same frame. A call step is charged
+# what the call cost in total less everything its callee's steps are charged,
+# so the callee's work is only counted once, in the callee.
+def step_costs(trace):
+    costs = [0] * len(trace)
+    # [call step index, gas charged inside the callee so far]
+    frames = []
+    for i, step in enumerate(trace):
+        nxt = trace[i + 1] if i + 1 < len(trace) else None
+        if nxt is not None and nxt["depth"] > step["depth"]:
+            frames.append([i, 0])
+            continue
+        if nxt is not None and nxt["depth"] == step["depth"]:
+            cost = step["gas"] - nxt["gas"]
+        else:
+            cost = step["gasCost"]
+        costs[i] = cost
+        if frames:
+            frames[-1][1] += cost
+        if nxt is not None and nxt["depth"] < step["depth"]:
+            call, inner = frames.pop()
+            inclusive = trace[call]["gas"] - nxt["gas"]
+            costs[call] = inclusive - inner
+            if frames:
+                frames[-1][1] += inclusive
+    return costs
+
+
+def _frame_name(step):
+    fn = step.get("fn")
+    if fn:
+        return fn
+    return "%s.<fallback>" % (step.get("contractName") or step.get("address"))
+
+
+# The internal call stack at every step: the external frames, outermost
+# first, each followed by the internal functions brownie resolved from the
+# jump depth within it
+def step_stacks(trace):
+    internal = {}
+    stacks = []
+    for step in trace:
+        depth = step["depth"]
+        for d in [d for d in internal if d > depth]:
+            del internal[d]
+        fns = internal.setdefault(depth, [])
+        jumpDepth = step.get("jumpDepth", 0)
+        del fns[jumpDepth:]
+        fns.extend([fns[-1] if fns else _frame_name(step)] * (jumpDepth - len(fns)))
+        fns.append(_frame_name(step))
+        stacks.append(
+            tuple(
+                fn
+                for d in sorted(internal)
+                for i, fn in enumerate(internal[d])
+                # consecutive steps inside one function repeat the name
+                if i == 0 or fn != internal[d][i - 1]
+            )
+        )
+    return stacks
+
+
+@lru_cache(maxsize=None)
+def _line_starts(path):
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+    except OSError:
+        return None
+    starts = [0]
+    for i, c in enumerate(source):
+        if c == 10:
+            starts.append(i + 1)
+    return starts
+
+
+def _bisect(starts, offset):
+    lo, hi = 0, len(starts)
+    while lo + 1 < hi:
+        mid = (lo + hi) // 2
+        if starts[mid] <= offset:
+            lo = mid
+        else:
+            hi = mid
+    return lo + 1
+
+
+def source_line(step, root="."):
+    source = step.get("source")
+    if not source:
+        return None
+    filename = source["filename"]
+    starts = _line_starts(os.path.join(root, filename))
+    if starts is None:
+        return "%s:@%d" % (filename, source["offset"][0])
+    return "%s:%d" % (filename, _bisect(starts, source["offset"][0]))
+
+
+# Attributes the gas of a traced transaction to the innermost function
+# (exclusive), every function on the stack (inclusive stacks), source lines
+# and opcodes. `calls` counts gas per external call target and opcode.
+def profile_trace(trace, root="."):
+    costs = step_costs(trace)
+    stacks = step_stacks(trace)
+    functions = Counter()
+    lines = Counter()
+    opcodes = Counter()
+    folded = Counter()
+    calls = Counter()
+    for step, cost, stack in zip(trace, costs, stacks):
+        if cost == 0:
+            continue
+        functions[stack[-1]] += cost
+        line = source_line(step, root)
+        if line is not None:
+            lines[line] += cost
+        opcodes[step["op"]] += cost
+        folded[stack] += cost
+        if step["op"] in CALL_OPS:
+            calls[(stack[-1], step["op"])] += cost
+    return Profile(sum(costs), functions, lines, opcodes, folded, calls)
+
+
+def profile_tx(tx, root="."):
+    return profile_trace(tx.trace, root)
+
+
+# Brendan Gregg's folded stack format, readable by flamegraph.pl, inferno and
+# speedscope
+def folded_stacks(profile):
+    return "\n".join(
+        "%s %d" % (";".join(stack), gas)
+        for stack, gas in sorted(profile.stacks.items())
+    )
+
+
+def format_top(counter, total, n=20):
+    lines = []
+    for name, gas in counter.most_common(n):
+        if isinstance(name, tuple):
+            name = " ".join(name)
+        lines.append("%10d %6.2f%%  %s" % (gas, 100 * gas / max(total, 1), name))
+    return "\n".join(lines)
+
+
+def _tree(stacks):
+    root = {"gas": 0, "children": {}}
+    for stack, gas in stacks.items():
+        root["gas"] += gas
+        node = root
+        for name in stack:
+            node = node["children"].setdefault(name, {"gas": 0, "children": {}})
+            node["gas"] += gas
+    return root
+
+
+def _color(name):
+    h = zlib.crc32(name.encode())
+    return "rgb(%d,%d,%d)" % (205 + h % 50, 80 + (h >> 8) % 130, (h >> 16) % 55)
+
+
+# Renders folded stacks as a static SVG flame graph, callers at the bottom.
+# Every frame's width is its inclusive gas and its tooltip gives the amount.
+def flame_graph_svg(stacks, title="gas", width=1200, frame_height=16):
+    root = _tree(stacks)
+    total = max(root["gas"], 1)
+    rects = []
+
+    def layout(node, x, depth):
+        for name, child in sorted(node["children"].items()):
+            w = child["gas"] * width / total
+            if w >= 0.1:
+                rects.append((name, child["gas"], x, depth, w))
+                layout(child, x, depth + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    max_depth = max((r[3] for r in rects), default=0) + 1
+    height = (max_depth + 2) * frame_height
+    out = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+        'font-family="monospace" font-size="11">' % (width, height),
+        '<text x="%d" y="%d" text-anchor="middle">%s (%d gas)</text>'
+        % (width // 2, frame_height - 4, html.escape(title), root["gas"]),
+    ]
+    for name, gas, x, depth, w in rects:
+        y = height - (depth + 1) * frame_height
+        label = html.escape(name)
+        out.append(
+            "<g><title>%s: %d gas (%.2f%%)</title>"
+            '<rect x="%.1f" y="%d" width="%.1f" height="%d" fill="%s"/>'
+            % (label, gas, 100 * gas / total, x, y, w, frame_height - 1, _color(name))
+        )
+        # about 7px per character at this font size
+        chars = int(w // 7)
+        if chars >= 3:
+            text = name if len(name) <= chars else name[: chars - 2] + ".."
+            out.append(
+                '<text x="%.1f" y="%d">%s</text>'
+                % (x + 2, y + frame_height - 4, html.escape(text))
+            )
+        out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def write_flame_graph(profile, path, title="gas"):
+    with open(path, "w") as f:
+        f.write(flame_graph_svg(profile.stacks, title))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Attribute the gas of a transaction to functions, lines and opcodes"
+    )
+    parser.add_argument("txid")
+    parser.add_argument("--network", default="development")
+    parser.add_argument("--project", default=".")
+    parser.add_argument("--svg", default=None)
+    parser.add_argument("--folded", default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+    from brownie import chain, network, project
+
+    project.load(args.project)
+    network.connect(args.network)
+    tx = chain.get_transaction(args.txid)
+    profile = profile_tx(tx, args.project)
+    print("%s: %d gas traced of %d used" % (args.txid, profile.total, tx.gas_used))
+    for heading, counter in (
+        ("functions (exclusive)", profile.functions),
+        ("source lines", profile.lines),
+        ("opcodes", profile.opcodes),
+        ("external calls", profile.calls),
+    ):
+        print("\n" + heading)
+        print(format_top(counter, profile.total, args.top))
+    if args.folded:
+        with open(args.folded, "w") as f:
+            f.write(folded_stacks(profile) + "\n")
+    if args.svg:
+        write_flame_graph(profile, args.svg, args.txid)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+from collections import namedtuple
+from lixir.errors import Revert, require
+from lixir.model import calcSharesAndAmounts, calculateInitialDeposit
+from lixir.positions import position_key
+from lixir.reader import Call, aggregate
+from lixir.totals import (
+    PoolState,
+    Position,
+    PositionInfo,
+    TickInfo,
+    VaultState,
+    liquidityAndTokensOwed,
+)
+from lixir.v3_math import (
+    getAmount0Delta,
+    getAmount1Delta,
+    getSqrtRatioAtTick,
+    mulDiv,
+    toUint128,
+)
+
+# Everything LixirVault._depositStepOne reads, from one block. wethToken is
+# LixirVaultETH.WETH_TOKEN (0 or 1) or None for an ERC20 only vault.
+DepositState = namedtuple(
+    "DepositState",
+    [
+        "vault",
+        "blockNumber",
+        "sqrtPriceX96",
+        "mainPosition",
+        "total0",
+        "total1",
+        "totalSupply",
+        "wethToken",
+    ],
+)
+
+DepositQuote = namedtuple(
+    "DepositQuote", ["shares", "amount0In", "amount1In", "revert_msg"]
+)
+
+# LixirVaultETH.depositETH; refund is the part of msg.value sent back
+ETHDepositQuote = namedtuple(
+    "ETHDepositQuote", ["shares", "amountEthIn", "amountIn", "refund", "revert_msg"]
+)
+
+
+def deposit_state_calls(vault, pool):
+    vault = str(vault)
+    return [
+        Call(pool, "slot0()", (), ["uint160", "int24"]),
+        Call(vault, "mainPosition()", (), ["int24", "int24"]),
+        Call(
+            vault, "calculateTotals()", (), ["uint256", "uint256", "uint128", "uint128"]
+        ),
+        Call(vault, "totalSupply()", (), ["uint256"]),
+        # reverts, and so reads as None, on vaults without ETH support
+        Call(vault, "WETH_TOKEN()", (), ["uint8"]),
+    ]
+
+
+# Reads the deposit state of every vault, each with its active pool, in one
+# multicall batch
+def read_deposit_states(multicall, vaults, pools, block_identifier=None):
+    calls = []
+    for vault, pool in zip(vaults, pools):
+        calls.extend(deposit_state_calls(vault, str(pool)))
+    blockNumber, results = aggregate(
+        multicall, calls, block_identifier=block_identifier
+    )
+    states = []
+    for i, vault in enumerate(vaults):
+        slot0, mainPosition, totals, totalSupply, wethToken = results[5 * i : 5 * i + 5]
+        states.append(
+            DepositState(
+                str(vault),
+                blockNumber,
+                slot0[0],
+                mainPosition,
+                totals[0],
+                totals[1],
+                totalSupply[0],
+                None if wethToken is None else wethToken[0],
+            )
+        )
+    return states
+
+
+def read_deposit_state(multicall, vault, pool, block_identifier=None):
+    return read_deposit_states(multicall, [vault], [pool], block_identifier)[0]
+
+
+# Quotes deposits against one DepositState exactly as the vault would execute
+# them at that state
+class DepositQuoter:
+    def __init__(self, state):
+        self.state = state
+
+    # LixirVault._depositStepOne
+    def _depositStepOne(self, amount0Desired, amount1Desired, amount0Min, amount1Min):
+        state = self.state
+        if state.totalSupply == 0:
+            shares, _, amount0In, amount1In = calculateInitialDeposit(
+                state.sqrtPriceX96, state.mainPosition, amount0Desired, amount1Desired
+            )
+        else:
+            shares, amount0In, amount1In = calcSharesAndAmounts(
+                amount0Desired,
+                amount1Desired,
+                state.total0,
+                state.total1,
+                state.totalSupply,
+            )
+        require(amount0Min <= amount0In and amount1Min <= amount1In, "OUTPUT_AMOUNT")
+        return (shares, amount0In, amount1In)
+
+    def quote(self, amount0Desired, amount1Desired, amount0Min=0, amount1Min=0):
+        try:
+            return DepositQuote(
+                *self._depositStepOne(
+                    amount0Desired, amount1Desired, amount0Min, amount1Min
+                ),
+                None,
+            )
+        except Revert as e:
+            return DepositQuote(None, None, None, e.revert_msg)
+
+    # `value` is the ETH sent with depositETH
+    def quote_eth(self, amountDesired, value, amountEthMin=0, amountMin=0):
+        wethToken = self.state.wethToken
+        if wethToken is None:
+            return ETHDepositQuote(None, None, None, None, "")
+        try:
+            if wethToken == 0:
+                shares, amountEthIn, amountIn = self._depositStepOne(
+                    value, amountDesired, amountEthMin, amountMin
+                )
+            else:
+                shares, amountIn, amountEthIn = self._depositStepOne(
+                    amountDesired, value, amountMin, amountEthMin
+                )
+        except Revert as e:
+            return ETHDepositQuote(None, None, None, None, e.revert_msg)
+        return ETHDepositQuote(shares, amountEthIn, amountIn, value - amountEthIn, None)
+
+    def quote_many(self, amounts):
+        return [self.quote(*a) for a in amounts]
+
+
+# Everything LixirVault._withdrawStep reads, from one block
+WithdrawState = namedtuple(
+    "WithdrawState", ["vault", "blockNumber", "vaultState", "totalSupply"]
+)
+
+# headroom0/headroom1 are how far the amounts out clear amount0Min/amount1Min;
+# a negative headroom is what makes the withdraw revert with OUTPUT_AMOUNT
+WithdrawQuote = namedtuple(
+    "WithdrawQuote",
+    ["shares", "amount0Out", "amount1Out", "headroom0", "headroom1", "revert_msg"],
+)
+
+_POSITION_OUTPUTS = ["uint128", "uint256", "uint256", "uint128", "uint128"]
+_TICK_OUTPUTS = [
+    "uint128",
+    "int128",
+    "uint256",
+    "uint256",
+    "int56",
+    "uint160",
+    "uint32",
+    "bool",
+]
+
+
+def _withdraw_vault_calls(vault):
+    return [
+        Call(vault, "activePool()", (), ["address"]),
+        Call(vault, "token0()", (), ["address"]),
+        Call(vault, "token1()", (), ["address"]),
+        Call(vault, "mainPosition()", (), ["int24", "int24"]),
+        Call(vault, "rangePosition()", (), ["int24", "int24"]),
+        Call(vault, "totalSupply()", (), ["uint256"]),
+    ]
+
+
+def _withdraw_pool_calls(vault, pool, token0, token1, mainPosition, rangePosition):
+    return (
+        [
+            Call(pool, "slot0()", (), ["uint160", "int24"]),
+            Call(pool, "feeGrowthGlobal0X128()", (), ["uint256"]),
+            Call(pool, "feeGrowthGlobal1X128()", (), ["uint256"]),
+            Call(token0, "balanceOf(address)", (vault,), ["uint256"]),
+            Call(token1, "balanceOf(address)", (vault,), ["uint256"]),
+        ]
+        + [
+            Call(
+                pool,
+                "positions(bytes32)",
+                (bytes(position_key(vault, *ticks)),),
+                _POSITION_OUTPUTS,
+            )
+            for ticks in (mainPosition, rangePosition)
+        ]
+        + [
+            Call(pool, "ticks(int24)", (tick,), _TICK_OUTPUTS)
+            for tick in mainPosition + rangePosition
+        ]
+    )
+
+
+# Reads the withdraw state of every vault in two multicall rounds, the second
+# pinned to the block of the first: the vaults' pools and positions, then the
+# pool state, positions and balances they point to
+def read_withdraw_states(multicall, vaults, block_identifier=None):
+    vaults = [str(v) for v in vaults]
+    calls = []
+    for vault in vaults:
+        calls.extend(_withdraw_vault_calls(vault))
+    blockNumber, results = aggregate(
+        multicall, calls, block_identifier=block_identifier
+    )
+    n = len(calls) // max(len(vaults), 1)
+    calls = []
+    for i, vault in enumerate(vaults):
+        (pool,), (token0,), (token1,), mainPosition, rangePosition, _ = results[
+            i * n : (i + 1) * n
+        ]
+        calls.extend(
+            _withdraw_pool_calls(
+                vault, pool, token0, token1, mainPosition, rangePosition
+            )
+        )
+    _, pool_results = aggregate(multicall, calls, block_identifier=blockNumber)
+    m = len(calls) // max(len(vaults), 1)
+    states = []
+    for i, vault in enumerate(vaults):
+        _, _, _, mainPosition, rangePosition, (totalSupply,) = results[
+            i * n : (i + 1) * n
+        ]
+        (
+            slot0,
+            (feeGrowthGlobal0X128,),
+            (feeGrowthGlobal1X128,),
+            (balance0,),
+            (balance1,),
+            mainInfo,
+            rangeInfo,
+            *ticks,
+        ) = pool_results[i * m : (i + 1) * m]
+        pool = PoolState(
+            slot0[0],
+            slot0[1],
+            feeGrowthGlobal0X128,
+            feeGrowthGlobal1X128,
+            {
+                t: TickInfo(*info[2:4])
+                for t, info in zip(mainPosition + rangePosition, ticks)
+            },
+        )
+        vaultState = VaultState(
+            pool,
+            Position(*mainPosition, PositionInfo(*mainInfo)),
+            Position(*rangePosition, PositionInfo(*rangeInfo)),
+            balance0,
+            balance1,
+        )
+        states.append(WithdrawState(vault, blockNumber, vaultState, totalSupply))
+    return states
+
+
+# UniswapV3Pool.burn: what burning `liquidity` pays out, rounded down. The
+# pool decides which side of the range the price is on by its tick.
+def _burnAmounts(pool, tickLower, tickUpper, liquidity):
+    sqrtRatioLowerX96 = getSqrtRatioAtTick(tickLower)
+    sqrtRatioUpperX96 = getSqrtRatioAtTick(tickUpper)
+    if pool.tick < tickLower:
+        return (
+            getAmount0Delta(sqrtRatioLowerX96, sqrtRatioUpperX96, liquidity, False),
+            0,
+        )
+    if pool.tick < tickUpper:
+        return (
+            getAmount0Delta(pool.sqrtPriceX96, sqrtRatioUpperX96, liquidity, False),
+            getAmount1Delta(sqrtRatioLowerX96, pool.sqrtPriceX96, liquidity, False),
+        )
+    return (0, getAmount1Delta(sqrtRatioLowerX96, sqrtRatioUpperX96, liquidity, False))
+
+
+# LixirVault.burnAndCollect
+def burnAndCollect(pool, position, shares, totalSupply):
+    liquidity, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(
+        pool, pool.tick, position
+    )
+    LDelta = toUint128(mulDiv(shares, liquidity, totalSupply))
+    amount0Out = mulDiv(tokensOwed0, shares, totalSupply)
+    amount1Out = mulDiv(tokensOwed1, shares, totalSupply)
+    if 0 < LDelta:
+        burnt0Out, burnt1Out = _burnAmounts(
+            pool, position.tickLower, position.tickUpper, LDelta
+        )
+        amount0Out += burnt0Out
+        amount1Out += burnt1Out
+    return (amount0Out, amount1Out)
+
+
+# LixirVault.burnCollectPositions for one position: all of its liquidity and
+# every fee it is owed, but nothing from a position without liquidity
+def _burnCollectPosition(pool, position):
+    liquidity, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(
+        pool, pool.tick, position
+    )
+    if liquidity == 0:
+        return (0, 0)
+    burnt0Out, burnt1Out = _burnAmounts(
+        pool, position.tickLower, position.tickUpper, liquidity
+    )
+    return (burnt0Out + tokensOwed0, burnt1Out + tokensOwed1)
+
+
+# LixirVault._withdrawStep, for `shares` held by the withdrawer
+def withdrawStep(state, shares):
+    vault = state.vaultState
+    totalSupply = state.totalSupply
+    require(shares <= totalSupply, "BALANCE")
+    positions = (vault.mainPosition, vault.rangePosition)
+    if shares == totalSupply:
+        amount0Out = vault.balance0
+        amount1Out = vault.balance1
+        for position in positions:
+            out0, out1 = _burnCollectPosition(vault.pool, position)
+            amount0Out += out0
+            amount1Out += out1
+    else:
+        amount0Out = (
+            mulDiv(vault.balance0, shares, totalSupply) if vault.balance0 else 0
+        )
+        amount1Out = (
+            mulDiv(vault.balance1, shares, totalSupply) if vault.balance1 else 0
+        )
+        for position in positions:
+            out0, out1 = burnAndCollect(vault.pool, position, shares, totalSupply)
+            amount0Out += out0
+            amount1Out += out1
+    return (amount0Out, amount1Out)
+
+
+def quote_withdraw(state, shares, amount0Min=0, amount1Min=0):
+    try:
+        amount0Out, amount1Out = withdrawStep(state, shares)
+    except Revert as e:
+        return WithdrawQuote(shares, None, None, None, None, e.revert_msg)
+    headroom0 = amount0Out - amount0Min
+    headroom1 = amount1Out - amount1Min
+    return WithdrawQuote(
+        shares,
+        amount0Out,
+        amount1Out,
+        headroom0,
+        headroom1,
+        None if headroom0 >= 0 and headroom1 >= 0 else "OUTPUT_AMOUNT",
+    )
+
+
+# Quotes many withdrawals at once: `requests` are (vault, shares) or
+# (vault, shares, amount0Min, amount1Min) and `states` come from
+# read_withdraw_states
+def quote_withdrawals(states, requests):
+    by_vault = {s.vault.lower(): s for s in states}
+    return [
+        quote_withdraw(by_vault[str(vault).lower()], *args) for vault, *args in requests
+    ]
@@ -0,0 +1,161 @@
+from collections import namedtuple
+from functools import lru_cache
+from brownie import web3
+from brownie.convert import to_address
+from eth_abi import decode_abi, encode_abi
+from hexbytes import HexBytes
+from lixir.strat_simp_gwap import VaultData
+
+# Multicall2 is deployed at the same address on mainnet and the public testnets
+MULTICALL2_ADDRESS = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+
+Call = namedtuple("Call", ["target", "signature", "args", "outputs"])
+
+VaultRecord = namedtuple(
+    "VaultRecord",
+    [
+        "vault",
+        "blockNumber",
+        "mainPosition",
+        "rangePosition",
+        "total0",
+        "total1",
+        "mL",
+        "rL",
+        "totalSupply",
+        "performanceFee",
+        "activePool",
+        "vaultData",
+    ],
+)
+
+VAULT_CREATED_TOPIC = web3.keccak(
+    text="VaultCreated(address,address,address,address)"
+).hex()
+
+
+@lru_cache(maxsize=None)
+def _selector(signature):
+    return bytes(web3.keccak(text=signature)[:4])
+
+
+@lru_cache(maxsize=None)
+def _input_types(signature):
+    inputs = signature[signature.index("(") + 1 : -1]
+    return inputs.split(",") if inputs else []
+
+
+def encode_call(call):
+    return (
+        call.target,
+        _selector(call.signature) + encode_abi(_input_types(call.signature), call.args),
+    )
+
+
+def decode_result(call, success, returnData):
+    if not success or len(returnData) == 0:
+        return None
+    values = decode_abi(call.outputs, bytes(returnData))
+    return tuple(
+        to_address(v) if t == "address" else v for t, v in zip(call.outputs, values)
+    )
+
+
+# Runs `calls` through `multicall.tryBlockAndAggregate` in batches of at most
+# `batch_size`. Every batch after the first is pinned to the block the first
+# one ran at, so the results are one consistent snapshot. Failed calls decode
+# to None instead of reverting the whole batch.
+def aggregate(multicall, calls, batch_size=500, block_identifier=None):
+    results = []
+    blockNumber = block_identifier
+    for i in range(0, len(calls), batch_size):
+        batch = calls[i : i + batch_size]
+        blockNumber, _, returnData = multicall.tryBlockAndAggregate.call(
+            False, [encode_call(c) for c in batch], block_identifier=blockNumber
+        )
+        results.extend(
+            decode_result(call, success, data)
+            for call, (success, data) in zip(batch, returnData)
+        )
+    return blockNumber, results
+
+
+def vault_calls(vault, strategy):
+    vault = str(vault)
+    return [
+        Call(vault, "mainPosition()", (), ["int24", "int24"]),
+        Call(vault, "rangePosition()", (), ["int24", "int24"]),
+        Call(
+            vault, "calculateTotals()", (), ["uint256", "uint256", "uint128", "uint128"]
+        ),
+        Call(vault, "totalSupply()", (), ["uint256"]),
+        Call(vault, "performanceFee()", (), ["uint24"]),
+        Call(vault, "activePool()", (), ["address"]),
+        Call(
+            str(strategy),
+            "vaultDatas(address)",
+            (vault,),
+            ["uint32", "int24", "int24", "int24", "uint32", "int56"],
+        ),
+    ]
+
+
+def _unwrap(result):
+    return None if result is None else result[0]
+
+
+def read_vaults(multicall, vaults, strategy, batch_size=500, block_identifier=None):
+    calls = []
+    for vault in vaults:
+        calls.extend(vault_calls(vault, strategy))
+    blockNumber, results = aggregate(multicall, calls, batch_size, block_identifier)
+    n = len(calls) // max(len(vaults), 1)
+    records = []
+    for i, vault in enumerate(vaults):
+        (
+            mainPosition,
+            rangePosition,
+            totals,
+            totalSupply,
+            performanceFee,
+            activePool,
+            vaultData,
+        ) = results[i * n : (i + 1) * n]
+        records.append(
+            VaultRecord(
+                to_address(str(vault)),
+                blockNumber,
+                mainPosition,
+                rangePosition,
+                *(totals if totals is not None else (None,) * 4),
+                _unwrap(totalSupply),
+                _unwrap(performanceFee),
+                _unwrap(activePool),
+                None if vaultData is None else VaultData(*vaultData),
+            )
+        )
+    return records
+
+
+def get_factory_vaults(factory, from_block=0, to_block="latest"):
+    logs = web3.eth.get_logs(
+        {
+            "address": str(factory),
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [VAULT_CREATED_TOPIC],
+        }
+    )
+    return [to_address(decode_abi(["address"], HexBytes(log["data"]))[0]) for log in logs]
+
+
+def read_factory_vaults(
+    multicall, factory, strategy, batch_size=500, block_identifier=None
+):
+    return read_vaults(
+        multicall,
+        get_factory_vaults(factory, to_block=block_identifier or "latest"),
+        strategy,
+        batch_size,
+        block_identifier,
+    )
@@ -0,0 +1,135 @@
+import heapq
+from collections import namedtuple
+from lixir.gas import BASELINE_PATH, load_baseline
+from lixir.strat_simp_gwap import predictRebalance
+from lixir.totals import liquidityAndTokensOwed
+from lixir.v3_math import Q96, getAmountsForLiquidity, getSqrtRatioAtTick, mulDiv
+
+# Gain and cost are in token1 of the vault, valued at the pool price
+Estimate = namedtuple(
+    "Estimate",
+    ["vault", "fees", "drift", "idle", "gain", "cost", "ratio", "revert_msg"],
+)
+
+
+def valueInToken1(sqrtPriceX96, amount0, amount1):
+    return mulDiv(mulDiv(amount0, sqrtPriceX96, Q96), sqrtPriceX96, Q96) + amount1
+
+
+# The most gas any rebalance benchmark recorded in lixir/gas_baseline.json
+# used. Without one there is nothing to cost rebalances with, so the gas has
+# to be given instead.
+def rebalance_gas(path=BASELINE_PATH):
+    gas = [v for k, v in load_baseline(path).items() if k.startswith("rebalance/")]
+    if not gas:
+        raise KeyError("no rebalance benchmark in %s, pass the gas instead" % path)
+    return max(gas)
+
+
+# What a rebalance would gain, in three parts:
+#   fees: tokensOwed of both positions, compounded by the rebalance
+#   drift: the share of the main position's value the price has moved away
+#     from its centre, all of it once the price is out of range. Nothing when
+#     the rebalance would mint the same main ticks again.
+#   idle: the balances left in the vault, which the rebalance puts to work
+# `observation` is a lixir.keeper.Observation and `vaultState` the vault's
+# lixir.totals.VaultState; the rebalance itself is predicted with
+# predictRebalance, so one that would revert gains nothing.
+def estimate_gain(observation, vaultState, expectedTick=None):
+    if expectedTick is None:
+        expectedTick = observation.tick
+    pool = vaultState.pool
+    sqrtPriceX96 = observation.sqrtPriceX96
+    tick = observation.tick
+    prediction = predictRebalance(
+        sqrtPriceX96,
+        tick,
+        expectedTick,
+        observation.ticksCumulative,
+        observation.timestamp,
+        observation.tickSpacing,
+        observation.vaultData,
+    )
+    fees0 = 0
+    fees1 = 0
+    for position in (vaultState.mainPosition, vaultState.rangePosition):
+        _, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(pool, pool.tick, position)
+        fees0 += tokensOwed0
+        fees1 += tokensOwed1
+    fees = valueInToken1(sqrtPriceX96, fees0, fees1)
+    idle = valueInToken1(sqrtPriceX96, vaultState.balance0, vaultState.balance1)
+    main = vaultState.mainPosition
+    drift = 0
+    if prediction.revert_msg is None and prediction.mainTicks != (
+        main.tickLower,
+        main.tickUpper,
+    ):
+        amount0, amount1 = getAmountsForLiquidity(
+            sqrtPriceX96,
+            getSqrtRatioAtTick(main.tickLower),
+            getSqrtRatioAtTick(main.tickUpper),
+            -main.info.liquidity,
+        )
+        value = valueInToken1(sqrtPriceX96, amount0, amount1)
+        halfWidth = (main.tickUpper - main.tickLower) // 2
+        distance = abs(tick - (main.tickLower + halfWidth))
+        drift = value * min(distance, halfWidth) // max(halfWidth, 1)
+    return (fees, drift, idle, prediction.revert_msg)
+
+
+# Ranks vaults by the gain of a rebalance over its gas cost, both in token1.
+# `token1PerWei` maps every vault to the price of one wei of ETH in its
+# token1's smallest unit; a vault without an entry can't be costed and raises.
+# `gas` defaults to rebalance_gas(), which raises while no rebalance benchmark
+# has been recorded. Vaults are pushed with `update` every cycle and `due` pops, best first,
+# those whose gain is at least `min_ratio` times the cost. An update replaces
+# the vault's earlier entry, which is dropped when it reaches the top.
+class RebalanceScheduler:
+    def __init__(self, gas_price, token1PerWei, gas=None, min_ratio=1):
+        self.gas_price = gas_price
+        self.gas = rebalance_gas() if gas is None else gas
+        self.min_ratio = min_ratio
+        self.token1PerWei = {str(v): p for v, p in token1PerWei.items()}
+        self.estimates = {}
+        self._heap = []
+        self._seq = 0
+
+    def cost(self, vault):
+        price = self.token1PerWei.get(str(vault))
+        if price is None:
+            raise KeyError("no token1 price for %s" % vault)
+        return int(self.gas * self.gas_price * price)
+
+    def update(self, observation, vaultState, expectedTick=None):
+        fees, drift, idle, revert_msg = estimate_gain(
+            observation, vaultState, expectedTick
+        )
+        vault = str(observation.vault)
+        gain = fees + drift + idle
+        cost = self.cost(vault)
+        ratio = gain / cost if cost > 0 else float("inf")
+        estimate = Estimate(vault, fees, drift, idle, gain, cost, ratio, revert_msg)
+        self._seq += 1
+        self.estimates[vault] = (self._seq, estimate)
+        if revert_msg is None:
+            heapq.heappush(self._heap, (-ratio, self._seq, vault))
+        # superseded entries below min_ratio never reach the top on their own
+        if len(self._heap) > 2 * len(self.estimates) + 16:
+            self._heap = [
+                (-e.ratio, seq, v)
+                for v, (seq, e) in self.estimates.items()
+                if e.revert_msg is None
+            ]
+            heapq.heapify(self._heap)
+        return estimate
+
+    def due(self):
+        results = []
+        while self._heap and -self._heap[0][0] >= self.min_ratio:
+            _, seq, vault = heapq.heappop(self._heap)
+            entry = self.estimates.get(vault)
+            if entry is None or entry[0] != seq:
+                continue
+            del self.estimates[vault]
+            results.append(entry[1])
+        return results
@@ -0,0 +1,207 @@
+import heapq
+import numpy as np
+from collections import namedtuple
+from lixir.indexer import to_ints
+from lixir.simulator import mintPositions
+from lixir.v3_math import (
+    MAX_TICK,
+    MIN_TICK,
+    getAmountsForLiquidity,
+    getSqrtRatioAtTick,
+    mulDiv,
+)
+
+SharePriceSeries = namedtuple(
+    "SharePriceSeries",
+    ["blockNumber", "total0", "total1", "totalSupply", "sharePrice"],
+)
+
+_EVENT_COLUMNS = {
+    "Deposit": ("shares", "amount0In", "amount1In", "total0", "total1"),
+    "Withdraw": ("shares",),
+    "Rebalance": (
+        "mainTickLower",
+        "mainTickUpper",
+        "rangeTickLower",
+        "rangeTickUpper",
+        "total0",
+        "total1",
+        "sqrtRatioX96",
+        "totalSupply",
+        "sharesMinted",
+    ),
+}
+
+
+def _address_key(address):
+    return np.frombuffer(bytes.fromhex(str(address)[2:]), dtype="V20")[0]
+
+
+# Deposit, Withdraw and Rebalance rows of one vault from an Indexer, merged in
+# (blockNumber, logIndex) order as (blockNumber, name, row) tuples
+def vault_events(indexer, vault):
+    key = _address_key(vault)
+    streams = []
+    for name, names in _EVENT_COLUMNS.items():
+        table = indexer.table(name)
+        mask = table["address"] == key
+        blocks = table["blockNumber"][mask]
+        logIndexes = table["logIndex"][mask]
+        values = [to_ints(table[column][mask]) for column in names]
+        streams.append(
+            [
+                (int(blocks[i]), int(logIndexes[i]), name, dict(zip(names, row)))
+                for i, row in enumerate(zip(*values))
+            ]
+        )
+    return [(block, name, row) for block, _, name, row in heapq.merge(*streams)]
+
+
+# Position liquidity and idle balances of a vault, replayed from its events.
+# Accrued fees are not visible in between events, so the difference between
+# the totals a Deposit reports and the modelled totals is carried as an offset
+# until the next Rebalance collects it.
+class _VaultReplay:
+    def __init__(self):
+        self.mainTicks = None
+        self.rangeTicks = None
+        self.mL = 0
+        self.rL = 0
+        self.idle0 = 0
+        self.idle1 = 0
+        self.offset0 = 0
+        self.offset1 = 0
+        self.totalSupply = 0
+
+    def _positions(self):
+        return ((self.mainTicks, self.mL), (self.rangeTicks, self.rL))
+
+    def totals(self, sqrtPriceX96):
+        total0 = self.idle0 + self.offset0
+        total1 = self.idle1 + self.offset1
+        for ticks, liquidity in self._positions():
+            if 0 < liquidity:
+                amount0, amount1 = getAmountsForLiquidity(
+                    sqrtPriceX96,
+                    getSqrtRatioAtTick(ticks[0]),
+                    getSqrtRatioAtTick(ticks[1]),
+                    -liquidity,
+                )
+                total0 += amount0
+                total1 += amount1
+        return (total0, total1)
+
+    def rebalance(self, row):
+        sqrtRatioX96 = row["sqrtRatioX96"]
+        self.mainTicks = (int(row["mainTickLower"]), int(row["mainTickUpper"]))
+        self.rangeTicks = (int(row["rangeTickLower"]), int(row["rangeTickUpper"]))
+        self.totalSupply = row["totalSupply"] + row["sharesMinted"]
+        # The event only has the range the vault chose. Passing it as both
+        # candidates picks the same one: the other side's liquidity is smaller
+        # on it than on the vault's own range for that side, which already
+        # lost. Without a range, the full range mints nothing from leftovers
+        # too small for any narrower range.
+        rangeTicks = self.rangeTicks
+        if rangeTicks[0] >= rangeTicks[1]:
+            rangeTicks = (MIN_TICK, MAX_TICK)
+        self.mL, _, self.rL, self.idle0, self.idle1 = mintPositions(
+            sqrtRatioX96,
+            row["total0"],
+            row["total1"],
+            self.mainTicks,
+            rangeTicks,
+            rangeTicks,
+        )
+        self.offset0 = 0
+        self.offset1 = 0
+
+    def deposit(self, row, sqrtPriceX96):
+        shares = row["shares"]
+        if self.totalSupply == 0:
+            mLDelta = shares
+            rLDelta = 0
+            self.offset0 = 0
+            self.offset1 = 0
+        else:
+            model0, model1 = self.totals(sqrtPriceX96)
+            self.offset0 += row["total0"] - model0
+            self.offset1 += row["total1"] - model1
+            mLDelta = mulDiv(self.mL, shares, self.totalSupply)
+            rLDelta = mulDiv(self.rL, shares, self.totalSupply)
+        used0 = used1 = 0
+        for ticks, liquidity in ((self.mainTicks, mLDelta), (self.rangeTicks, rLDelta)):
+            if 0 < liquidity:
+                amount0, amount1 = getAmountsForLiquidity(
+                    sqrtPriceX96,
+                    getSqrtRatioAtTick(ticks[0]),
+                    getSqrtRatioAtTick(ticks[1]),
+                    liquidity,
+                )
+                used0 += amount0
+                used1 += amount1
+        self.mL += mLDelta
+        self.rL += rLDelta
+        self.idle0 += max(row["amount0In"] - used0, 0)
+        self.idle1 += max(row["amount1In"] - used1, 0)
+        self.totalSupply += shares
+
+    def withdraw(self, row):
+        shares = row["shares"]
+        if shares == self.totalSupply:
+            # the last withdrawal burns and collects everything
+            self.mL = self.rL = 0
+            self.idle0 = self.idle1 = 0
+            self.offset0 = self.offset1 = 0
+            self.totalSupply = 0
+            return
+        totalSupply = self.totalSupply
+        self.mL -= mulDiv(shares, self.mL, totalSupply)
+        self.rL -= mulDiv(shares, self.rL, totalSupply)
+        self.idle0 -= mulDiv(self.idle0, shares, totalSupply)
+        self.idle1 -= mulDiv(self.idle1, shares, totalSupply)
+        self.offset0 -= self.offset0 * shares // totalSupply
+        self.offset1 -= self.offset1 * shares // totalSupply
+        self.totalSupply -= shares
+
+
+# Share price of a vault at every block of a pool price series, rebuilt from
+# its indexed events without any historical state calls. `sqrtPricesX96[i]`
+# is the pool price at the end of `blocks[i]`; events are applied up to and
+# including the block they are emitted in. sharePrice is the value of one
+# share in token1, or nan while the vault has no supply.
+def share_price_series(events, blocks, sqrtPricesX96):
+    blocks = np.asarray(blocks, dtype=np.int64)
+    sqrtPricesX96 = np.asarray(sqrtPricesX96, dtype=object)
+    replay = _VaultReplay()
+    n = len(blocks)
+    total0 = np.zeros(n, dtype=object)
+    total1 = np.zeros(n, dtype=object)
+    totalSupply = np.zeros(n, dtype=object)
+    j = 0
+    for i in range(n):
+        while j < len(events) and events[j][0] <= blocks[i]:
+            block, name, row = events[j]
+            # the price the event saw is the last one recorded before its block
+            k = max(blocks.searchsorted(block) - 1, 0)
+            if name == "Rebalance":
+                replay.rebalance(row)
+            elif name == "Deposit":
+                replay.deposit(row, int(sqrtPricesX96[k]))
+            else:
+                replay.withdraw(row)
+            j += 1
+        total0[i], total1[i] = replay.totals(int(sqrtPricesX96[i]))
+        totalSupply[i] = replay.totalSupply
+    price = (sqrtPricesX96.astype(np.float64) / (1 << 96)) ** 2
+    supply = totalSupply.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharePrice = np.where(
+            supply > 0,
+            (total0.astype(np.float64) * price + total1.astype(np.float64)) / supply,
+            np.nan,
+        )
+    return SharePriceSeries(blocks, total0, total1, totalSupply, sharePrice)
+
+
+def vault_share_price(indexer, vault, blocks, sqrtPricesX96):
+    return share_price_series(vault_events(indexer, vault), blocks, sqrtPricesX96)
@@ -0,0 +1,429 @@
+import numpy as np
+from collections import namedtuple
+from lixir import tick_math
+from lixir.errors import Revert, require
+from lixir.strat_simp_gwap import (
+    VaultData,
+    checkTick,
+    getMainTicks,
+    getRangeTicks,
+    getTickGwapUpdateCumulative,
+    getTickShortGwap,
+)
+from lixir.totals import PoolState, Position, PositionInfo, VaultState, calculateTotals
+from lixir.v3_math import (
+    MAX_TICK,
+    MIN_TICK,
+    Q96,
+    getAmountsForLiquidity,
+    getLiquidityForAmount0,
+    getLiquidityForAmount1,
+    getLiquidityForAmounts,
+    getSqrtRatioAtTick,
+    mulDiv,
+)
+
+PERFORMANCE_FEE_PRECISION = 10 ** 6
+
+StepResult = namedtuple(
+    "StepResult",
+    [
+        "timestamp",
+        "tick",
+        "rebalanced",
+        "revert_msg",
+        "mainPosition",
+        "rangePosition",
+        "total0",
+        "total1",
+        "mL",
+        "rL",
+        "totalSupply",
+    ],
+)
+
+
+# LixirVault.mintPositions. Returns the main liquidity, the chosen range
+# position and its liquidity, and the token balances left idle in the vault.
+def mintPositions(sqrtRatioX96, amount0, amount1, mainData, rangeData0, rangeData1):
+    mL = 0
+    if 0 < amount0 or 0 < amount1:
+        sqrtRatioLowerX96 = getSqrtRatioAtTick(mainData[0])
+        sqrtRatioUpperX96 = getSqrtRatioAtTick(mainData[1])
+        mL = getLiquidityForAmounts(
+            sqrtRatioX96, sqrtRatioLowerX96, sqrtRatioUpperX96, amount0, amount1
+        )
+        if 0 < mL:
+            used0, used1 = getAmountsForLiquidity(
+                sqrtRatioX96, sqrtRatioLowerX96, sqrtRatioUpperX96, mL
+            )
+            amount0 -= used0
+            amount1 -= used1
+    rL = 0
+    rangeData = (0, 0)
+    if 0 < amount0 or 0 < amount1:
+        rL0 = getLiquidityForAmount0(
+            getSqrtRatioAtTick(rangeData0[0]), getSqrtRatioAtTick(rangeData0[1]), amount0
+        )
+        rL1 = getLiquidityForAmount1(
+            getSqrtRatioAtTick(rangeData1[0]), getSqrtRatioAtTick(rangeData1[1]), amount1
+        )
+        # only one range position will ever have liquidity (if any)
+        if rL1 < rL0:
+            rL = rL0
+            rangeData = rangeData0
+        elif 0 < rL1:
+            rL = rL1
+            rangeData = rangeData1
+    if 0 < rL:
+        used0, used1 = getAmountsForLiquidity(
+            sqrtRatioX96,
+            getSqrtRatioAtTick(rangeData[0]),
+            getSqrtRatioAtTick(rangeData[1]),
+            rL,
+        )
+        amount0 -= used0
+        amount1 -= used1
+    return (mL, tuple(rangeData), rL, amount0, amount1)
+
+
+# A read-only uint256 column stored as four little-endian uint64 limbs per
+# entry, e.g. in shared memory. An entry only becomes a Python int when it is
+# read, so the limbs are never copied.
+class Uint256Column:
+    def __init__(self, limbs):
+        self.limbs = limbs
+
+    def __len__(self):
+        return len(self.limbs)
+
+    def __getitem__(self, i):
+        value = 0
+        for limb in reversed(self.limbs[i].tolist()):
+            value = (value << 64) | limb
+        return value
+
+
+def _uint256_column(values):
+    if values is None or isinstance(values, Uint256Column):
+        return values
+    return np.asarray(values, dtype=object)
+
+
+# A recorded pool path. Entry i holds the pool state from timestamps[i] until
+# timestamps[i + 1]. `fees0`/`fees1` are the swap fees paid into the pool over
+# that interval and `liquidity` the active liquidity excluding the vault; they
+# are optional and only used to accrue fees to the simulated positions.
+class PriceHistory:
+    def __init__(
+        self,
+        timestamps,
+        ticks,
+        sqrtPricesX96=None,
+        liquidity=None,
+        fees0=None,
+        fees1=None,
+        tickCumulative=0,
+    ):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.ticks = np.asarray(ticks, dtype=np.int64)
+        require(self.timestamps.shape == self.ticks.shape)
+        require(np.all(np.diff(self.timestamps) > 0))
+        self.sqrtPricesX96 = (
+            tick_math.getSqrtRatioAtTick(self.ticks)
+            if sqrtPricesX96 is None
+            else _uint256_column(sqrtPricesX96)
+        )
+        self.liquidity = _uint256_column(liquidity)
+        self.fees0 = _uint256_column(fees0)
+        self.fees1 = _uint256_column(fees1)
+        self.tickCumulatives = tickCumulative + np.concatenate(
+            ([0], np.cumsum(self.ticks[:-1] * np.diff(self.timestamps)))
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def observe(self, timestamp, secondsAgos):
+        targets = timestamp - np.asarray(secondsAgos, dtype=np.int64)
+        require(np.all(targets >= self.timestamps[0]), "OLD")
+        i = np.searchsorted(self.timestamps, targets, side="right") - 1
+        return self.tickCumulatives[i] + self.ticks[i] * (targets - self.timestamps[i])
+
+
+class StrategySimulator:
+    def __init__(
+        self,
+        history,
+        tickSpacing,
+        TICK_SHORT_DURATION,
+        MAX_TICK_DIFF,
+        mainSpread,
+        rangeSpread,
+        performanceFee=0,
+    ):
+        self.history = history
+        self.tickSpacing = tickSpacing
+        self.vaultData = VaultData(
+            TICK_SHORT_DURATION, MAX_TICK_DIFF, mainSpread, rangeSpread, 0, 0
+        )
+        self.performanceFee = performanceFee
+        self.index = 0
+        self.mainPosition = (0, 0)
+        self.rangePosition = (0, 0)
+        self.mL = 0
+        self.rL = 0
+        self.mainOwed = (0, 0)
+        self.rangeOwed = (0, 0)
+        self.balance0 = 0
+        self.balance1 = 0
+        self.totalSupply = 0
+        self.feeShares = 0
+        self.feesEarned0 = 0
+        self.feesEarned1 = 0
+        self.rebalances = 0
+
+    @property
+    def timestamp(self):
+        return int(self.history.timestamps[self.index])
+
+    def slot0(self):
+        return (
+            int(self.history.sqrtPricesX96[self.index]),
+            int(self.history.ticks[self.index]),
+        )
+
+    def state(self):
+        sqrtRatioX96, tick = self.slot0()
+        return VaultState(
+            PoolState(sqrtRatioX96, tick, 0, 0, {}),
+            Position(*self.mainPosition, PositionInfo(self.mL, 0, 0, *self.mainOwed)),
+            Position(*self.rangePosition, PositionInfo(self.rL, 0, 0, *self.rangeOwed)),
+            self.balance0,
+            self.balance1,
+        )
+
+    def calculateTotals(self):
+        return calculateTotals(self.state())
+
+    # LixirStrategySimpleGWAP._configureVault for a freshly created vault
+    def configure(self):
+        vaultData = self.vaultData
+        require(vaultData.TICK_SHORT_DURATION >= 30)
+        require(vaultData.MAX_TICK_DIFF > 0)
+        require(vaultData.mainSpread >= 0)
+        require(vaultData.rangeSpread >= 0)
+        short_gwap, lastShortTicksCumulative = getTickShortGwap(
+            self.history.observe(
+                self.timestamp, [vaultData.TICK_SHORT_DURATION, 0]
+            ),
+            vaultData.TICK_SHORT_DURATION,
+        )
+        sqrtRatioX96, tick = self.slot0()
+        checkTick(tick, short_gwap, vaultData.MAX_TICK_DIFF)
+        self._rebalance(sqrtRatioX96, tick, short_gwap)
+        self.vaultData = vaultData._replace(
+            timestamp=self.timestamp - vaultData.TICK_SHORT_DURATION,
+            tickCumulative=lastShortTicksCumulative,
+        )
+
+    # LixirVault.calculateInitialDeposit
+    def deposit(self, amount0Desired, amount1Desired):
+        require(self.totalSupply == 0)
+        sqrtRatioX96, _ = self.slot0()
+        sqrtRatioLowerX96 = getSqrtRatioAtTick(self.mainPosition[0])
+        sqrtRatioUpperX96 = getSqrtRatioAtTick(self.mainPosition[1])
+        mLDelta = getLiquidityForAmounts(
+            sqrtRatioX96,
+            sqrtRatioLowerX96,
+            sqrtRatioUpperX96,
+            amount0Desired,
+            amount1Desired,
+        )
+        require(0 < mLDelta, "INPUT_AMOUNT")
+        amount0In, amount1In = getAmountsForLiquidity(
+            sqrtRatioX96, sqrtRatioLowerX96, sqrtRatioUpperX96, mLDelta
+        )
+        self.mL += mLDelta
+        self.totalSupply = mLDelta
+        return (mLDelta, amount0In, amount1In)
+
+    # LixirStrategySimpleGWAP.rebalance; state is only updated if every
+    # require passes, like a reverted transaction
+    def rebalance(self, expectedTick=None):
+        vaultData = self.vaultData
+        require(vaultData.timestamp > 0)
+        observed = self.history.observe(
+            self.timestamp, [vaultData.TICK_SHORT_DURATION, 0]
+        )
+        short_gwap, _ = getTickShortGwap(observed, vaultData.TICK_SHORT_DURATION)
+        sqrtRatioX96, tick = self.slot0()
+        if expectedTick is None:
+            expectedTick = tick
+        checkTick(tick, short_gwap, vaultData.MAX_TICK_DIFF)
+        checkTick(tick, expectedTick, vaultData.MAX_TICK_DIFF)
+        tick_gwap, vaultData = getTickGwapUpdateCumulative(
+            int(observed[1]), vaultData, self.timestamp
+        )
+        self._rebalance(sqrtRatioX96, tick, tick_gwap)
+        self.vaultData = vaultData
+
+    def _rebalance(self, sqrtRatioX96, tick, tick_gwap):
+        mainData = getMainTicks(tick_gwap, self.tickSpacing, self.vaultData.mainSpread)
+        rlower0, rupper0, rlower1, rupper1 = getRangeTicks(
+            sqrtRatioX96, tick, self.tickSpacing, self.vaultData.rangeSpread
+        )
+        require(MIN_TICK <= mainData[0] and mainData[1] <= MAX_TICK)
+        require(MIN_TICK <= rlower0 and rupper0 <= MAX_TICK)
+        require(MIN_TICK <= rlower1 and rupper1 <= MAX_TICK)
+        if self.rebalances > 0:
+            self._takePerformanceFee(sqrtRatioX96)
+        total0, total1 = self._burnCollectPositions(sqrtRatioX96)
+        mL, rangeData, rL, idle0, idle1 = mintPositions(
+            sqrtRatioX96,
+            total0,
+            total1,
+            mainData,
+            (rlower0, rupper0),
+            (rlower1, rupper1),
+        )
+        self.mainPosition = mainData
+        self.rangePosition = rangeData
+        self.mL = mL
+        self.rL = rL
+        self.balance0 = idle0
+        self.balance1 = idle1
+        self.rebalances += 1
+
+    def _burnCollectPositions(self, sqrtRatioX96):
+        total0 = self.balance0 + self.mainOwed[0] + self.rangeOwed[0]
+        total1 = self.balance1 + self.mainOwed[1] + self.rangeOwed[1]
+        for (tickLower, tickUpper), liquidity in (
+            (self.mainPosition, self.mL),
+            (self.rangePosition, self.rL),
+        ):
+            if 0 < liquidity:
+                burnt0, burnt1 = getAmountsForLiquidity(
+                    sqrtRatioX96,
+                    getSqrtRatioAtTick(tickLower),
+                    getSqrtRatioAtTick(tickUpper),
+                    -liquidity,
+                )
+                total0 += burnt0
+                total1 += burnt1
+        self.mainOwed = (0, 0)
+        self.rangeOwed = (0, 0)
+        return (total0, total1)
+
+    # LixirVault._getFeeDataMaybeTakePerfFee
+    def _takePerformanceFee(self, sqrtRatioX96):
+        if self.performanceFee == 0 or self.totalSupply == 0:
+            return
+        total0 = self.balance0
+        total1 = self.balance1
+        for (tickLower, tickUpper), liquidity in (
+            (self.mainPosition, self.mL),
+            (self.rangePosition, self.rL),
+        ):
+            amount0, amount1 = getAmountsForLiquidity(
+                sqrtRatioX96,
+                getSqrtRatioAtTick(tickLower),
+                getSqrtRatioAtTick(tickUpper),
+                liquidity,
+            )
+            total0 += amount0
+            total1 += amount1
+        tokensOwed0 = self.mainOwed[0] + self.rangeOwed[0]
+        tokensOwed1 = self.mainOwed[1] + self.rangeOwed[1]
+        price = mulDiv(sqrtRatioX96, sqrtRatioX96, Q96)
+        total1 += mulDiv(total0, price, Q96)
+        if total1 > 0:
+            tokensOwed1 += mulDiv(tokensOwed0, price, Q96)
+            shares = mulDiv(
+                mulDiv(tokensOwed1, self.totalSupply, total1),
+                self.performanceFee,
+                PERFORMANCE_FEE_PRECISION,
+            )
+            self.feeShares += shares
+            self.totalSupply += shares
+
+    # Splits the fees paid into the pool over interval i between the vault's
+    # in-range positions and the rest of the pool's active liquidity
+    def _accrueFees(self, i):
+        history = self.history
+        if history.liquidity is None or history.fees0 is None:
+            return
+        tick = int(history.ticks[i])
+        inRange = [
+            (lower <= tick < upper) and 0 < liquidity
+            for (lower, upper), liquidity in (
+                (self.mainPosition, self.mL),
+                (self.rangePosition, self.rL),
+            )
+        ]
+        vaultLiquidity = self.mL * inRange[0] + self.rL * inRange[1]
+        if vaultLiquidity == 0:
+            return
+        liquidity = int(history.liquidity[i]) + vaultLiquidity
+        fees0 = int(history.fees0[i])
+        fees1 = 0 if history.fees1 is None else int(history.fees1[i])
+        owed = []
+        for positionOwed, positionLiquidity, isInRange in (
+            (self.mainOwed, self.mL, inRange[0]),
+            (self.rangeOwed, self.rL, inRange[1]),
+        ):
+            if isInRange:
+                earned0 = mulDiv(fees0, positionLiquidity, liquidity)
+                earned1 = mulDiv(fees1, positionLiquidity, liquidity)
+                self.feesEarned0 += earned0
+                self.feesEarned1 += earned1
+                positionOwed = (positionOwed[0] + earned0, positionOwed[1] + earned1)
+            owed.append(positionOwed)
+        self.mainOwed, self.rangeOwed = owed
+
+    def _step(self, rebalanced, revert_msg):
+        total0, total1, mL, rL = self.calculateTotals()
+        return StepResult(
+            self.timestamp,
+            int(self.history.ticks[self.index]),
+            rebalanced,
+            revert_msg,
+            self.mainPosition,
+            self.rangePosition,
+            total0,
+            total1,
+            mL,
+            rL,
+            self.totalSupply,
+        )
+
+    # Creates the vault at the first entry with enough observation history,
+    # deposits (amount0, amount1) and then has the keeper attempt a rebalance
+    # at the current tick every `rebalance_interval` seconds.
+    def run(self, amount0, amount1, rebalance_interval):
+        history = self.history
+        start = int(
+            np.searchsorted(
+                history.timestamps,
+                history.timestamps[0] + self.vaultData.TICK_SHORT_DURATION,
+            )
+        )
+        require(start < len(history), "OLD")
+        self.index = start
+        self.configure()
+        self.deposit(amount0, amount1)
+        lastAttempt = self.timestamp
+        yield self._step(True, None)
+        for i in range(start + 1, len(history)):
+            self._accrueFees(i - 1)
+            self.index = i
+            rebalanced = False
+            revert_msg = None
+            if self.timestamp - lastAttempt >= rebalance_interval:
+                lastAttempt = self.timestamp
+                try:
+                    self.rebalance()
+                    rebalanced = True
+                except Revert as e:
+                    revert_msg = e.revert_msg
+            yield self._step(rebalanced, revert_msg)
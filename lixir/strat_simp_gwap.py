@@ -1,16 +1,103 @@
-minTick = -887272
-maxTick = -minTick
+from collections import namedtuple
+from lixir import tick_math
+from lixir.errors import Revert, require
+
+minTick = tick_math.MIN_TICK
+maxTick = tick_math.MAX_TICK
+minInt24 = -(1 << 23)
+maxInt24 = (1 << 23) - 1
 
 def roundTickDown(tick, tickSpacing):
-    tickMod = tick % tickSpacing
-    return max(tick if tickMod == 0 else tick - tickMod, minTick)
+    return int(tick_math.roundTickDown(tick, tickSpacing))
 
 def roundTickUp(tick, tickSpacing):
-    tickDown = roundTickDown(tick, tickSpacing)
-    return min(tick if tick == tickDown else tickDown + tickSpacing, maxTick)
+    return int(tick_math.roundTickUp(tick, tickSpacing))
 
 def getMainTicks(tick_gwap, tickSpacing, spread):
-    lower = roundTickDown(tick_gwap - spread, tickSpacing)
-    upper = roundTickUp(tick_gwap + spread, tickSpacing)
-    assert lower < upper
-    return (lower, upper)
\ No newline at end of file
+    lower, upper = tick_math.getMainTicks(tick_gwap, tickSpacing, spread)
+    require(lower < upper, "Main ticks are the same")
+    return (int(lower), int(upper))
+
+def getRangeTicks(sqrtRatioX96, tick, tickSpacing, spread):
+    lower0, upper0, lower1, upper1 = tick_math.getRangeTicks(
+        sqrtRatioX96, tick, tickSpacing, spread
+    )
+    require(lower0 < upper0, "Range0 ticks are the same")
+    require(lower1 < upper1, "Range1 ticks are the same")
+    return (int(lower0), int(upper0), int(lower1), int(upper1))
+
+VaultData = namedtuple(
+    "VaultData",
+    [
+        "TICK_SHORT_DURATION",
+        "MAX_TICK_DIFF",
+        "mainSpread",
+        "rangeSpread",
+        "timestamp",
+        "tickCumulative",
+    ],
+)
+
+def timeWeightedTick(numerator, seconds):
+    require(seconds != 0)
+    # floor division rounds towards negative infinity, as the contract does
+    tick_gwap = numerator // seconds
+    require(minInt24 <= tick_gwap <= maxInt24, "Tick over/underflow")
+    return tick_gwap
+
+def getTickShortGwap(ticksCumulative, TICK_SHORT_DURATION):
+    lastShortTicksCumulative = ticksCumulative[0]
+    tick_gwap = timeWeightedTick(
+        ticksCumulative[1] - lastShortTicksCumulative, TICK_SHORT_DURATION
+    )
+    return (tick_gwap, lastShortTicksCumulative)
+
+def getTickGwapUpdateCumulative(tickCumulative, vaultData, timestamp):
+    tick_gwap = timeWeightedTick(
+        tickCumulative - vaultData.tickCumulative, timestamp - vaultData.timestamp
+    )
+    return (
+        tick_gwap,
+        vaultData._replace(timestamp=timestamp, tickCumulative=tickCumulative),
+    )
+
+def checkTick(tick, expectedTick, MAX_TICK_DIFF):
+    require(abs(expectedTick - tick) <= MAX_TICK_DIFF, "Tick diff to great")
+
+RebalancePrediction = namedtuple(
+    "RebalancePrediction",
+    ["mainTicks", "rangeTicks0", "rangeTicks1", "tick_gwap", "revert_msg"],
+)
+
+# Evaluates every require LixirStrategySimpleGWAP.rebalance and
+# LixirVault.rebalance check, in the same order, for a rebalance mined at
+# `timestamp`. ticksCumulative are the pool's cumulatives at
+# timestamp - TICK_SHORT_DURATION and timestamp.
+def predictRebalance(
+    sqrtRatioX96, tick, expectedTick, ticksCumulative, timestamp, tickSpacing, vaultData
+):
+    try:
+        require(vaultData.timestamp > 0)
+        short_gwap, _ = getTickShortGwap(ticksCumulative, vaultData.TICK_SHORT_DURATION)
+        checkTick(tick, short_gwap, vaultData.MAX_TICK_DIFF)
+        checkTick(tick, expectedTick, vaultData.MAX_TICK_DIFF)
+        tick_gwap, _ = getTickGwapUpdateCumulative(
+            ticksCumulative[1], vaultData, timestamp
+        )
+        mlower, mupper = getMainTicks(tick_gwap, tickSpacing, vaultData.mainSpread)
+        rlower0, rupper0, rlower1, rupper1 = getRangeTicks(
+            sqrtRatioX96, tick, tickSpacing, vaultData.rangeSpread
+        )
+        require(
+            minTick <= mlower
+            and mupper <= maxTick
+            and minTick <= rlower0
+            and rupper0 <= maxTick
+            and minTick <= rlower1
+            and rupper1 <= maxTick
+        )
+    except Revert as e:
+        return RebalancePrediction(None, None, None, None, e.revert_msg)
+    return RebalancePrediction(
+        (mlower, mupper), (rlower0, rupper0), (rlower1, rupper1), tick_gwap, None
+    )
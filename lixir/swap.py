@@ -0,0 +1,410 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from lixir.errors import require
+from lixir.reader import Call, aggregate
+from lixir.totals import PoolState, TickInfo, getFeeGrowthInsideTicks
+from lixir.v3_math import (
+    MAX_UINT160,
+    MAX_UINT256,
+    Q96,
+    Q128,
+    divRoundingUp,
+    getAmount0Delta,
+    getAmount1Delta,
+    getSqrtRatioAtTick,
+    getTickAtSqrtRatio,
+    mulDiv,
+    mulDivRoundingUp,
+)
+from lixir.tick_math import MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK
+
+FEE_PRECISION = 10 ** 6
+
+# `pool.ticks(tick)`, minus the oracle fields a swap does not need
+TickData = namedtuple(
+    "TickData", ["liquidityNet", "feeGrowthOutside0X128", "feeGrowthOutside1X128"]
+)
+
+SwapResult = namedtuple(
+    "SwapResult", ["amount0", "amount1", "sqrtPriceX96", "tick", "liquidity"]
+)
+
+
+def toUint160(x):
+    require(x <= MAX_UINT160)
+    return x
+
+
+def addDelta(x, y):
+    z = x + y
+    require(z >= 0, "LS" if y < 0 else "LA")
+    return z
+
+
+# SqrtPriceMath.getNextSqrtPriceFromAmount0RoundingUp
+def getNextSqrtPriceFromAmount0RoundingUp(sqrtPX96, liquidity, amount, add):
+    if amount == 0:
+        return sqrtPX96
+    numerator1 = liquidity << 96
+    product = amount * sqrtPX96
+    if add:
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mulDivRoundingUp(numerator1, sqrtPX96, numerator1 + product)
+        return divRoundingUp(numerator1, numerator1 // sqrtPX96 + amount)
+    require(product <= MAX_UINT256 and numerator1 > product)
+    return toUint160(mulDivRoundingUp(numerator1, sqrtPX96, numerator1 - product))
+
+
+# SqrtPriceMath.getNextSqrtPriceFromAmount1RoundingDown
+def getNextSqrtPriceFromAmount1RoundingDown(sqrtPX96, liquidity, amount, add):
+    if add:
+        quotient = (
+            (amount << 96) // liquidity
+            if amount <= MAX_UINT160
+            else mulDiv(amount, Q96, liquidity)
+        )
+        return toUint160(sqrtPX96 + quotient)
+    quotient = (
+        divRoundingUp(amount << 96, liquidity)
+        if amount <= MAX_UINT160
+        else mulDivRoundingUp(amount, Q96, liquidity)
+    )
+    require(sqrtPX96 > quotient)
+    return sqrtPX96 - quotient
+
+
+def getNextSqrtPriceFromInput(sqrtPX96, liquidity, amountIn, zeroForOne):
+    require(sqrtPX96 > 0)
+    require(liquidity > 0)
+    if zeroForOne:
+        return getNextSqrtPriceFromAmount0RoundingUp(
+            sqrtPX96, liquidity, amountIn, True
+        )
+    return getNextSqrtPriceFromAmount1RoundingDown(sqrtPX96, liquidity, amountIn, True)
+
+
+def getNextSqrtPriceFromOutput(sqrtPX96, liquidity, amountOut, zeroForOne):
+    require(sqrtPX96 > 0)
+    require(liquidity > 0)
+    if zeroForOne:
+        return getNextSqrtPriceFromAmount1RoundingDown(
+            sqrtPX96, liquidity, amountOut, False
+        )
+    return getNextSqrtPriceFromAmount0RoundingUp(sqrtPX96, liquidity, amountOut, False)
+
+
+# SwapMath.computeSwapStep; a positive amountRemaining is exact input
+def computeSwapStep(
+    sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, amountRemaining, fee
+):
+    zeroForOne = sqrtRatioCurrentX96 >= sqrtRatioTargetX96
+    exactIn = amountRemaining >= 0
+    if exactIn:
+        amountRemainingLessFee = mulDiv(
+            amountRemaining, FEE_PRECISION - fee, FEE_PRECISION
+        )
+        if zeroForOne:
+            amountIn = getAmount0Delta(
+                sqrtRatioTargetX96, sqrtRatioCurrentX96, liquidity, True
+            )
+        else:
+            amountIn = getAmount1Delta(
+                sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, True
+            )
+        if amountRemainingLessFee >= amountIn:
+            sqrtRatioNextX96 = sqrtRatioTargetX96
+        else:
+            sqrtRatioNextX96 = getNextSqrtPriceFromInput(
+                sqrtRatioCurrentX96, liquidity, amountRemainingLessFee, zeroForOne
+            )
+    else:
+        if zeroForOne:
+            amountOut = getAmount1Delta(
+                sqrtRatioTargetX96, sqrtRatioCurrentX96, liquidity, False
+            )
+        else:
+            amountOut = getAmount0Delta(
+                sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, False
+            )
+        if -amountRemaining >= amountOut:
+            sqrtRatioNextX96 = sqrtRatioTargetX96
+        else:
+            sqrtRatioNextX96 = getNextSqrtPriceFromOutput(
+                sqrtRatioCurrentX96, liquidity, -amountRemaining, zeroForOne
+            )
+    reachedTarget = sqrtRatioTargetX96 == sqrtRatioNextX96
+    if zeroForOne:
+        if not (reachedTarget and exactIn):
+            amountIn = getAmount0Delta(
+                sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, True
+            )
+        if not (reachedTarget and not exactIn):
+            amountOut = getAmount1Delta(
+                sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, False
+            )
+    else:
+        if not (reachedTarget and exactIn):
+            amountIn = getAmount1Delta(
+                sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, True
+            )
+        if not (reachedTarget and not exactIn):
+            amountOut = getAmount0Delta(
+                sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, False
+            )
+    if not exactIn and amountOut > -amountRemaining:
+        amountOut = -amountRemaining
+    if exactIn and sqrtRatioNextX96 != sqrtRatioTargetX96:
+        feeAmount = amountRemaining - amountIn
+    else:
+        feeAmount = mulDivRoundingUp(amountIn, fee, FEE_PRECISION - fee)
+    return (sqrtRatioNextX96, amountIn, amountOut, feeAmount)
+
+
+# An in-memory UniswapV3Pool that only swaps. `ticks` maps every initialized
+# tick to its TickData; mints and burns are not modelled, so the initialized
+# ticks never change and are kept as one sorted list.
+class PoolSimulator:
+    def __init__(
+        self,
+        sqrtPriceX96,
+        tick,
+        liquidity,
+        fee,
+        tickSpacing,
+        ticks,
+        feeGrowthGlobal0X128=0,
+        feeGrowthGlobal1X128=0,
+        feeProtocol=0,
+    ):
+        self.sqrtPriceX96 = sqrtPriceX96
+        self.tick = tick
+        self.liquidity = liquidity
+        self.fee = fee
+        self.tickSpacing = tickSpacing
+        self.ticks = dict(ticks)
+        self.initialized = sorted(self.ticks)
+        self.feeGrowthGlobal0X128 = feeGrowthGlobal0X128
+        self.feeGrowthGlobal1X128 = feeGrowthGlobal1X128
+        self.feeProtocol = feeProtocol
+        self.protocolFees0 = 0
+        self.protocolFees1 = 0
+
+    # TickBitmap.nextInitializedTickWithinOneWord. Steps stop at bitmap word
+    # boundaries exactly as in the pool, since every step rounds on its own.
+    def nextInitializedTickWithinOneWord(self, tick, lte):
+        tickSpacing = self.tickSpacing
+        compressed = tick // tickSpacing
+        if lte:
+            first = (compressed - (compressed & 255)) * tickSpacing
+            i = bisect_right(self.initialized, compressed * tickSpacing)
+            if i > 0 and self.initialized[i - 1] >= first:
+                return (self.initialized[i - 1], True)
+            return (first, False)
+        compressed += 1
+        last = (compressed + 255 - (compressed & 255)) * tickSpacing
+        i = bisect_left(self.initialized, compressed * tickSpacing)
+        if i < len(self.initialized) and self.initialized[i] <= last:
+            return (self.initialized[i], True)
+        return (last, False)
+
+    # Tick.cross
+    def cross(self, tick, feeGrowthGlobal0X128, feeGrowthGlobal1X128):
+        info = self.ticks[tick]
+        self.ticks[tick] = info._replace(
+            feeGrowthOutside0X128=(feeGrowthGlobal0X128 - info.feeGrowthOutside0X128)
+            & MAX_UINT256,
+            feeGrowthOutside1X128=(feeGrowthGlobal1X128 - info.feeGrowthOutside1X128)
+            & MAX_UINT256,
+        )
+        return info.liquidityNet
+
+    # UniswapV3Pool.swap. A positive amountSpecified is exact input; returns
+    # the pool's signed token deltas like the pool does.
+    def swap(self, zeroForOne, amountSpecified, sqrtPriceLimitX96=None):
+        require(amountSpecified != 0, "AS")
+        if sqrtPriceLimitX96 is None:
+            sqrtPriceLimitX96 = MIN_SQRT_RATIO + 1 if zeroForOne else MAX_SQRT_RATIO - 1
+        if zeroForOne:
+            require(
+                MIN_SQRT_RATIO < sqrtPriceLimitX96 < self.sqrtPriceX96,
+                "SPL",
+            )
+            feeProtocol = self.feeProtocol % 16
+            feeGrowthGlobalX128 = self.feeGrowthGlobal0X128
+        else:
+            require(
+                self.sqrtPriceX96 < sqrtPriceLimitX96 < MAX_SQRT_RATIO,
+                "SPL",
+            )
+            feeProtocol = self.feeProtocol >> 4
+            feeGrowthGlobalX128 = self.feeGrowthGlobal1X128
+        exactInput = amountSpecified > 0
+        amountSpecifiedRemaining = amountSpecified
+        amountCalculated = 0
+        sqrtPriceX96 = self.sqrtPriceX96
+        tick = self.tick
+        liquidity = self.liquidity
+        protocolFee = 0
+        while amountSpecifiedRemaining != 0 and sqrtPriceX96 != sqrtPriceLimitX96:
+            sqrtPriceStartX96 = sqrtPriceX96
+            tickNext, initialized = self.nextInitializedTickWithinOneWord(
+                tick, zeroForOne
+            )
+            tickNext = min(max(tickNext, MIN_TICK), MAX_TICK)
+            sqrtPriceNextX96 = getSqrtRatioAtTick(tickNext)
+            if (
+                sqrtPriceNextX96 < sqrtPriceLimitX96
+                if zeroForOne
+                else sqrtPriceNextX96 > sqrtPriceLimitX96
+            ):
+                sqrtPriceTargetX96 = sqrtPriceLimitX96
+            else:
+                sqrtPriceTargetX96 = sqrtPriceNextX96
+            sqrtPriceX96, amountIn, amountOut, feeAmount = computeSwapStep(
+                sqrtPriceX96,
+                sqrtPriceTargetX96,
+                liquidity,
+                amountSpecifiedRemaining,
+                self.fee,
+            )
+            if exactInput:
+                amountSpecifiedRemaining -= amountIn + feeAmount
+                amountCalculated -= amountOut
+            else:
+                amountSpecifiedRemaining += amountOut
+                amountCalculated += amountIn + feeAmount
+            if feeProtocol > 0:
+                delta = feeAmount // feeProtocol
+                feeAmount -= delta
+                protocolFee += delta
+            if liquidity > 0:
+                feeGrowthGlobalX128 = (
+                    feeGrowthGlobalX128 + mulDiv(feeAmount, Q128, liquidity)
+                ) & MAX_UINT256
+            if sqrtPriceX96 == sqrtPriceNextX96:
+                if initialized:
+                    if zeroForOne:
+                        liquidityNet = -self.cross(
+                            tickNext, feeGrowthGlobalX128, self.feeGrowthGlobal1X128
+                        )
+                    else:
+                        liquidityNet = self.cross(
+                            tickNext, self.feeGrowthGlobal0X128, feeGrowthGlobalX128
+                        )
+                    liquidity = addDelta(liquidity, liquidityNet)
+                tick = tickNext - 1 if zeroForOne else tickNext
+            elif sqrtPriceX96 != sqrtPriceStartX96:
+                tick = getTickAtSqrtRatio(sqrtPriceX96)
+        self.sqrtPriceX96 = sqrtPriceX96
+        self.tick = tick
+        self.liquidity = liquidity
+        if zeroForOne:
+            self.feeGrowthGlobal0X128 = feeGrowthGlobalX128
+            self.protocolFees0 += protocolFee
+        else:
+            self.feeGrowthGlobal1X128 = feeGrowthGlobalX128
+            self.protocolFees1 += protocolFee
+        if zeroForOne == exactInput:
+            amount0 = amountSpecified - amountSpecifiedRemaining
+            amount1 = amountCalculated
+        else:
+            amount0 = amountCalculated
+            amount1 = amountSpecified - amountSpecifiedRemaining
+        return SwapResult(amount0, amount1, sqrtPriceX96, tick, liquidity)
+
+    def slot0(self):
+        return (self.sqrtPriceX96, self.tick)
+
+    # The pool as lixir.totals reads it, so the vault totals and tokensOwed
+    # can be computed against the simulated price and fee growth
+    def poolState(self):
+        return PoolState(
+            self.sqrtPriceX96,
+            self.tick,
+            self.feeGrowthGlobal0X128,
+            self.feeGrowthGlobal1X128,
+            {
+                t: TickInfo(info.feeGrowthOutside0X128, info.feeGrowthOutside1X128)
+                for t, info in self.ticks.items()
+            },
+        )
+
+    # TickData has the fee growth fields of TickInfo, so the simulator itself
+    # can stand in for the PoolState lixir.totals expects
+    def feeGrowthInside(self, tickLower, tickUpper):
+        return getFeeGrowthInsideTicks(self, self.tick, tickLower, tickUpper)
+
+
+def _bitmap_words(tickSpacing):
+    return range((MIN_TICK // tickSpacing) >> 8, ((MAX_TICK // tickSpacing) >> 8) + 1)
+
+
+# Reads everything a swap touches through multicall, all pinned to one block:
+# slot0, liquidity, fee growth, every tickBitmap word of the pool's tick range
+# and then every tick whose bit is set
+def load_pool(multicall, pool, block_identifier=None):
+    pool = str(pool)
+    blockNumber, results = aggregate(
+        multicall,
+        [
+            Call(
+                pool,
+                "slot0()",
+                (),
+                ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"],
+            ),
+            Call(pool, "liquidity()", (), ["uint128"]),
+            Call(pool, "fee()", (), ["uint24"]),
+            Call(pool, "tickSpacing()", (), ["int24"]),
+            Call(pool, "feeGrowthGlobal0X128()", (), ["uint256"]),
+            Call(pool, "feeGrowthGlobal1X128()", (), ["uint256"]),
+        ],
+        block_identifier=block_identifier,
+    )
+    slot0, (liquidity,), (fee,), (tickSpacing,), (fg0,), (fg1,) = results
+    words = list(_bitmap_words(tickSpacing))
+    _, results = aggregate(
+        multicall,
+        [Call(pool, "tickBitmap(int16)", (w,), ["uint256"]) for w in words],
+        block_identifier=blockNumber,
+    )
+    initialized = []
+    for wordPos, (word,) in zip(words, results):
+        while word:
+            bit = (word & -word).bit_length() - 1
+            initialized.append(((wordPos << 8) + bit) * tickSpacing)
+            word &= word - 1
+    _, results = aggregate(
+        multicall,
+        [
+            Call(
+                pool,
+                "ticks(int24)",
+                (t,),
+                [
+                    "uint128",
+                    "int128",
+                    "uint256",
+                    "uint256",
+                    "int56",
+                    "uint160",
+                    "uint32",
+                    "bool",
+                ],
+            )
+            for t in initialized
+        ],
+        block_identifier=blockNumber,
+    )
+    ticks = {t: TickData(*info[1:4]) for t, info in zip(initialized, results)}
+    return PoolSimulator(
+        slot0[0],
+        slot0[1],
+        liquidity,
+        fee,
+        tickSpacing,
+        ticks,
+        fg0,
+        fg1,
+        slot0[5],
+    )
@@ -5,14 +5,31 @@ from brownie import (
     LixirVault,
     LixirVaultETH,
     LixirStrategySimpleGWAP,
+    web3,
 )
-
+from brownie.convert import to_address
+from eth_abi import encode_abi
 
 LixirSystem = namedtuple(
     "LixirSystem",
     ["registry", "factory", "vault_impl", "eth_vault_impl", "strat_simp_gwap"],
 )
 
+VaultDeployParameters = namedtuple(
+    "VaultDeployParameters",
+    [
+        "name",
+        "symbol",
+        "tokenA",
+        "tokenB",
+        "fee",
+        "tick_short_duration",
+        "max_tick_diff",
+        "main_spread",
+        "range_spread",
+    ],
+)
+
 
 def deploy_system(
     uni_factory,
@@ -39,3 +56,149 @@ def deploy_system(
     registry.grantRole(registry.eth_vault_implementation_role(), eth_vault_impl)
     registry.grantRole(registry.strategy_role(), strat_simp_gwap)
     return LixirSystem(registry, factory, vault_impl, eth_vault_impl, strat_simp_gwap)
+
+
+# LixirRoles, computed locally so grants can be encoded before the registry
+# exists
+ROLES = {
+    name: web3.keccak(text=text)
+    for name, text in (
+        ("gov_role", "v1_gov_role"),
+        ("delegate_role", "v1_delegate_role"),
+        ("strategist_role", "v1_strategist_role"),
+        ("fee_setter_role", "fee_setter_role"),
+        ("pauser_role", "v1_pauser_role"),
+        ("keeper_role", "v1_keeper_role"),
+        ("deployer_role", "v1_deployer_role"),
+        ("factory_role", "v1_factory_role"),
+        ("vault_implementation_role", "v1_vault_implementation_role"),
+        ("eth_vault_implementation_role", "v1_eth_vault_implementation_role"),
+        ("strategy_role", "v1_strategy_role"),
+    )
+}
+
+GRANT_ROLE_SELECTOR = web3.keccak(text="grantRole(bytes32,address)")[:4]
+
+GRANT_ROLE_GAS = 100000
+
+
+def _rlp_bytes(b):
+    if len(b) == 1 and b[0] < 0x80:
+        return b
+    return bytes([0x80 + len(b)]) + b
+
+
+# Address of the contract `sender` creates with `nonce`:
+# keccak(rlp([sender, nonce]))[12:]
+def create_address(sender, nonce):
+    nonce_bytes = nonce.to_bytes((nonce.bit_length() + 7) // 8, "big")
+    payload = _rlp_bytes(bytes.fromhex(str(sender)[2:])) + _rlp_bytes(nonce_bytes)
+    rlp = bytes([0xC0 + len(payload)]) + payload
+    return to_address("0x" + bytes(web3.keccak(rlp)[12:]).hex())
+
+
+# Upper bound on the constructors of the contracts deployed against the
+# registry. They only set immutables and make at most three view calls into
+# the registry, so they can't be estimated before it is mined but stay far
+# below this
+DEPENDENT_CONSTRUCTOR_GAS = 100000
+
+
+# Deploy gas from the artifact alone: intrinsic cost, initcode calldata, code
+# deposit and a margin for the constructor
+def deploy_gas(container, constructor_gas=DEPENDENT_CONSTRUCTOR_GAS):
+    initcode = bytes.fromhex(container.bytecode)
+    runtime = bytes.fromhex(container._build["deployedBytecode"])
+    calldata = sum(16 if b else 4 for b in initcode)
+    return 53000 + calldata + 200 * len(runtime) + constructor_gas
+
+
+# Same system as deploy_system, but every deploy and grantRole is sent back to
+# back with explicit nonces and gas limits, using the CREATE addresses the
+# delegate's nonces will produce, and the receipts are only awaited at the end.
+# The registry's deploy only depends on existing contracts, so it is estimated
+# on chain; its constructor sets up every role and costs far more than the
+# others
+def deploy_system_batched(
+    uni_factory,
+    weth,
+    gov,
+    delegate,
+    strategist,
+    pauser,
+    keeper,
+    deployer,
+    gas_price=None,
+    gas_buffer=1.1,
+):
+    nonce = delegate.nonce
+    containers = (
+        LixirRegistry,
+        LixirFactory,
+        LixirVault,
+        LixirVaultETH,
+        LixirStrategySimpleGWAP,
+    )
+    addresses = [create_address(delegate, nonce + i) for i in range(len(containers))]
+    registry, factory, vault_impl, eth_vault_impl, strat_simp_gwap = addresses
+    tx_params = {"required_confs": 0}
+    if gas_price is not None:
+        tx_params["gas_price"] = gas_price
+    registry_args = (gov, delegate, uni_factory, weth)
+    gas_limits = [
+        int(
+            LixirRegistry.deploy.estimate_gas(*registry_args, {"from": delegate})
+            * gas_buffer
+        )
+    ] + [deploy_gas(container) for container in containers[1:]]
+    txs = []
+    for i, container in enumerate(containers):
+        args = registry_args if i == 0 else (registry,)
+        txs.append(
+            delegate.deploy(
+                container,
+                *args,
+                nonce=nonce + i,
+                gas_limit=gas_limits[i],
+                **tx_params,
+            )
+        )
+    nonce += len(containers)
+    grants = (
+        ("strategist_role", strategist),
+        ("fee_setter_role", strategist),
+        ("pauser_role", pauser),
+        ("keeper_role", keeper),
+        ("deployer_role", deployer),
+        ("factory_role", factory),
+        ("vault_implementation_role", vault_impl),
+        ("eth_vault_implementation_role", eth_vault_impl),
+        ("strategy_role", strat_simp_gwap),
+    )
+    for i, (role, account) in enumerate(grants):
+        data = GRANT_ROLE_SELECTOR + encode_abi(
+            ["bytes32", "address"], [ROLES[role], str(account)]
+        )
+        txs.append(
+            delegate.transfer(
+                registry,
+                0,
+                data=data,
+                nonce=nonce + i,
+                gas_limit=GRANT_ROLE_GAS,
+                **tx_params,
+            )
+        )
+    for tx in txs:
+        tx.wait(1)
+        if tx.status != 1:
+            raise RuntimeError("%s reverted: %s" % (tx.txid, tx.revert_msg))
+    for tx, address in zip(txs, addresses):
+        if tx.contract_address != address:
+            raise RuntimeError(
+                "%s deployed to %s, expected %s"
+                % (tx.txid, tx.contract_address, address)
+            )
+    return LixirSystem(
+        *(container.at(address) for container, address in zip(containers, addresses))
+    )
@@ -0,0 +1,124 @@
+import numpy as np
+from functools import lru_cache
+from lixir.errors import require
+
+MIN_TICK = -887272
+MAX_TICK = -MIN_TICK
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+_MAX_UINT256 = (1 << 256) - 1
+_LOG_SQRT_BASE = np.log(1.0001) / 2
+
+# TickMath.getSqrtRatioAtTick multipliers, keyed by the bit of |tick| they apply to
+_TICK_RATIOS = (
+    (0x2, 0xFFF97272373D413259A46990580E213A),
+    (0x4, 0xFFF2E50F5F656932EF12357CF3C7FDCC),
+    (0x8, 0xFFE5CACA7E10E4E61C3624EAA0941CD0),
+    (0x10, 0xFFCB9843D60F6159C9DB58835C926644),
+    (0x20, 0xFF973B41FA98C081472E6896DFB254C0),
+    (0x40, 0xFF2EA16466C96A3843EC78B326B52861),
+    (0x80, 0xFE5DEE046A99A2A811C461F1969C3053),
+    (0x100, 0xFCBE86C7900A88AEDCFFC83B479AA3A4),
+    (0x200, 0xF987A7253AC413176F2B074CF7815E54),
+    (0x400, 0xF3392B0822B70005940C7A398E4B70F3),
+    (0x800, 0xE7159475A2C29B7443B29C7FA6E889D9),
+    (0x1000, 0xD097F3BDFD2022B8845AD8F792AA5825),
+    (0x2000, 0xA9F746462D870FDF8A65DC1F90E061E5),
+    (0x4000, 0x70D869A156D2A1B890BB3DF62BAF32F7),
+    (0x8000, 0x31BE135F97D08FD981231505542FCFA6),
+    (0x10000, 0x9AA508B5B7A84E1C677DE54F3E99BC9),
+    (0x20000, 0x5D6AF8DEDB81196699C329225EE604),
+    (0x40000, 0x2216E584F5FA1EA926041BEDFE98),
+    (0x80000, 0x48A170391F7DC42444E8FA2),
+)
+
+# Ticks and spacings are int64 arrays. Sqrt prices do not fit in a machine
+# word, so they are object arrays of Python ints; every operation on them is
+# still applied array-wide, which keeps the results bit-exact. The two
+# conversions also take a scalar and then return a Python int, which is what
+# lixir.v3_math re-exports them for.
+
+
+def getSqrtRatioAtTick(ticks):
+    if np.ndim(ticks) == 0:
+        return _sqrtRatioAtTick(int(ticks))
+    ticks = np.asarray(ticks, dtype=np.int64)
+    shape = ticks.shape
+    ticks = ticks.reshape(-1)
+    absTicks = np.abs(ticks)
+    require(np.all(absTicks <= MAX_TICK), "T")
+    ratio = np.full(ticks.shape, 1 << 128, dtype=object)
+    ratio[(absTicks & 0x1) != 0] = 0xFFFCB933BD6FAD37AA2D162D1A594001
+    for bit, multiplier in _TICK_RATIOS:
+        mask = (absTicks & bit) != 0
+        if mask.any():
+            ratio[mask] = (ratio[mask] * multiplier) >> 128
+    positive = ticks > 0
+    if positive.any():
+        ratio[positive] = _MAX_UINT256 // ratio[positive]
+    roundUp = np.where((ratio & 0xFFFFFFFF) != 0, 1, 0).astype(object)
+    return ((ratio >> 32) + roundUp).reshape(shape)
+
+
+# the simulators ask for the same few ticks over and over
+@lru_cache(maxsize=1 << 16)
+def _sqrtRatioAtTick(tick):
+    return getSqrtRatioAtTick([tick])[0]
+
+
+# Greatest tick whose sqrt ratio is <= sqrtPriceX96, which is what
+# TickMath.getTickAtSqrtRatio returns. A float estimate is corrected against
+# the exact getSqrtRatioAtTick, so the result does not depend on float error.
+def getTickAtSqrtRatio(sqrtPricesX96):
+    if np.ndim(sqrtPricesX96) == 0:
+        return int(getTickAtSqrtRatio([int(sqrtPricesX96)])[0])
+    sqrtPrices = np.asarray(sqrtPricesX96, dtype=object)
+    shape = sqrtPrices.shape
+    sqrtPrices = sqrtPrices.reshape(-1)
+    require(
+        np.all((sqrtPrices >= MIN_SQRT_RATIO) & (sqrtPrices < MAX_SQRT_RATIO)), "R"
+    )
+    ticks = np.floor(
+        (np.log(sqrtPrices.astype(np.float64)) - 96 * np.log(2)) / _LOG_SQRT_BASE
+    ).astype(np.int64)
+    ticks = np.clip(ticks, MIN_TICK, MAX_TICK - 1)
+    while True:
+        tooHigh = getSqrtRatioAtTick(ticks) > sqrtPrices
+        tooLow = getSqrtRatioAtTick(ticks + 1) <= sqrtPrices
+        if not (tooHigh.any() or tooLow.any()):
+            return ticks.reshape(shape)
+        ticks = ticks - tooHigh.astype(np.int64) + tooLow.astype(np.int64)
+
+
+def roundTickDown(ticks, tickSpacings):
+    ticks = np.asarray(ticks, dtype=np.int64)
+    # np.mod takes the sign of the divisor, so this rounds towards negative
+    # infinity like the contract does for both signs of tick
+    return np.maximum(ticks - np.mod(ticks, tickSpacings), MIN_TICK)
+
+
+def roundTickUp(ticks, tickSpacings):
+    ticks = np.asarray(ticks, dtype=np.int64)
+    tickDown = roundTickDown(ticks, tickSpacings)
+    return np.minimum(
+        np.where(ticks == tickDown, ticks, tickDown + tickSpacings), MAX_TICK
+    )
+
+
+# Unlike the contract these do not revert; callers filter on lower < upper
+def getMainTicks(tick_gwap, tickSpacings, spreads):
+    tick_gwap = np.asarray(tick_gwap, dtype=np.int64)
+    lower = roundTickDown(tick_gwap - spreads, tickSpacings)
+    upper = roundTickUp(tick_gwap + spreads, tickSpacings)
+    return (lower, upper)
+
+
+def getRangeTicks(sqrtRatioX96, ticks, tickSpacings, spreads):
+    ticks = np.asarray(ticks, dtype=np.int64)
+    onTick = getSqrtRatioAtTick(ticks) == np.asarray(sqrtRatioX96, dtype=object)
+    lower0 = roundTickUp(np.where(onTick, ticks, ticks + 1), tickSpacings)
+    upper0 = roundTickUp(lower0 + spreads, tickSpacings)
+    upper1 = roundTickDown(ticks, tickSpacings)
+    lower1 = roundTickDown(upper1 - spreads, tickSpacings)
+    return (lower0, upper0, lower1, upper1)
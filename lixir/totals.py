@@ -0,0 +1,294 @@
+import numpy as np
+from collections import namedtuple
+from lixir import tick_math
+from lixir.errors import require
+from lixir.v3_math import (
+    MAX_UINT128,
+    MAX_UINT256,
+    Q128,
+    Q96,
+    getAmountsForLiquidity,
+    getSqrtRatioAtTick,
+    mulDiv,
+)
+
+# Snapshot of the pool state `LixirVault` reads in `_calculateTotals`.
+# `ticks` maps tick -> TickInfo and only needs the vault's position bounds.
+PoolState = namedtuple(
+    "PoolState",
+    [
+        "sqrtPriceX96",
+        "tick",
+        "feeGrowthGlobal0X128",
+        "feeGrowthGlobal1X128",
+        "ticks",
+    ],
+)
+
+TickInfo = namedtuple("TickInfo", ["feeGrowthOutside0X128", "feeGrowthOutside1X128"])
+
+# `pool.positions(key)` for a vault position
+PositionInfo = namedtuple(
+    "PositionInfo",
+    [
+        "liquidity",
+        "feeGrowthInside0LastX128",
+        "feeGrowthInside1LastX128",
+        "tokensOwed0",
+        "tokensOwed1",
+    ],
+)
+
+Position = namedtuple("Position", ["tickLower", "tickUpper", "info"])
+
+VaultState = namedtuple(
+    "VaultState", ["pool", "mainPosition", "rangePosition", "balance0", "balance1"]
+)
+
+Totals = namedtuple("Totals", ["total0", "total1", "mL", "rL"])
+
+EMPTY_TICK = TickInfo(0, 0)
+EMPTY_POSITION_INFO = PositionInfo(0, 0, 0, 0, 0)
+
+
+def _add(a, b):
+    c = a + b
+    require(c <= MAX_UINT256)
+    return c
+
+
+def getFeeGrowthInsideTicks(pool, tick, tickLower, tickUpper):
+    lower = pool.ticks.get(tickLower, EMPTY_TICK)
+    upper = pool.ticks.get(tickUpper, EMPTY_TICK)
+    if tick >= tickLower:
+        feeGrowthBelow0X128 = lower.feeGrowthOutside0X128
+        feeGrowthBelow1X128 = lower.feeGrowthOutside1X128
+    else:
+        feeGrowthBelow0X128 = pool.feeGrowthGlobal0X128 - lower.feeGrowthOutside0X128
+        feeGrowthBelow1X128 = pool.feeGrowthGlobal1X128 - lower.feeGrowthOutside1X128
+    if tick < tickUpper:
+        feeGrowthAbove0X128 = upper.feeGrowthOutside0X128
+        feeGrowthAbove1X128 = upper.feeGrowthOutside1X128
+    else:
+        feeGrowthAbove0X128 = pool.feeGrowthGlobal0X128 - upper.feeGrowthOutside0X128
+        feeGrowthAbove1X128 = pool.feeGrowthGlobal1X128 - upper.feeGrowthOutside1X128
+    # uint256 under/overflow is expected here, same as in the vault and v3
+    return (
+        (pool.feeGrowthGlobal0X128 - feeGrowthBelow0X128 - feeGrowthAbove0X128)
+        & MAX_UINT256,
+        (pool.feeGrowthGlobal1X128 - feeGrowthBelow1X128 - feeGrowthAbove1X128)
+        & MAX_UINT256,
+    )
+
+
+def calculateTokensOwed(pool, realTick, tickLower, tickUpper, info):
+    feeGrowthInside0X128, feeGrowthInside1X128 = getFeeGrowthInsideTicks(
+        pool, realTick, tickLower, tickUpper
+    )
+    tokensOwed0 = (
+        info.tokensOwed0
+        + mulDiv(
+            (feeGrowthInside0X128 - info.feeGrowthInside0LastX128) & MAX_UINT256,
+            info.liquidity,
+            Q128,
+        )
+    ) & MAX_UINT128
+    tokensOwed1 = (
+        info.tokensOwed1
+        + mulDiv(
+            (feeGrowthInside1X128 - info.feeGrowthInside1LastX128) & MAX_UINT256,
+            info.liquidity,
+            Q128,
+        )
+    ) & MAX_UINT128
+    return (tokensOwed0, tokensOwed1)
+
+
+def liquidityAndTokensOwed(pool, realTick, position):
+    info = position.info
+    if info.liquidity == 0:
+        return (0, info.tokensOwed0, info.tokensOwed1)
+    tokensOwed0, tokensOwed1 = calculateTokensOwed(
+        pool, realTick, position.tickLower, position.tickUpper, info
+    )
+    return (info.liquidity, tokensOwed0, tokensOwed1)
+
+
+def calculatePositionInfo(pool, realTick, sqrtRatioX96, position):
+    liquidity, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(
+        pool, realTick, position
+    )
+    require(liquidity < 1 << 127)
+    total0, total1 = getAmountsForLiquidity(
+        sqrtRatioX96,
+        getSqrtRatioAtTick(position.tickLower),
+        getSqrtRatioAtTick(position.tickUpper),
+        liquidity,
+    )
+    return (liquidity, total0, total1, tokensOwed0, tokensOwed1)
+
+
+def calculatePositionTotals(pool, realTick, sqrtRatioX96, position):
+    liquidity, total0, total1, tokensOwed0, tokensOwed1 = calculatePositionInfo(
+        pool, realTick, sqrtRatioX96, position
+    )
+    return (liquidity, _add(total0, tokensOwed0), _add(total1, tokensOwed1))
+
+
+def _calculateTotalsFromTick(vault, sqrtRatioX96, realTick):
+    mL, total0, total1 = calculatePositionTotals(
+        vault.pool, realTick, sqrtRatioX96, vault.mainPosition
+    )
+    rL, rt0, rt1 = calculatePositionTotals(
+        vault.pool, realTick, sqrtRatioX96, vault.rangePosition
+    )
+    total0 = _add(_add(total0, rt0), vault.balance0)
+    total1 = _add(_add(total1, rt1), vault.balance1)
+    return Totals(total0, total1, mL, rL)
+
+
+def calculateTotals(vault):
+    return _calculateTotalsFromTick(vault, vault.pool.sqrtPriceX96, vault.pool.tick)
+
+
+def calculateTotalsFromTick(vault, virtualTick):
+    return _calculateTotalsFromTick(
+        vault, getSqrtRatioAtTick(virtualTick), vault.pool.tick
+    )
+
+
+# The batch versions below apply the same math to object arrays of Python
+# ints, one entry per position or candidate tick, so every operation runs
+# array-wide and stays bit-exact. Only gathering the inputs loops in Python.
+
+
+def _column(values):
+    return np.asarray(values, dtype=object).reshape(-1)
+
+
+def _mulDivRoundingUp(a, b, denominator):
+    product = a * b
+    roundUp = np.where(product % denominator > 0, 1, 0).astype(object)
+    return product // denominator + roundUp
+
+
+# getAmountsForLiquidity, rounding up as the vault does. Clamping the price into the
+# range covers all three of its cases: below the range the amount1 part spans
+# nothing and above it the amount0 part does.
+def _amountsForLiquidity(
+    sqrtPricesX96, sqrtRatiosLowerX96, sqrtRatiosUpperX96, liquidity
+):
+    require(np.all(sqrtRatiosLowerX96 > 0))
+    price = np.minimum(
+        np.maximum(sqrtPricesX96, sqrtRatiosLowerX96), sqrtRatiosUpperX96
+    )
+    amount0 = _mulDivRoundingUp(
+        liquidity << 96, sqrtRatiosUpperX96 - price, sqrtRatiosUpperX96
+    )
+    amount0 = amount0 // price + np.where(amount0 % price > 0, 1, 0).astype(object)
+    amount1 = _mulDivRoundingUp(liquidity, price - sqrtRatiosLowerX96, Q96)
+    return (amount0, amount1)
+
+
+# liquidityAndTokensOwed for many positions, each in its own pool. A position
+# without liquidity owes what it already did, as the fee growth term is zero.
+def _liquidityAndTokensOwedMany(pools, positions):
+    lowers = [p.ticks.get(q.tickLower, EMPTY_TICK) for p, q in zip(pools, positions)]
+    uppers = [p.ticks.get(q.tickUpper, EMPTY_TICK) for p, q in zip(pools, positions)]
+    tick = _column([p.tick for p in pools])
+    tickLower = _column([q.tickLower for q in positions])
+    tickUpper = _column([q.tickUpper for q in positions])
+    liquidity = _column([q.info.liquidity for q in positions])
+    owed = []
+    for i in range(2):
+        global_ = _column([getattr(p, "feeGrowthGlobal%dX128" % i) for p in pools])
+        lowerOutside = _column(
+            [getattr(t, "feeGrowthOutside%dX128" % i) for t in lowers]
+        )
+        upperOutside = _column(
+            [getattr(t, "feeGrowthOutside%dX128" % i) for t in uppers]
+        )
+        below = np.where(tick >= tickLower, lowerOutside, global_ - lowerOutside)
+        above = np.where(tick < tickUpper, upperOutside, global_ - upperOutside)
+        inside = (global_ - below - above) & MAX_UINT256
+        last = _column(
+            [getattr(q.info, "feeGrowthInside%dLastX128" % i) for q in positions]
+        )
+        tokensOwed = _column([getattr(q.info, "tokensOwed%d" % i) for q in positions])
+        owed.append(
+            (tokensOwed + ((inside - last) & MAX_UINT256) * liquidity // Q128)
+            & MAX_UINT128
+        )
+    return (liquidity, owed[0], owed[1])
+
+
+def _requireUint256(values):
+    require(np.all(values <= MAX_UINT256))
+    return values
+
+
+# calculateTotals for many vaults at once, both positions of every vault in
+# one pass
+def calculateTotalsMany(vaults):
+    vaults = list(vaults)
+    if not vaults:
+        return []
+    pools = [v.pool for v in vaults] * 2
+    positions = [v.mainPosition for v in vaults] + [v.rangePosition for v in vaults]
+    liquidity, owed0, owed1 = _liquidityAndTokensOwedMany(pools, positions)
+    require(np.all(liquidity < 1 << 127))
+    ticks = [q.tickLower for q in positions] + [q.tickUpper for q in positions]
+    sqrtRatios = tick_math.getSqrtRatioAtTick(ticks)
+    n = len(positions)
+    amount0, amount1 = _amountsForLiquidity(
+        _column([p.sqrtPriceX96 for p in pools]),
+        sqrtRatios[:n],
+        sqrtRatios[n:],
+        liquidity,
+    )
+    total0 = _requireUint256(amount0 + owed0)
+    total1 = _requireUint256(amount1 + owed1)
+    m = len(vaults)
+    total0 = _requireUint256(
+        _requireUint256(total0[:m] + total0[m:]) + _column([v.balance0 for v in vaults])
+    )
+    total1 = _requireUint256(
+        _requireUint256(total1[:m] + total1[m:]) + _column([v.balance1 for v in vaults])
+    )
+    return [
+        Totals(*t)
+        for t in zip(total0.tolist(), total1.tolist(), liquidity[:m], liquidity[m:])
+    ]
+
+
+# Evaluates `calculateTotalsFromTick` for many virtual ticks. Liquidity and
+# tokensOwed only depend on the real tick, so they are computed once per
+# position and only the amounts are evaluated array-wide over the candidate
+# ticks.
+def calculateTotalsFromTicks(vault, virtualTicks):
+    pool = vault.pool
+    sqrtPricesX96 = _column(tick_math.getSqrtRatioAtTick(list(virtualTicks)))
+    owed0 = vault.balance0
+    owed1 = vault.balance1
+    amounts = []
+    for position in (vault.mainPosition, vault.rangePosition):
+        liquidity, tokensOwed0, tokensOwed1 = liquidityAndTokensOwed(
+            pool, pool.tick, position
+        )
+        require(liquidity < 1 << 127)
+        amounts.append(
+            _amountsForLiquidity(
+                sqrtPricesX96,
+                getSqrtRatioAtTick(position.tickLower),
+                getSqrtRatioAtTick(position.tickUpper),
+                liquidity,
+            )
+        )
+        owed0 = _add(owed0, tokensOwed0)
+        owed1 = _add(owed1, tokensOwed1)
+    (m0, m1), (r0, r1) = amounts
+    total0 = _requireUint256(_requireUint256(m0 + r0) + owed0)
+    total1 = _requireUint256(_requireUint256(m1 + r1) + owed1)
+    mL = vault.mainPosition.info.liquidity
+    rL = vault.rangePosition.info.liquidity
+    return [Totals(t0, t1, mL, rL) for t0, t1 in zip(total0.tolist(), total1.tolist())]
@@ -0,0 +1,109 @@
+from lixir.errors import require
+from lixir.tick_math import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    getSqrtRatioAtTick,
+    getTickAtSqrtRatio,
+)
+
+Q96 = 1 << 96
+Q128 = 1 << 128
+MAX_UINT128 = (1 << 128) - 1
+MAX_UINT160 = (1 << 160) - 1
+MAX_UINT256 = (1 << 256) - 1
+
+
+def mulDiv(a, b, denominator):
+    require(denominator > 0)
+    result = a * b // denominator
+    require(result <= MAX_UINT256)
+    return result
+
+
+def mulDivRoundingUp(a, b, denominator):
+    result = mulDiv(a, b, denominator)
+    if a * b % denominator > 0:
+        require(result < MAX_UINT256)
+        result += 1
+    return result
+
+
+def divRoundingUp(x, y):
+    return x // y + (1 if x % y > 0 else 0)
+
+
+def toUint128(x):
+    require(x <= MAX_UINT128)
+    return x
+
+
+def getAmount0Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    numerator1 = liquidity << 96
+    numerator2 = sqrtRatioBX96 - sqrtRatioAX96
+    require(sqrtRatioAX96 > 0)
+    if roundUp:
+        return divRoundingUp(
+            mulDivRoundingUp(numerator1, numerator2, sqrtRatioBX96), sqrtRatioAX96
+        )
+    return mulDiv(numerator1, numerator2, sqrtRatioBX96) // sqrtRatioAX96
+
+
+def getAmount1Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    if roundUp:
+        return mulDivRoundingUp(liquidity, sqrtRatioBX96 - sqrtRatioAX96, Q96)
+    return mulDiv(liquidity, sqrtRatioBX96 - sqrtRatioAX96, Q96)
+
+
+# LixirVault.getAmountsForLiquidity; a positive liquidityDelta rounds up, a
+# negative one (i.e. a burn) rounds down
+def getAmountsForLiquidity(
+    sqrtPriceX96, sqrtPriceX96Lower, sqrtPriceX96Upper, liquidityDelta
+):
+    roundUp = liquidityDelta >= 0
+    liquidity = abs(liquidityDelta)
+    amount0 = 0
+    amount1 = 0
+    if sqrtPriceX96 <= sqrtPriceX96Lower:
+        amount0 = getAmount0Delta(
+            sqrtPriceX96Lower, sqrtPriceX96Upper, liquidity, roundUp
+        )
+    elif sqrtPriceX96 < sqrtPriceX96Upper:
+        amount0 = getAmount0Delta(sqrtPriceX96, sqrtPriceX96Upper, liquidity, roundUp)
+        amount1 = getAmount1Delta(sqrtPriceX96Lower, sqrtPriceX96, liquidity, roundUp)
+    else:
+        amount1 = getAmount1Delta(
+            sqrtPriceX96Lower, sqrtPriceX96Upper, liquidity, roundUp
+        )
+    return (amount0, amount1)
+
+
+def getLiquidityForAmount0(sqrtRatioAX96, sqrtRatioBX96, amount0):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    intermediate = mulDiv(sqrtRatioAX96, sqrtRatioBX96, Q96)
+    return toUint128(mulDiv(amount0, intermediate, sqrtRatioBX96 - sqrtRatioAX96))
+
+
+def getLiquidityForAmount1(sqrtRatioAX96, sqrtRatioBX96, amount1):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    return toUint128(mulDiv(amount1, Q96, sqrtRatioBX96 - sqrtRatioAX96))
+
+
+def getLiquidityForAmounts(sqrtRatioX96, sqrtRatioAX96, sqrtRatioBX96, amount0, amount1):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    if sqrtRatioX96 <= sqrtRatioAX96:
+        return getLiquidityForAmount0(sqrtRatioAX96, sqrtRatioBX96, amount0)
+    elif sqrtRatioX96 < sqrtRatioBX96:
+        liquidity0 = getLiquidityForAmount0(sqrtRatioX96, sqrtRatioBX96, amount0)
+        liquidity1 = getLiquidityForAmount1(sqrtRatioAX96, sqrtRatioX96, amount1)
+        return min(liquidity0, liquidity1)
+    else:
+        return getLiquidityForAmount1(sqrtRatioAX96, sqrtRatioBX96, amount1)
@@ -1,5 +1,45 @@
-from brownie import LixirVault, LixirVaultETH
+from brownie import LixirVault, LixirVaultETH, interface
 from eth_abi import encode_abi
+from lixir.positions import position_key
+from lixir.totals import (
+    PoolState,
+    Position,
+    PositionInfo,
+    TickInfo,
+    VaultState,
+)
+
+
+def _create_vault_args(
+    name,
+    symbol,
+    tokenA,
+    tokenB,
+    vault_impl,
+    strategist,
+    keeper,
+    strat_simp_gwap,
+    fee,
+    tick_short_duration,
+    max_tick_diff,
+    main_spread,
+    range_spread,
+):
+    return (
+        name,
+        symbol,
+        tokenA,
+        tokenB,
+        vault_impl,
+        strategist,
+        keeper,
+        strat_simp_gwap,
+        encode_abi(
+            ["uint24", "uint32", "int24", "int24", "int24"],
+            [fee, tick_short_duration, max_tick_diff, main_spread, range_spread],
+        ),
+    )
+
 
 def deploy_vault(
     deployer,
@@ -19,7 +59,7 @@ def deploy_vault(
     range_spread,
     eth=False,
 ):
-    args = (
+    args = _create_vault_args(
         name,
         symbol,
         tokenA,
@@ -28,10 +68,11 @@ def deploy_vault(
         strategist,
         keeper,
         strat_simp_gwap,
-        encode_abi(
-            ["uint24", "uint32", "int24", "int24", "int24"],
-            [fee, tick_short_duration, max_tick_diff, main_spread, range_spread],
-        ),
+        fee,
+        tick_short_duration,
+        max_tick_diff,
+        main_spread,
+        range_spread,
     )
     if eth:
         tx = factory.createVaultETH(*(args + ({"from": deployer, "gas": 2000000},)))
@@ -40,3 +81,87 @@ def deploy_vault(
         tx = factory.createVault(*(args + ({"from": deployer, "gas": 2000000},)))
         vault = LixirVault.at(tx.new_contracts[0])
     return vault
+
+
+# Creates one vault per VaultDeployParameters in a single
+# LixirFactory.createVaults call. Pairs containing WETH get an ETH vault. The
+# gas limit is the sum of each vault's own createVault(ETH) estimate, less the
+# base tx cost they all include but the batch pays once.
+def deploy_vaults(
+    deployer,
+    factory,
+    strategist,
+    keeper,
+    vault_impl,
+    eth_vault_impl,
+    strat_simp_gwap,
+    params,
+    gas_buffer=1.1,
+):
+    weth = factory.weth9()
+    entries = []
+    gas = 0
+    for p in params:
+        eth = weth in (str(p.tokenA), str(p.tokenB))
+        args = _create_vault_args(
+            p.name,
+            p.symbol,
+            p.tokenA,
+            p.tokenB,
+            eth_vault_impl if eth else vault_impl,
+            strategist,
+            keeper,
+            strat_simp_gwap,
+            p.fee,
+            p.tick_short_duration,
+            p.max_tick_diff,
+            p.main_spread,
+            p.range_spread,
+        )
+        create = factory.createVaultETH if eth else factory.createVault
+        gas += create.estimate_gas(*(args + ({"from": deployer},))) - 21000
+        entries.append((args, eth))
+    tx = factory.createVaults(
+        [args for args, _ in entries],
+        {"from": deployer, "gas": int((gas + 21000) * gas_buffer)},
+    )
+    return [
+        (LixirVaultETH if eth else LixirVault).at(event["vault"])
+        for event, (_, eth) in zip(tx.events["VaultCreated"], entries)
+    ]
+
+
+def get_pool_state(pool, ticks):
+    slot0 = pool.slot0()
+    return PoolState(
+        slot0[0],
+        slot0[1],
+        pool.feeGrowthGlobal0X128(),
+        pool.feeGrowthGlobal1X128(),
+        {t: TickInfo(*pool.ticks(t)[2:4]) for t in set(ticks)},
+    )
+
+
+def get_vault_state(vault, pool=None):
+    if pool is None:
+        pool = interface.IUniswapV3Pool(vault.activePool())
+    positions = []
+    for tickLower, tickUpper in (vault.mainPosition(), vault.rangePosition()):
+        info = pool.positions(position_key(vault.address, tickLower, tickUpper))
+        positions.append(Position(tickLower, tickUpper, PositionInfo(*info)))
+    mainPosition, rangePosition = positions
+    return VaultState(
+        get_pool_state(
+            pool,
+            [
+                mainPosition.tickLower,
+                mainPosition.tickUpper,
+                rangePosition.tickLower,
+                rangePosition.tickUpper,
+            ],
+        ),
+        mainPosition,
+        rangePosition,
+        interface.IERC20(vault.token0()).balanceOf(vault),
+        interface.IERC20(vault.token1()).balanceOf(vault),
+    )
@@ -1,6 +1,6 @@
 from collections import namedtuple
 from scripts.helpers.test_pools import create_eth_pool, create_pool, create_token
-from brownie import MockRouter
+from brownie import MockRouter, Multicall, chain
 from lixir.system import (
     LixirSystem,
     VaultDeployParameters,
@@ -9,6 +9,25 @@ from lixir.system import (
 )
 import pytest
 
+
+# The system, its dependencies and the accounts' roles are deployed once per
+# session, and every module starts from that state instead of an empty chain
+# and a full redeploy. brownie's chain.reset() returns to the state the chain
+# was in the first time it was called, so it is first called only once the
+# system is deployed; fn_isolation keeps chain.snapshot() to itself.
+@pytest.fixture(scope="session")
+def session_snapshot(system, mock_router, multicall):
+    height = chain.height
+    assert chain.reset() == height, "chain.reset() was called before the deploy"
+
+
+@pytest.fixture(scope="module")
+def module_isolation(session_snapshot):
+    chain.reset()
+    yield
+    chain.reset()
+
+
 @pytest.fixture(scope="module", autouse=True)
 def shared_setup(module_isolation):
     pass
@@ -20,94 +39,94 @@ def UniswapV3Core(pm):
     return UniswapV3Core
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def lixir_accounts(accounts):
     return get_accounts()
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def gov(lixir_accounts):
     return lixir_accounts.gov
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def delegate(lixir_accounts):
     return lixir_accounts.delegate
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def strategist(lixir_accounts):
     return lixir_accounts.strategist
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def keeper(lixir_accounts):
     return lixir_accounts.keeper
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def deployer(lixir_accounts):
     return lixir_accounts.deployer
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def pauser(lixir_accounts):
     return lixir_accounts.pauser
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def uni_gov(accounts):
     return accounts[6]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def users(accounts):
     return accounts[7:]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def user(users):
     return users[0]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def system(uni_gov, lixir_accounts):
     weth, uni_factory = deploy_dependencies(uni_gov)
     system = LixirSystem.deploy(weth, uni_factory, lixir_accounts)
     return system
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def registry(system):
     return system.registry
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def vault_impl(system):
     return system.vault_impl
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def eth_vault_impl(system):
     return system.eth_vault_impl
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def strat_simp_gwap(system):
     return system.strat_simp_gwap
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def factory(system):
     return system.factory
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def uni_factory(system):
     return system.uni_factory
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def weth(system):
     return system.weth
 
@@ -178,7 +197,13 @@ def eth_vault(eth_pool, strategist, users, system: LixirSystem):
     return vault
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def mock_router(uni_gov):
     mock_router = MockRouter.deploy({'from': uni_gov})
     return mock_router
+
+
+@pytest.fixture(scope="session")
+def multicall(uni_gov):
+    multicall = Multicall.deploy({'from': uni_gov})
+    return multicall
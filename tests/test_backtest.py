@@ -0,0 +1,51 @@
+import numpy as np
+from lixir.backtest import grid, rank, sweep
+from lixir.simulator import PriceHistory, StrategySimulator
+
+
+def _history(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    timestamps = 1000 + 15 * np.arange(n)
+    ticks = np.cumsum(rng.integers(-30, 31, n))
+    return PriceHistory(
+        timestamps,
+        ticks,
+        liquidity=[10 ** 21] * n,
+        fees0=[int(f) for f in rng.integers(0, 10 ** 15, n)],
+        fees1=[int(f) for f in rng.integers(0, 10 ** 15, n)],
+    )
+
+
+def test_sweep_matches_simulator():
+    history = _history()
+    configs = grid([60, 120], [100, 400], [600], [300, 900])
+    results = sweep(history, configs, 60, 10 ** 18, 10 ** 18, 300, max_workers=2)
+    assert len(results) == len(configs)
+    for result in results:
+        simulator = StrategySimulator(history, 60, *result.config)
+        steps = list(simulator.run(10 ** 18, 10 ** 18, 300))
+        assert result.revert_msg is None
+        assert result.rebalances == simulator.rebalances
+        assert result.reverts == sum(s.revert_msg is not None for s in steps)
+        assert (result.total0, result.total1) == (steps[-1].total0, steps[-1].total1)
+        assert result.feesEarned0 == simulator.feesEarned0
+        assert result.feesEarned1 == simulator.feesEarned1
+    fees = [r.feesValue for r in results]
+    assert fees == sorted(fees, reverse=True)
+
+
+def test_rank_directions():
+    history = _history()
+    results = sweep(
+        history,
+        grid([60], [100, 400], [300, 1200], [300]),
+        60,
+        10 ** 18,
+        10 ** 18,
+        300,
+        max_workers=2,
+    )
+    drift = [abs(r.inventoryDrift) for r in rank(results, "inventoryDrift")]
+    assert drift == sorted(drift)
+    reverts = [r.reverts for r in rank(results, "reverts")]
+    assert reverts == sorted(reverts)
@@ -0,0 +1,42 @@
+from lixir.system import VaultDeployParameters
+from lixir.vault import deploy_vaults
+
+
+def test_deploy_vaults(
+    system, pool, eth_pool, deployer, strategist, keeper, factory, strat_simp_gwap
+):
+    params = [
+        VaultDeployParameters(
+            "Lixir Vault Token %d" % i,
+            "LVT%d" % i,
+            p.token0,
+            p.token1,
+            p.fee,
+            60 + i,
+            120,
+            1800,
+            900,
+        )
+        for i, p in enumerate((pool, eth_pool, pool))
+    ]
+    vaults = deploy_vaults(
+        deployer,
+        factory,
+        strategist,
+        keeper,
+        system.vault_impl,
+        system.eth_vault_impl,
+        strat_simp_gwap,
+        params,
+    )
+    assert len(vaults) == 3
+    for vault, p, impl in zip(
+        vaults, params, (system.vault_impl, system.eth_vault_impl, system.vault_impl)
+    ):
+        assert vault.name() == p.name
+        assert {vault.token0(), vault.token1()} == {str(p.tokenA), str(p.tokenB)}
+        assert factory.vaultToImplementation(vault) == impl
+        assert strat_simp_gwap.vaultDatas(vault).dict()["TICK_SHORT_DURATION"] == (
+            p.tick_short_duration
+        )
+    assert vaults[0] != vaults[2]
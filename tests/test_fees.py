@@ -0,0 +1,58 @@
+import pytest
+from brownie import chain
+from lixir.fees import FeeTracker
+from lixir.quotes import read_withdraw_states
+from lixir.totals import liquidityAndTokensOwed
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def _chain_fees(multicall, vaults):
+    fees = []
+    for state in read_withdraw_states(multicall, vaults):
+        pool = state.vaultState.pool
+        owed = [
+            liquidityAndTokensOwed(pool, pool.tick, position)[1:]
+            for position in (
+                state.vaultState.mainPosition,
+                state.vaultState.rangePosition,
+            )
+        ]
+        fees.append((owed[0][0] + owed[1][0], owed[0][1] + owed[1][1]))
+    return fees
+
+
+def test_fee_tracker_matches_chain(
+    vault, eth_vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    eth_vault.depositETH(
+        1e18, 0, 0, user, chain.time() + 60, {"from": user, "value": 1e18}
+    )
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    vaults = [vault, eth_vault]
+    tracker = FeeTracker(multicall)
+    tracker.track(vaults)
+    for zeroForOne, amount in ((True, 1e17), (False, 3e17), (True, -5e16)):
+        mock_router.swap(pool.pool, zeroForOne, amount, {"from": user})
+    tracker.update()
+    assert [tracker.uncollected(v)[2:4] for v in vaults] == _chain_fees(
+        multicall, vaults
+    )
+    # a deposit mints into the pool, which reloads it and the vault
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 2e17, {"from": user})
+    tracker.update()
+    assert [tracker.uncollected(v)[2:4] for v in vaults] == _chain_fees(
+        multicall, vaults
+    )
+    prices = {tracker.uncollected(v).token1: 1 for v in vaults}
+    ranked = tracker.ranked(prices)
+    assert ranked[0].value1 >= ranked[1].value1
+    with pytest.raises(KeyError):
+        tracker.ranked({})
@@ -0,0 +1,254 @@
+import os
+import pytest
+from brownie import chain, history
+from scripts.helpers.test_pools import create_pool
+from lixir.gas import (
+    DEFAULT_THRESHOLD,
+    GasBenchmarks,
+    GasRegression,
+    MissingBaseline,
+    format_report,
+    load_baseline,
+)
+from lixir.system import VaultDeployParameters
+
+# LIXIR_GAS_UPDATE=1 records this run's numbers in lixir/gas_baseline.json
+# instead of checking against it. Without it, a benchmark missing from the
+# baseline fails, and the benchmarks are skipped until a baseline is recorded
+GAS_THRESHOLD = float(os.environ.get("LIXIR_GAS_THRESHOLD", DEFAULT_THRESHOLD))
+GAS_UPDATE = bool(os.environ.get("LIXIR_GAS_UPDATE"))
+
+
+@pytest.fixture(scope="module")
+def gas():
+    benchmarks = GasBenchmarks(threshold=GAS_THRESHOLD, update=GAS_UPDATE)
+    if not benchmarks.baseline and not GAS_UPDATE:
+        pytest.skip("no gas baseline recorded, run with LIXIR_GAS_UPDATE=1")
+    yield benchmarks
+    benchmarks.save()
+    print("\n" + format_report(benchmarks.results))
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def rebalance(vault, pool, strat_simp_gwap, keeper):
+    chain.sleep(100)
+    return strat_simp_gwap.rebalance(
+        vault, pool.pool.slot0().dict()["tick"], {"from": keeper}
+    )
+
+
+# a deposited and rebalanced vault, so it has a main position and fee state
+def seed(vault, pool, user, strat_simp_gwap, keeper, strategist):
+    strat_simp_gwap.setMaxTickDiff(vault, 2 ** 23 - 2, {"from": strategist})
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    rebalance(vault, pool, strat_simp_gwap, keeper)
+
+
+def test_deposit(gas, vault, pool, users, strat_simp_gwap, keeper, strategist):
+    user = users[0]
+    gas.measure(
+        "deposit/first",
+        vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user}),
+    )
+    rebalance(vault, pool, strat_simp_gwap, keeper)
+    gas.measure(
+        "deposit/steady",
+        vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user}),
+    )
+
+
+def test_withdraw(gas, vault, pool, users, strat_simp_gwap, keeper, strategist):
+    user = users[0]
+    seed(vault, pool, user, strat_simp_gwap, keeper, strategist)
+    shares = vault.balanceOf(user)
+    gas.measure(
+        "withdraw/partial",
+        vault.withdraw(shares // 2, 0, 0, user, chain.time() + 60, {"from": user}),
+    )
+    gas.measure(
+        "withdraw/all",
+        vault.withdraw(
+            vault.balanceOf(user), 0, 0, user, chain.time() + 60, {"from": user}
+        ),
+    )
+
+
+def test_withdraw_from(gas, vault, pool, users, strat_simp_gwap, keeper, strategist):
+    owner, spender = users[:2]
+    seed(vault, pool, owner, strat_simp_gwap, keeper, strategist)
+    shares = vault.balanceOf(owner) // 2
+    vault.approve(spender, shares, {"from": owner})
+    gas.measure(
+        "withdrawFrom/partial",
+        vault.withdrawFrom(
+            owner, shares, 0, 0, spender, chain.time() + 60, {"from": spender}
+        ),
+    )
+
+
+def test_eth_vault(gas, eth_vault, eth_pool, users, strat_simp_gwap, keeper):
+    user = users[0]
+    deadline = chain.time() + 60
+    gas.measure(
+        "depositETH/first",
+        eth_vault.depositETH(1e18, 0, 0, user, deadline, {"from": user, "value": 1e18}),
+    )
+    rebalance(eth_vault, eth_pool, strat_simp_gwap, keeper)
+    gas.measure(
+        "depositETH/steady",
+        eth_vault.depositETH(
+            1e18, 0, 0, user, chain.time() + 60, {"from": user, "value": 1e18}
+        ),
+    )
+    shares = eth_vault.balanceOf(user)
+    gas.measure(
+        "withdrawETH/partial",
+        eth_vault.withdrawETH(
+            shares // 2, 0, 0, user, chain.time() + 60, {"from": user}
+        ),
+    )
+    gas.measure(
+        "withdrawETH/all",
+        eth_vault.withdrawETH(
+            eth_vault.balanceOf(user), 0, 0, user, chain.time() + 60, {"from": user}
+        ),
+    )
+
+
+@pytest.mark.parametrize("zeroForOne", [True, False])
+def test_rebalance_range_side(
+    gas,
+    vault,
+    pool,
+    users,
+    strat_simp_gwap,
+    keeper,
+    strategist,
+    mock_router,
+    zeroForOne,
+):
+    user = users[0]
+    seed(vault, pool, user, strat_simp_gwap, keeper, strategist)
+    # the vault is left holding the token the swap paid in, which only fits
+    # a range position on the far side of the new price
+    mock_router.swap(pool.pool, zeroForOne, 1e17, {"from": user})
+    tx = rebalance(vault, pool, strat_simp_gwap, keeper)
+    lower, upper = vault.rangePosition()
+    tick = pool.pool.slot0().dict()["tick"]
+    if zeroForOne:
+        assert tick < lower
+        gas.measure("rebalance/range-above", tx)
+    else:
+        assert upper <= tick
+        gas.measure("rebalance/range-below", tx)
+
+
+def test_rebalance_fee_tier_change(
+    gas,
+    vault,
+    pool,
+    users,
+    uni_factory,
+    strat_simp_gwap,
+    keeper,
+    strategist,
+    mock_router,
+):
+    user = users[0]
+    seed(vault, pool, user, strat_simp_gwap, keeper, strategist)
+    new_pool = create_pool(uni_factory, pool.token0, pool.token1, users, 500)
+    spacing = new_pool.pool.tickSpacing()
+    tick = 887271 // spacing * spacing
+    mock_router.mintAmounts(new_pool.pool, 1e18, 1e18, -tick, tick)
+    chain.sleep(100)
+    data = strat_simp_gwap.vaultDatas(vault).dict()
+    # configureVault rebalances into the new pool through _setPool
+    gas.measure(
+        "rebalance/fee-tier-change",
+        strat_simp_gwap.configureVault(
+            vault,
+            500,
+            data["TICK_SHORT_DURATION"],
+            data["MAX_TICK_DIFF"],
+            data["mainSpread"],
+            data["rangeSpread"],
+            {"from": strategist},
+        ),
+    )
+    assert vault.activePool() == new_pool.pool
+
+
+@pytest.mark.parametrize("performanceFee", [0, 100000])
+def test_rebalance_performance_fee(
+    gas,
+    vault,
+    pool,
+    users,
+    strat_simp_gwap,
+    keeper,
+    strategist,
+    mock_router,
+    registry,
+    delegate,
+    performanceFee,
+):
+    user = users[0]
+    registry.setFeeTo(delegate, {"from": delegate})
+    vault.setPerformanceFee(performanceFee, {"from": strategist})
+    seed(vault, pool, user, strat_simp_gwap, keeper, strategist)
+    startSqrtRatioX96 = pool.pool.slot0().dict()["sqrtPriceX96"]
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    mock_router.swapLimit(pool.pool, False, 1e20, startSqrtRatioX96, {"from": user})
+    tx = rebalance(vault, pool, strat_simp_gwap, keeper)
+    if performanceFee:
+        assert vault.balanceOf(delegate) > 0
+        gas.measure("rebalance/performance-fee-on", tx)
+    else:
+        assert vault.balanceOf(delegate) == 0
+        gas.measure("rebalance/performance-fee-off", tx)
+
+
+def test_create_vault(gas, pool, system):
+    system.deploy_vault(
+        VaultDeployParameters(
+            name="Lixir Vault Token",
+            symbol="LVT",
+            tokenA=pool.token0,
+            tokenB=pool.token1,
+            fee=pool.fee,
+            tick_short_duration=60,
+            max_tick_diff=120,
+            main_spread=1800,
+            range_spread=900,
+        )
+    )
+    tx = history[-1]
+    assert tx.fn_name == "createVault"
+    gas.measure("createVault", tx)
+
+
+def test_calculate_totals(gas, vault, pool, users, strat_simp_gwap, keeper, strategist):
+    gas.measure("calculateTotals/empty", vault.calculateTotals.estimate_gas())
+    seed(vault, pool, users[0], strat_simp_gwap, keeper, strategist)
+    gas.measure("calculateTotals/steady", vault.calculateTotals.estimate_gas())
+
+
+def test_baseline_gate(tmp_path):
+    path = str(tmp_path / "gas_baseline.json")
+    benchmarks = GasBenchmarks(path)
+    with pytest.raises(MissingBaseline):
+        benchmarks.measure("new", 1000)
+    benchmarks.save()
+    assert load_baseline(path) == {}
+    recorder = GasBenchmarks(path, update=True)
+    recorder.measure("new", 1000)
+    recorder.save()
+    assert load_baseline(path) == {"new": 1000}
+    benchmarks = GasBenchmarks(path)
+    assert benchmarks.measure("new", 1010).change == 0.01
+    with pytest.raises(GasRegression):
+        benchmarks.measure("new", 1011)
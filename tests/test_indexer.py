@@ -0,0 +1,41 @@
+import pytest
+from brownie import chain
+from lixir.indexer import Indexer, to_addresses, to_ints
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def test_indexer_resumes(
+    tmp_path, factory, vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    start = factory.tx.block_number
+    indexer = Indexer(tmp_path, factory, from_block=start, chunk_size=3)
+    indexer.update()
+    assert vault.address in indexer.vaults()
+    tx = vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e16, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    assert indexer.update() >= 2
+    deposits = indexer.table("Deposit")
+    assert to_ints(deposits["shares"])[-1] == tx.events["Deposit"]["shares"]
+    assert to_addresses(deposits["recipient"])[-1] == user.address
+    shares = vault.balanceOf(user)
+    vault.withdraw(shares, 0, 0, user, chain.time() + 60, {"from": user})
+
+    # a fresh indexer on the same store only picks up the new blocks
+    resumed = Indexer(tmp_path, factory, from_block=start)
+    assert resumed.lastBlock == indexer.lastBlock
+    assert resumed.update() == 1
+    # creating the vault already rebalanced it once, in _configureVault
+    rebalances = resumed.table("Rebalance")
+    assert len(rebalances["blockNumber"]) == 2
+    assert (rebalances["mainTickLower"][-1], rebalances["mainTickUpper"][-1]) == tuple(
+        vault.mainPosition()
+    )
+    assert to_ints(resumed.table("Withdraw")["shares"])[-1] == shares
+    assert resumed.lastBlock == chain.height
@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+from collections import namedtuple
+from brownie import chain
+from lixir.keeper import (
+    BlockFollower,
+    Decision,
+    EventKeeper,
+    Keeper,
+    predict_rebalance,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def test_keeper_rebalances_vaults(
+    vault, eth_vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    chain.mine()
+    before = strat_simp_gwap.vaultDatas(vault).dict()["timestamp"]
+    k = Keeper(keeper, strat_simp_gwap, [vault])
+    try:
+        (result,) = asyncio.run(k.run_once())
+    finally:
+        k.close()
+    assert result.revert_msg is None
+    assert result.tx.status == 1
+    assert strat_simp_gwap.vaultDatas(vault).dict()["timestamp"] > before
+
+
+def test_keeper_skips_vaults_failing_tick_check(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    k = Keeper(keeper, strat_simp_gwap, [vault])
+    try:
+        (result,) = asyncio.run(k.run_once())
+    finally:
+        k.close()
+    assert result.tx is None
+    assert result.revert_msg == "Tick diff to great"
+
+
+# a send that fails before reaching the chain is reported for its vault and
+# the vaults after it are still sent, at the nonce the node expects
+def test_keeper_submit_continues_after_failed_send(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    chain.mine()
+    tick = pool.pool.slot0().dict()["tick"]
+    k = Keeper(keeper, strat_simp_gwap, [vault])
+    try:
+        decisions = [Decision("0x1", tick, None), Decision(vault, tick, None)]
+        failed, sent = asyncio.run(k.confirm(asyncio.run(k.submit(decisions))))
+    finally:
+        k.close()
+    assert failed.vault == "0x1"
+    assert failed.tx is None
+    assert failed.revert_msg
+    assert sent.revert_msg is None
+    assert sent.tx.status == 1
+
+
+def test_predict_rebalance_matches_vault(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, False, 1e17, {"from": user})
+    chain.sleep(100)
+    chain.mine()
+    prediction = predict_rebalance(vault)
+    assert prediction.revert_msg is None
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    assert prediction.mainTicks == tuple(vault.mainPosition())
+    assert tuple(vault.rangePosition()) in (
+        prediction.rangeTicks0,
+        prediction.rangeTicks1,
+    )
+
+
+def test_predict_rebalance_revert_reason(
+    vault, pool, users, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    assert predict_rebalance(vault).revert_msg == "Tick diff to great"
+    tick = pool.pool.slot0().dict()["tick"]
+    chain.sleep(100)
+    chain.mine()
+    assert predict_rebalance(vault, tick + 1000).revert_msg == "Tick diff to great"
+    assert predict_rebalance(vault, tick).revert_msg is None
+
+
+def test_event_keeper_follows_swaps(
+    vault, eth_vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    eth_vault.depositETH(
+        1e18, 0, 0, user, chain.time() + 60, {"from": user, "value": 1e18}
+    )
+    chain.sleep(100)
+    chain.mine()
+    k = EventKeeper(keeper, strat_simp_gwap, [vault, eth_vault])
+    try:
+        results = asyncio.run(k.start())
+        assert all(r.tx.status == 1 for r in results)
+        # nothing moved, so nothing is evaluated
+        chain.mine()
+        assert asyncio.run(k.step()) == []
+        assert asyncio.run(k.step()) is None
+        mock_router.swap(pool.pool, True, 1e17, {"from": user})
+        (result,) = asyncio.run(k.step())
+        assert result.vault == vault
+        assert result.revert_msg == "Tick diff to great"
+        assert k.pending == {vault.address}
+        # the short gwap catches up with the price without another swap
+        chain.sleep(100)
+        chain.mine()
+        (result,) = asyncio.run(k.step())
+        assert result.revert_msg is None
+        assert result.tx.status == 1
+        assert k.pending == set()
+    finally:
+        k.close()
+
+
+Block = namedtuple("Block", ["number", "hash", "parentHash"])
+
+
+def test_block_follower_reorg():
+    blocks = {}
+
+    def block(number, fork, parentFork=None):
+        parentFork = fork if parentFork is None else parentFork
+        b = Block(number, bytes([fork, number + 1]), bytes([parentFork, number]))
+        blocks[b.hash] = b
+        return b
+
+    for number in range(10):
+        block(number, 0)
+    for number in range(7, 12):
+        block(number, 1, 0 if number == 7 else 1)
+    get_block = lambda h: blocks[bytes(h)]
+    follower = BlockFollower(depth=5)
+    follower.advance(block(5, 0), get_block)
+    new, reorged = follower.advance(block(9, 0), get_block)
+    assert [b.number for b in new] == [6, 7, 8, 9]
+    assert not reorged
+    new, reorged = follower.advance(block(11, 1), get_block)
+    assert [b.number for b in new] == [7, 8, 9, 10, 11]
+    assert reorged
+    assert sorted(follower.hashes) == [7, 8, 9, 10, 11]
+    assert follower.advance(block(11, 1), get_block) == ([], False)
@@ -0,0 +1,56 @@
+import pytest
+from brownie import LixirStrategySimpleGWAP, chain
+from lixir.metadata import MetadataCache
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def test_metadata_matches_vault(tmp_path, vault, pool, registry, strat_simp_gwap):
+    cache = MetadataCache(str(tmp_path / "metadata.json"))
+    metadata = cache.get(vault)
+    assert metadata.token0 == pool.token0
+    assert metadata.token1 == pool.token1
+    assert metadata.registry == registry
+    assert metadata.strategy == strat_simp_gwap
+    assert metadata.activeFee == pool.fee
+    assert metadata.activePool == pool.pool
+    assert metadata.tickSpacing == pool.pool.tickSpacing()
+    assert metadata.TICK_SHORT_DURATION == 60
+    assert metadata.MAX_TICK_DIFF == 120
+    # persisted, so a new cache does not read anything
+    assert MetadataCache(cache.path).get(vault) == metadata
+
+
+def test_metadata_invalidation(
+    tmp_path,
+    vault,
+    pool,
+    users,
+    registry,
+    delegate,
+    strategist,
+    keeper,
+    strat_simp_gwap,
+):
+    cache = MetadataCache(str(tmp_path / "metadata.json"))
+    cache.get(vault)
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    strat_simp_gwap.setMaxTickDiff(vault, 500, {"from": strategist})
+    assert cache.update() == 2
+    # same fee tier and the config came with its event, so nothing is stale
+    assert len(cache.vaults[vault.address]) == len(cache.get(vault)) - 1
+    assert cache.get(vault).MAX_TICK_DIFF == 500
+
+    strategy = delegate.deploy(LixirStrategySimpleGWAP, registry)
+    registry.grantRole(registry.strategy_role(), strategy, {"from": delegate})
+    vault.setStrategy(strategy, {"from": strategist})
+    cache.update()
+    assert "strategy" not in cache.vaults[vault.address]
+    assert "activePool" in cache.vaults[vault.address]
+    assert cache.get(vault).strategy == strategy
@@ -0,0 +1,46 @@
+import brownie
+import pytest
+from brownie import chain
+from lixir.errors import Revert
+from lixir.observations import ObservationCache
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def test_observations_match_pool(pool, users, mock_router, multicall):
+    user = users[0]
+    pool.pool.increaseObservationCardinalityNext(16, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(50)
+    cache = ObservationCache(pool.pool)
+    assert cache.ingest(multicall) > 0
+    for zeroForOne, amount, seconds in (
+        (False, 3e17, 30),
+        (True, 1e17, 7),
+        (True, 2e17, 120),
+        (False, 5e16, 13),
+    ):
+        mock_router.swap(pool.pool, zeroForOne, amount, {"from": user})
+        chain.sleep(seconds)
+        chain.mine()
+    assert cache.update() == 4
+    assert cache.tick == pool.pool.slot0().dict()["tick"]
+    secondsAgos = [0, 1, 13, 14, 60, 100, 150, 170]
+    tickCumulatives, _ = pool.pool.observe(secondsAgos)
+    assert cache.observe(secondsAgos) == list(tickCumulatives)
+    for secondsAgo in (13, 60, 170):
+        start, end = pool.pool.observe([secondsAgo, 0])[0]
+        assert cache.gwap(secondsAgo) == (end - start) // secondsAgo
+
+
+def test_observations_too_old(pool, multicall):
+    cache = ObservationCache(pool.pool)
+    cache.ingest(multicall)
+    secondsAgo = cache.lastTimestamp - cache.timestamps[0] + 1
+    with brownie.reverts("OLD"):
+        pool.pool.observe([secondsAgo])
+    with pytest.raises(Revert, match="OLD"):
+        cache.observe([secondsAgo])
@@ -0,0 +1,42 @@
+import pytest
+from brownie import chain
+from lixir.positions import position_key, position_keys, read_positions, read_ticks
+from lixir.totals import PositionInfo, TickInfo
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def test_position_keys_batch(vault):
+    owners = [vault.address] * 3
+    lowers = [-887220, -60, 0]
+    uppers = [887220, 60, 120]
+    assert position_keys(owners, lowers, uppers) == [
+        position_key(vault.address, l, u) for l, u in zip(lowers, uppers)
+    ]
+
+
+def test_storage_reads_match_pool(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    mock_router.swap(pool.pool, False, 1e16, {"from": user})
+    positions = [
+        (vault.address, *vault.mainPosition()),
+        (vault.address, *vault.rangePosition()),
+    ]
+    ticks = [t for _, lower, upper in positions for t in (lower, upper)]
+    for proof in (True, False):
+        infos = read_positions(pool.pool, positions, proof=proof)
+        for info, (owner, lower, upper) in zip(infos, positions):
+            assert info == PositionInfo(
+                *pool.pool.positions(position_key(owner, lower, upper))
+            )
+        for tick, info in read_ticks(pool.pool, ticks, proof=proof).items():
+            assert info == TickInfo(*pool.pool.ticks(tick)[2:4])
@@ -0,0 +1,43 @@
+import pytest
+from brownie import chain
+from lixir.profiler import flame_graph_svg, folded_stacks, profile_tx, step_costs
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def _step(op, gas, gasCost, depth):
+    return {"op": op, "gas": gas, "gasCost": gasCost, "depth": depth}
+
+
+def test_step_costs_charge_callee_once():
+    trace = [
+        _step("PUSH1", 1000, 3, 1),
+        _step("STATICCALL", 997, 700, 1),
+        _step("SLOAD", 300, 800, 2),
+        _step("RETURN", 200, 0, 2),
+        _step("POP", 250, 2, 1),
+        _step("STOP", 248, 0, 1),
+    ]
+    costs = step_costs(trace)
+    assert costs == [3, 647, 100, 0, 2, 0]
+    assert sum(costs) == 1000 - 248
+
+
+def test_profile_deposit(vault, pool, users, strat_simp_gwap, keeper):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    tx = vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    profile = profile_tx(tx)
+    # everything but the intrinsic cost and refunds happens in the trace
+    assert 0 < profile.total < tx.gas_used
+    assert profile.functions["LixirVault._calculateTotals"] > 0
+    assert profile.opcodes["SLOAD"] > 0
+    assert profile.opcodes["STATICCALL"] > 0
+    assert any(line.startswith("contracts/LixirVault.sol:") for line in profile.lines)
+    assert any("LixirVault.deposit;" in s for s in folded_stacks(profile).splitlines())
+    assert flame_graph_svg(profile.stacks).startswith("<svg")
@@ -0,0 +1,120 @@
+import brownie
+import pytest
+from brownie import chain
+from lixir.quotes import (
+    DepositQuoter,
+    quote_withdrawals,
+    read_deposit_state,
+    read_withdraw_states,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+AMOUNTS = [(1e18, 1e18), (3e17, 2e18), (5e18, 1e12), (1e12, 5e18), (12345, 67890)]
+
+
+def test_deposit_quotes_match_vault(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    for i, (amount0, amount1) in enumerate(AMOUNTS):
+        state = read_deposit_state(multicall, vault, pool.pool)
+        assert state.wethToken is None
+        quote = DepositQuoter(state).quote(amount0, amount1)
+        if quote.revert_msg is not None:
+            with pytest.raises(Exception):
+                vault.deposit(
+                    amount0, amount1, 0, 0, user, chain.time() + 60, {"from": user}
+                )
+            continue
+        tx = vault.deposit(
+            amount0, amount1, 0, 0, user, chain.time() + 60, {"from": user}
+        )
+        assert tx.return_value == quote[:3]
+        if i == 1:
+            mock_router.swap(pool.pool, True, 1e17, {"from": user})
+            chain.sleep(100)
+            strat_simp_gwap.rebalance(
+                vault, pool.pool.slot0().dict()["tick"], {"from": keeper}
+            )
+
+
+def test_deposit_quote_min_amounts(vault, pool, users, multicall):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    quoter = DepositQuoter(read_deposit_state(multicall, vault, pool.pool))
+    quote = quoter.quote(1e18, 1e18)
+    assert quoter.quote(1e18, 1e18, quote.amount0In + 1).revert_msg == "OUTPUT_AMOUNT"
+    assert quoter.quote(1e18, 1e18, quote.amount0In, quote.amount1In) == quote
+
+
+def test_eth_deposit_quotes_match_vault(eth_vault, eth_pool, users, multicall):
+    user = users[0]
+    for amount, value in ((1e18, 1e18), (2e18, 5e17), (1e17, 3e18)):
+        state = read_deposit_state(multicall, eth_vault, eth_pool.pool)
+        assert state.wethToken == eth_vault.WETH_TOKEN()
+        quote = DepositQuoter(state).quote_eth(amount, value)
+        assert quote.revert_msg is None
+        tx = eth_vault.depositETH(
+            amount, 0, 0, user, chain.time() + 60, {"from": user, "value": value}
+        )
+        assert tx.return_value == quote[:3]
+        # the ETH left over is sent back, so only amountEthIn leaves the user
+        assert tx.internal_transfers[-1]["value"] == quote.refund
+
+
+def test_withdraw_quotes_match_vaults(
+    vault,
+    eth_vault,
+    pool,
+    users,
+    keeper,
+    strat_simp_gwap,
+    mock_router,
+    multicall,
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    eth_vault.depositETH(
+        1e18, 0, 0, user, chain.time() + 60, {"from": user, "value": 1e18}
+    )
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    # fees for tokensOwed and a price away from the positions' centre
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    mock_router.swap(pool.pool, False, 5e16, {"from": user})
+    vaults = [vault, eth_vault]
+    for fraction in (3, 1):
+        states = read_withdraw_states(multicall, vaults)
+        shares = [v.balanceOf(user) // fraction for v in vaults]
+        quotes = quote_withdrawals(states, zip(vaults, shares))
+        for v, s, quote in zip(vaults, shares, quotes):
+            assert quote.revert_msg is None
+            tx = v.withdraw(s, 0, 0, user, chain.time() + 60, {"from": user})
+            assert tx.return_value == (quote.amount0Out, quote.amount1Out)
+
+
+def test_withdraw_quote_slippage(vault, users, multicall):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    shares = vault.balanceOf(user) // 2
+    (state,) = read_withdraw_states(multicall, [vault])
+    (quote,) = quote_withdrawals([state], [(vault, shares)])
+    (tight,) = quote_withdrawals(
+        [state], [(vault, shares, quote.amount0Out + 1, quote.amount1Out)]
+    )
+    assert (tight.headroom0, tight.headroom1) == (-1, 0)
+    assert tight.revert_msg == "OUTPUT_AMOUNT"
+    with brownie.reverts("OUTPUT_AMOUNT"):
+        vault.withdraw(
+            shares,
+            quote.amount0Out + 1,
+            quote.amount1Out,
+            user,
+            chain.time() + 60,
+            {"from": user},
+        )
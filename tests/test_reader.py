@@ -0,0 +1,42 @@
+import pytest
+from brownie import chain
+from lixir.reader import get_factory_vaults, read_factory_vaults, read_vaults
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def assert_record_matches(record, vault, strat_simp_gwap):
+    assert record.vault == vault.address
+    assert record.mainPosition == tuple(vault.mainPosition())
+    assert record.rangePosition == tuple(vault.rangePosition())
+    assert (record.total0, record.total1, record.mL, record.rL) == tuple(
+        vault.calculateTotals()
+    )
+    assert record.totalSupply == vault.totalSupply()
+    assert record.performanceFee == vault.performanceFee()
+    assert record.activePool == vault.activePool()
+    assert tuple(record.vaultData) == tuple(strat_simp_gwap.vaultDatas(vault))
+
+
+def test_read_vaults(multicall, vault, eth_vault, strat_simp_gwap, users):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    records = read_vaults(multicall, [vault, eth_vault], strat_simp_gwap)
+    assert [r.blockNumber for r in records] == [chain.height] * 2
+    for record, v in zip(records, (vault, eth_vault)):
+        assert_record_matches(record, v, strat_simp_gwap)
+
+
+def test_read_vaults_batches_share_block(multicall, vault, eth_vault, strat_simp_gwap):
+    records = read_vaults(multicall, [vault, eth_vault], strat_simp_gwap, batch_size=3)
+    assert records == read_vaults(multicall, [vault, eth_vault], strat_simp_gwap)
+
+
+def test_read_factory_vaults(multicall, factory, vault, eth_vault, strat_simp_gwap):
+    assert get_factory_vaults(factory) == [vault.address, eth_vault.address]
+    records = read_factory_vaults(multicall, factory, strat_simp_gwap)
+    for record, v in zip(records, (vault, eth_vault)):
+        assert_record_matches(record, v, strat_simp_gwap)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from brownie import chain
+from lixir.keeper import Keeper
+from lixir.scheduler import RebalanceScheduler
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def _run_once(keeper, strat_simp_gwap, vaults, scheduler, multicall):
+    k = Keeper(
+        keeper, strat_simp_gwap, vaults, scheduler=scheduler, multicall=multicall
+    )
+    try:
+        return asyncio.run(k.run_once())
+    finally:
+        k.close()
+
+
+def test_scheduler_skips_unprofitable_rebalance(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    chain.mine()
+    before = strat_simp_gwap.vaultDatas(vault).dict()["timestamp"]
+    # gas worth more than the whole vault
+    scheduler = RebalanceScheduler(1e9, {vault: 1}, gas=10 ** 12)
+    assert _run_once(keeper, strat_simp_gwap, [vault], scheduler, multicall) == []
+    (estimate,) = [e for _, e in scheduler.estimates.values()]
+    assert estimate.revert_msg is None
+    assert estimate.idle > 0
+    assert estimate.ratio < 1
+    assert strat_simp_gwap.vaultDatas(vault).dict()["timestamp"] == before
+
+    scheduler = RebalanceScheduler(1, {vault: 1}, gas=1)
+    (result,) = _run_once(keeper, strat_simp_gwap, [vault], scheduler, multicall)
+    assert result.revert_msg is None
+    assert result.tx.status == 1
+    assert strat_simp_gwap.vaultDatas(vault).dict()["timestamp"] > before
+
+
+def test_scheduler_orders_by_gain(
+    vault, eth_vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    eth_vault.depositETH(
+        1e15, 0, 0, user, chain.time() + 60, {"from": user, "value": 1e15}
+    )
+    chain.sleep(100)
+    chain.mine()
+    scheduler = RebalanceScheduler(1, {vault: 1, eth_vault: 1}, gas=1)
+    results = _run_once(
+        keeper, strat_simp_gwap, [eth_vault, vault], scheduler, multicall
+    )
+    assert [r.vault for r in results] == [vault, eth_vault]
+    assert all(r.tx.status == 1 for r in results)
+
+
+def test_scheduler_needs_price_and_multicall(
+    vault, eth_vault, users, keeper, strat_simp_gwap, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    chain.mine()
+    scheduler = RebalanceScheduler(1, {eth_vault: 1}, gas=1)
+    with pytest.raises(ValueError):
+        Keeper(keeper, strat_simp_gwap, [vault], scheduler=scheduler)
+    with pytest.raises(KeyError):
+        _run_once(keeper, strat_simp_gwap, [vault], scheduler, multicall)
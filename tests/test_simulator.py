@@ -0,0 +1,59 @@
+import pytest
+from brownie import chain
+from lixir.quotes import read_withdraw_states
+from lixir.simulator import StrategySimulator
+from lixir.strat_simp_gwap import VaultData, getTickGwapUpdateCumulative
+from lixir.totals import liquidityAndTokensOwed
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+# StrategySimulator started from the vault's state in the block before an
+# on-chain rebalance, and rebalanced at that block's price and the GWAP the
+# strategy recorded, must mint the same positions
+def test_rebalance_matches_chain(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    before = VaultData(*strat_simp_gwap.vaultDatas(vault))
+    tx = strat_simp_gwap.rebalance(
+        vault, pool.pool.slot0().dict()["tick"], {"from": keeper}
+    )
+    after = VaultData(*strat_simp_gwap.vaultDatas(vault))
+    tick_gwap, _ = getTickGwapUpdateCumulative(
+        after.tickCumulative, before, after.timestamp
+    )
+
+    (state,) = read_withdraw_states(multicall, [vault], tx.block_number - 1)
+    state = state.vaultState
+    simulator = StrategySimulator(None, pool.pool.tickSpacing(), *before[:4])
+    main, range_ = state.mainPosition, state.rangePosition
+    simulator.mL, *mainOwed = liquidityAndTokensOwed(state.pool, state.pool.tick, main)
+    simulator.rL, *rangeOwed = liquidityAndTokensOwed(
+        state.pool, state.pool.tick, range_
+    )
+    simulator.mainPosition = (main.tickLower, main.tickUpper)
+    simulator.rangePosition = (range_.tickLower, range_.tickUpper)
+    simulator.mainOwed = tuple(mainOwed)
+    simulator.rangeOwed = tuple(rangeOwed)
+    simulator.balance0 = state.balance0
+    simulator.balance1 = state.balance1
+    simulator._rebalance(state.pool.sqrtPriceX96, state.pool.tick, tick_gwap)
+
+    (rebalanced,) = read_withdraw_states(multicall, [vault], tx.block_number)
+    rebalanced = rebalanced.vaultState
+    assert simulator.mainPosition == tuple(vault.mainPosition())
+    assert simulator.rangePosition == tuple(vault.rangePosition())
+    assert simulator.mL == rebalanced.mainPosition.info.liquidity
+    assert simulator.rL == rebalanced.rangePosition.info.liquidity
+    assert simulator.rL > 0
+    assert (simulator.balance0, simulator.balance1) == (
+        rebalanced.balance0,
+        rebalanced.balance1,
+    )
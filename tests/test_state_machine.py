@@ -1,21 +1,30 @@
+import os
 from typing import Tuple, Union
 
 # import brownie
 from brownie.network.account import Account
-from brownie import chain, web3
+from brownie import LixirRegistry, chain, history, web3
 from brownie.test import strategy, given
 from hypothesis import settings
+from hypothesis.database import DirectoryBasedExampleDatabase
 from collections import namedtuple
 from random import randrange
 import random
+from lixir.keeper import observe_vault, predict
+from lixir.model import VaultModel
+from lixir.positions import position_key
+from lixir.reader import Call, aggregate
 from lixir.strat_simp_gwap import getMainTicks
+from lixir.totals import PoolState, PositionInfo, TickInfo, calculateTotals
 import pytest
 from decimal import Decimal, getcontext
 
 getcontext().prec = 100
 
-MAX_EXAMPLES = 200
-STATEFUL_STEP_COUNT = 30
+# lixir.fuzz shards examples across workers through these
+MAX_EXAMPLES = int(os.environ.get("LIXIR_FUZZ_MAX_EXAMPLES", 200))
+STATEFUL_STEP_COUNT = int(os.environ.get("LIXIR_FUZZ_STEP_COUNT", 30))
+FUZZ_DATABASE = os.environ.get("LIXIR_FUZZ_DATABASE")
 
 
 class UserDiff:
@@ -229,6 +238,12 @@ class StateMachine:
 def test_stateful(
     state_machine, vault, pool, strategist, strat_simp_gwap, keeper, mock_router, user
 ):
+    fuzz_settings = {
+        "max_examples": MAX_EXAMPLES,
+        "stateful_step_count": STATEFUL_STEP_COUNT,
+    }
+    if FUZZ_DATABASE:
+        fuzz_settings["database"] = DirectoryBasedExampleDatabase(FUZZ_DATABASE)
     state_machine(
         StateMachine,
         user,
@@ -238,8 +253,224 @@ def test_stateful(
         strat_simp_gwap,
         keeper,
         mock_router,
-        settings={
-            "max_examples": MAX_EXAMPLES,
-            "stateful_step_count": STATEFUL_STEP_COUNT,
-        },
+        settings=fuzz_settings,
+    )
+
+
+# Replays every successful vault and strategy transaction of each step on an
+# exact Python model of the vault and compares it, after every step, against
+# one multicall snapshot of the vault and its pool. Any drift fails the step it
+# happens in, so hypothesis shrinks straight to the transaction that caused it.
+class DifferentialStateMachine(StateMachine):
+    def __init__(
+        self,
+        user,
+        vault,
+        pool,
+        strategist,
+        strat_simp_gwap,
+        keeper,
+        mock_router,
+        multicall,
+    ):
+        super().__init__(
+            user, vault, pool, strategist, strat_simp_gwap, keeper, mock_router
+        )
+        self.multicall = multicall
+        self.feeTo = LixirRegistry.at(vault.registry()).feeTo()
+
+    def initialize(self):
+        super().initialize()
+        self.model = VaultModel(self.vault.mainPosition(), self.vault.rangePosition())
+        assert self.vault.totalSupply() == 0
+        self.snapshot = self._check()
+
+    def rule_rebalance(self):
+        self._step(super().rule_rebalance)
+
+    def rule_deposit(self, amount0Desired, amount1Desired):
+        self._step(super().rule_deposit, amount0Desired, amount1Desired)
+
+    def rule_withdraw(self, randseed):
+        self._step(super().rule_withdraw, randseed)
+
+    def rule_swap(self, swapAmountIn, zeroForOne):
+        self._step(super().rule_swap, swapAmountIn, zeroForOne)
+
+    def rule_swap_back(self):
+        self._step(super().rule_swap_back)
+
+    def _step(self, rule, *args):
+        n = len(history)
+        rule(*args)
+        for tx in history[n:]:
+            if tx.status == 1:
+                self._apply(tx)
+        self.snapshot = self._check()
+
+    def _apply(self, tx):
+        if tx.receiver == self.vault and tx.fn_name == "deposit":
+            amount0Desired, amount1Desired = self.vault.deposit.decode_input(
+                tx.input
+            )[:2]
+            event = tx.events["Deposit"]
+            assert self.model.deposit(
+                event["recipient"],
+                amount0Desired,
+                amount1Desired,
+                self.snapshot["sqrtPriceX96"],
+                self.snapshot["total0"],
+                self.snapshot["total1"],
+            ) == (event["shares"], event["amount0In"], event["amount1In"])
+        elif tx.receiver == self.vault and tx.fn_name == "withdraw":
+            self.model.withdraw(tx.sender, tx.events["Withdraw"]["shares"])
+        elif tx.receiver == self.strat_simp_gwap and tx.fn_name == "rebalance":
+            expectedTick = self.strat_simp_gwap.rebalance.decode_input(tx.input)[1]
+            observation = observe_vault(
+                self.vault,
+                self.strat_simp_gwap,
+                chain[tx.block_number - 1],
+                tx.timestamp,
+            )
+            prediction = predict(observation, expectedTick)
+            assert prediction.revert_msg is None
+            event = tx.events["Rebalance"]
+            self.model.rebalance(
+                observation.sqrtPriceX96,
+                event["total0"],
+                event["total1"],
+                prediction.mainTicks,
+                prediction.rangeTicks0,
+                prediction.rangeTicks1,
+                self.feeTo,
+                event["feeData"][4],
+            )
+
+    def _calls(self):
+        vault = str(self.vault)
+        pool = str(self.pool)
+        position = ["uint128", "uint256", "uint256", "uint128", "uint128"]
+        tick = [
+            "uint128",
+            "int128",
+            "uint256",
+            "uint256",
+            "int56",
+            "uint160",
+            "uint32",
+            "bool",
+        ]
+        ticks = self.model.mainPosition + self.model.rangePosition
+        return [
+            Call(
+                vault, "calculateTotals()", (), ["uint256", "uint256", "uint128", "uint128"]
+            ),
+            Call(vault, "mainPosition()", (), ["int24", "int24"]),
+            Call(vault, "rangePosition()", (), ["int24", "int24"]),
+            Call(vault, "totalSupply()", (), ["uint256"]),
+            Call(vault, "balanceOf(address)", (str(self.user),), ["uint256"]),
+            Call(str(self.token0), "balanceOf(address)", (vault,), ["uint256"]),
+            Call(str(self.token1), "balanceOf(address)", (vault,), ["uint256"]),
+            Call(
+                pool,
+                "slot0()",
+                (),
+                ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"],
+            ),
+            Call(pool, "feeGrowthGlobal0X128()", (), ["uint256"]),
+            Call(pool, "feeGrowthGlobal1X128()", (), ["uint256"]),
+            Call(
+                pool,
+                "positions(bytes32)",
+                (bytes(position_key(vault, *self.model.mainPosition)),),
+                position,
+            ),
+            Call(
+                pool,
+                "positions(bytes32)",
+                (bytes(position_key(vault, *self.model.rangePosition)),),
+                position,
+            ),
+        ] + [Call(pool, "ticks(int24)", (t,), tick) for t in ticks]
+
+    def _check(self):
+        _, results = aggregate(self.multicall, self._calls())
+        (
+            totals,
+            mainPosition,
+            rangePosition,
+            (totalSupply,),
+            (balance,),
+            (balance0,),
+            (balance1,),
+            slot0,
+            (feeGrowthGlobal0X128,),
+            (feeGrowthGlobal1X128,),
+            mainInfo,
+            rangeInfo,
+        ) = results[:12]
+        ticks = self.model.mainPosition + self.model.rangePosition
+        poolState = PoolState(
+            slot0[0],
+            slot0[1],
+            feeGrowthGlobal0X128,
+            feeGrowthGlobal1X128,
+            {t: TickInfo(*info[2:4]) for t, info in zip(ticks, results[12:])},
+        )
+        model = self.model
+        assert mainPosition == model.mainPosition
+        assert rangePosition == model.rangePosition
+        assert totalSupply == model.totalSupply
+        assert balance == model.balanceOf(self.user)
+        assert (mainInfo[0], rangeInfo[0]) == (model.mL, model.rL)
+        expected = calculateTotals(
+            model.vaultState(
+                poolState,
+                PositionInfo(*mainInfo),
+                PositionInfo(*rangeInfo),
+                balance0,
+                balance1,
+            )
+        )
+        assert totals == tuple(expected)
+        return {
+            "sqrtPriceX96": poolState.sqrtPriceX96,
+            "total0": expected.total0,
+            "total1": expected.total1,
+        }
+
+
+# LIXIR_FUZZ_DIFFERENTIAL=1 runs the differential state machine on its own
+@pytest.mark.skipif(
+    not os.environ.get("LIXIR_FUZZ_DIFFERENTIAL"),
+    reason="set LIXIR_FUZZ_DIFFERENTIAL to run the differential fuzzer",
+)
+def test_stateful_differential(
+    state_machine,
+    vault,
+    pool,
+    strategist,
+    strat_simp_gwap,
+    keeper,
+    mock_router,
+    user,
+    multicall,
+):
+    fuzz_settings = {
+        "max_examples": MAX_EXAMPLES,
+        "stateful_step_count": STATEFUL_STEP_COUNT,
+    }
+    if FUZZ_DATABASE:
+        fuzz_settings["database"] = DirectoryBasedExampleDatabase(FUZZ_DATABASE)
+    state_machine(
+        DifferentialStateMachine,
+        user,
+        vault,
+        pool,
+        strategist,
+        strat_simp_gwap,
+        keeper,
+        mock_router,
+        multicall,
+        settings=fuzz_settings,
     )
@@ -0,0 +1,51 @@
+import pytest
+from brownie import chain
+from lixir.swap import load_pool
+from lixir.v3_math import getSqrtRatioAtTick
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+SWAPS = [
+    (True, 1e17, None),
+    (False, 3e17, None),
+    (True, 2e18, -900),
+    (False, -1e17, None),
+    (False, 5e18, 900),
+]
+
+
+def test_swaps_match_pool(
+    vault, pool, users, keeper, strat_simp_gwap, mock_router, multicall
+):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    simulator = load_pool(multicall, pool.pool)
+    assert len(simulator.ticks) >= 6
+    positions = [vault.mainPosition(), vault.rangePosition()]
+    for zeroForOne, amount, ticks in SWAPS:
+        if ticks is None:
+            tx = mock_router.swap(pool.pool, zeroForOne, amount, {"from": user})
+            result = simulator.swap(zeroForOne, amount)
+        else:
+            limit = getSqrtRatioAtTick(simulator.tick + ticks)
+            tx = mock_router.swapLimit(
+                pool.pool, zeroForOne, amount, limit, {"from": user}
+            )
+            result = simulator.swap(zeroForOne, amount, limit)
+        assert tx.return_value == result[:2]
+        chain_state = load_pool(multicall, pool.pool)
+        assert simulator.slot0() == chain_state.slot0()
+        assert simulator.liquidity == chain_state.liquidity
+        assert simulator.feeGrowthGlobal0X128 == chain_state.feeGrowthGlobal0X128
+        assert simulator.feeGrowthGlobal1X128 == chain_state.feeGrowthGlobal1X128
+        assert simulator.ticks == chain_state.ticks
+        for tickLower, tickUpper in positions:
+            assert simulator.feeGrowthInside(
+                tickLower, tickUpper
+            ) == chain_state.feeGrowthInside(tickLower, tickUpper)
@@ -0,0 +1,44 @@
+from brownie import web3
+from brownie.network.transaction import TransactionReceipt
+from lixir.system import ROLES, create_address, deploy_system_batched
+
+
+def test_create_address(accounts):
+    sender = accounts[0]
+    assert create_address(sender, sender.nonce) == sender.get_deployment_address()
+
+
+def test_deploy_system_batched(
+    monkeypatch, uni_factory, weth, gov, delegate, strategist, pauser, keeper, deployer
+):
+    nonce = delegate.nonce
+    in_flight = []
+    wait = TransactionReceipt.wait
+
+    # records how many transactions the delegate had sent when each receipt
+    # was awaited
+    def recording_wait(self, required_confs):
+        in_flight.append(
+            web3.eth.get_transaction_count(str(delegate), "pending") - nonce
+        )
+        return wait(self, required_confs)
+
+    monkeypatch.setattr(TransactionReceipt, "wait", recording_wait)
+    system = deploy_system_batched(
+        uni_factory, weth, gov, delegate, strategist, pauser, keeper, deployer
+    )
+    assert in_flight and in_flight[0] == 14
+    registry = system.registry
+    assert registry.factory_role() == ROLES["factory_role"]
+    assert registry.hasRole(ROLES["strategist_role"], strategist)
+    assert registry.hasRole(ROLES["fee_setter_role"], strategist)
+    assert registry.hasRole(ROLES["pauser_role"], pauser)
+    assert registry.hasRole(ROLES["keeper_role"], keeper)
+    assert registry.hasRole(ROLES["deployer_role"], deployer)
+    assert registry.hasRole(ROLES["factory_role"], system.factory)
+    assert registry.hasRole(ROLES["vault_implementation_role"], system.vault_impl)
+    assert registry.hasRole(
+        ROLES["eth_vault_implementation_role"], system.eth_vault_impl
+    )
+    assert registry.hasRole(ROLES["strategy_role"], system.strat_simp_gwap)
+    assert system.factory.registry() == registry
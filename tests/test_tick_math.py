@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from decimal import Decimal, localcontext
+from brownie.test import given, strategy
+from lixir import tick_math
+from lixir.errors import Revert
+from lixir.strat_simp_gwap import getMainTicks, getRangeTicks, roundTickDown, roundTickUp
+
+# TickMath.getSqrtRatioAtTick at the tick bounds, +-1 around them and zero,
+# and either side of the bits its multiplier table switches on
+SQRT_RATIO_VECTORS = [
+    (-887272, 4295128739),
+    (-887271, 4295343490),
+    (-524288, 327099227039063107),
+    (-256, 78220554859095770638340573244),
+    (-255, 78224465789067920332153814871),
+    (-1, 79224201403219477170569942574),
+    (0, 79228162514264337593543950336),
+    (1, 79232123823359799118286999568),
+    (255, 80244737654238127488718973609),
+    (256, 80248749790819932309965073893),
+    (524288, 19190206568837448476620805525116361302670),
+    (887271, 1461373636630004318706518188784493106690254656249),
+    (887272, 1461446703485210103287273052203988822378723970342),
+]
+
+
+def test_sqrt_ratio_vectors():
+    ticks, ratios = zip(*SQRT_RATIO_VECTORS)
+    assert list(tick_math.getSqrtRatioAtTick(ticks)) == list(ratios)
+    for tick, ratio in SQRT_RATIO_VECTORS:
+        assert tick_math.getSqrtRatioAtTick(tick) == ratio
+        if tick < tick_math.MAX_TICK:
+            assert tick_math.getTickAtSqrtRatio(ratio) == tick
+        if tick > tick_math.MIN_TICK:
+            assert tick_math.getTickAtSqrtRatio(ratio - 1) == tick - 1
+    assert list(tick_math.getTickAtSqrtRatio(ratios[:-1])) == list(ticks[:-1])
+    with pytest.raises(Revert):
+        tick_math.getTickAtSqrtRatio(tick_math.MAX_SQRT_RATIO)
+
+
+# against sqrt(1.0001 ** tick) * 2 ** 96 in exact decimal arithmetic, which
+# TickMath only approximates to well within a part in a billion
+def test_sqrt_ratio_precision():
+    ticks = np.arange(tick_math.MIN_TICK, tick_math.MAX_TICK, 7919)
+    with localcontext() as ctx:
+        ctx.prec = 80
+        for tick, ratio in zip(ticks, tick_math.getSqrtRatioAtTick(ticks)):
+            exact = (Decimal("1.0001") ** int(tick)).sqrt() * 2 ** 96
+            assert abs(ratio - exact) / exact < Decimal("1e-9")
+
+
+def test_sqrt_ratio_bounds():
+    ratios = tick_math.getSqrtRatioAtTick([tick_math.MIN_TICK, 0, tick_math.MAX_TICK])
+    assert list(ratios) == [
+        tick_math.MIN_SQRT_RATIO,
+        1 << 96,
+        tick_math.MAX_SQRT_RATIO,
+    ]
+    ticks = tick_math.getTickAtSqrtRatio(
+        [tick_math.MIN_SQRT_RATIO, 1 << 96, tick_math.MAX_SQRT_RATIO - 1]
+    )
+    assert list(ticks) == [tick_math.MIN_TICK, 0, tick_math.MAX_TICK - 1]
+
+
+def test_sqrt_ratio_round_trip():
+    ticks = np.arange(tick_math.MIN_TICK, tick_math.MAX_TICK, 997)
+    ratios = tick_math.getSqrtRatioAtTick(ticks)
+    assert (tick_math.getTickAtSqrtRatio(ratios) == ticks).all()
+    assert (tick_math.getTickAtSqrtRatio(ratios + 1) == ticks).all()
+    assert (tick_math.getTickAtSqrtRatio(ratios[1:] - 1) == ticks[1:] - 1).all()
+
+
+@given(
+    tick=strategy("int24", min_value=-800000, max_value=800000),
+    spread=strategy("int24", min_value=1, max_value=20000),
+    tickSpacing=strategy("int24", min_value=1, max_value=200),
+)
+def test_scalar_matches_vectorized(tick, spread, tickSpacing):
+    lower, upper = tick_math.getMainTicks([tick], tickSpacing, [spread])
+    assert getMainTicks(tick, tickSpacing, spread) == (lower[0], upper[0])
+    assert roundTickDown(tick, tickSpacing) % tickSpacing == 0
+    assert roundTickDown(tick, tickSpacing) <= tick <= roundTickUp(tick, tickSpacing)
+    sqrtRatioX96 = int(tick_math.getSqrtRatioAtTick(tick)) + 1
+    lower0, upper0, lower1, upper1 = getRangeTicks(
+        sqrtRatioX96, tick, tickSpacing, spread
+    )
+    assert upper1 <= tick < lower0
@@ -0,0 +1,40 @@
+import pytest
+from brownie import chain
+from lixir.totals import calculateTotals, calculateTotalsFromTick, calculateTotalsFromTicks
+from lixir.vault import get_vault_state
+
+
+def test_totals_match_vault(vault, pool, users, keeper, strat_simp_gwap, mock_router):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    assert tuple(calculateTotals(get_vault_state(vault, pool.pool))) == tuple(
+        vault.calculateTotals()
+    )
+    mock_router.swap(pool.pool, True, 1e17, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    for zeroForOne in (False, True, False):
+        mock_router.swap(pool.pool, zeroForOne, 1e16, {"from": user})
+        state = get_vault_state(vault, pool.pool)
+        assert tuple(calculateTotals(state)) == tuple(vault.calculateTotals())
+
+
+def test_totals_from_ticks_match_vault(vault, pool, users, keeper, strat_simp_gwap, mock_router):
+    user = users[0]
+    vault.deposit(1e18, 1e18, 0, 0, user, chain.time() + 60, {"from": user})
+    mock_router.swap(pool.pool, False, 1e17, {"from": user})
+    chain.sleep(100)
+    strat_simp_gwap.rebalance(vault, pool.pool.slot0().dict()["tick"], {"from": keeper})
+    mock_router.swap(pool.pool, True, 1e16, {"from": user})
+    state = get_vault_state(vault, pool.pool)
+    ticks = list(range(-3000, 3001, 250))
+    batched = calculateTotalsFromTicks(state, ticks)
+    for tick, totals in zip(ticks, batched):
+        expected = tuple(vault.calculateTotalsFromTick(tick))
+        assert tuple(totals) == expected
+        assert tuple(calculateTotalsFromTick(state, tick)) == expected
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass